@@ -0,0 +1,295 @@
+"""流式播放 WAV：分块送入 pygame 混音通道的队列
+
+mixer.Sound(路径) 会在调用线程中把整首曲子解码进内存，长曲目既占内存又卡界面。
+AudioStream 打开时只解析文件头（可选 numpy 内存映射 data 块），
+播放时每次只把一小块（默认2048帧，约46ms）转换成混音器的格式，
+用 Channel.play / Channel.queue 首尾相接，后台线程在队列空出时补上下一块，启动只需几毫秒。
+
+播放位置以声卡实际取走样本的进度为准：后台线程每观察到一次换块，就得到一个 (时刻, 帧号) 观测，
+观测时刻只会晚于真实换块时刻（轮询间隔），取最近若干次观测中 "时刻 - 帧号/采样率" 的最小值作为零点，
+既消除轮询抖动，又跟随声卡时钟与 perf_counter 之间的偏差；欠载后重新开始计时。
+因此 position()/position_at() 可以直接作为 MusicScheduler 和可视化的音频时钟（接口同 AudioClock）。
+
+音量变化在生成下一块时以短渐变（默认20ms）乘到样本上，而不是直接改通道音量，避免爆音；
+生效延迟最多为已排队的两块。
+"""
+import mmap
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+DEFAULT_MIXER_BUFFER = 512   # pygame.mixer.init() 的默认缓冲帧数，决定声卡输出延迟
+
+
+class WavFile():
+    """只解析文件头的 WAV 读取器，read(start, count) 返回 (帧数, 声道) 的 float32 样本"""
+
+    def __init__(self, path, use_mmap=True):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._parse_header()
+        except Exception:
+            self._file.close()
+            raise
+        self._map = None
+        self._samples = None
+        if use_mmap and self.frames:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._samples = np.frombuffer(self._map, dtype=self.dtype, count=self.frames * self.channels,
+                                          offset=self.data_offset).reshape(-1, self.channels)
+
+    def _parse_header(self):
+        f = self._file
+        riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave != b"WAVE":
+            raise ValueError(f"不是 WAV 文件: {self.path}")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"WAV 文件缺少 data 块: {self.path}")
+            chunk_id, size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(size)
+                if size % 2:
+                    f.read(1)
+            elif chunk_id == b"data":
+                self.data_offset = f.tell()
+                data_size = size
+                break
+            else:
+                f.seek(size + size % 2, 1)
+        if fmt is None:
+            raise ValueError(f"WAV 文件缺少 fmt 块: {self.path}")
+
+        audio_format, self.channels, self.rate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+        if audio_format == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            audio_format = struct.unpack("<H", fmt[24:26])[0]  # 子格式 GUID 的前两个字节
+        if audio_format == WAVE_FORMAT_PCM and bits in (8, 16, 32):
+            self.dtype = np.dtype({8: np.uint8, 16: "<i2", 32: "<i4"}[bits])
+        elif audio_format == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+            self.dtype = np.dtype("<f4")
+        else:
+            raise ValueError(f"不支持的 WAV 格式（格式 {audio_format}，{bits} 位）: {self.path}")
+        self.block_align = block_align
+        # 有的录音软件把 data 大小写成0或超过文件末尾，按文件实际长度截断
+        f.seek(0, 2)
+        available = f.tell() - self.data_offset
+        if data_size == 0 or data_size > available:
+            data_size = available
+        self.frames = data_size // block_align
+
+    @property
+    def duration(self):
+        return self.frames / self.rate
+
+    def read(self, start, count):
+        start = min(max(start, 0), self.frames)
+        count = max(min(count, self.frames - start), 0)
+        if self._samples is not None:
+            raw = self._samples[start:start + count]
+        else:
+            self._file.seek(self.data_offset + start * self.block_align)
+            raw = np.frombuffer(self._file.read(count * self.block_align), dtype=self.dtype).reshape(-1, self.channels)
+        if self.dtype == np.uint8:
+            return (raw.astype(np.float32) - 128.0) / 128.0
+        if self.dtype.kind == "i":
+            return raw.astype(np.float32) / float(1 << (self.dtype.itemsize * 8 - 1))
+        return raw.astype(np.float32)
+
+    def close(self):
+        self._samples = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class AudioStream():
+    """在 pygame 混音器上分块流式播放一个 WAV 文件
+
+    与 mixer.Sound 一样提供 play() / stop() / set_volume()；另外提供 position() 作为音频时钟。
+    """
+
+    def __init__(self, path, volume=1.0, chunk_frames=2048, ramp=0.02, use_mmap=True, latency=None):
+        """
+        :param chunk_frames: 每块的帧数（按混音器采样率），越小音量响应越快，但补块更频繁
+        :param ramp: 音量渐变时间（秒）
+        :param latency: 声卡输出延迟（秒），默认按 pygame 默认缓冲区估计，从播放位置中扣除
+        """
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        self.rate, size, self.mixer_channels = pygame.mixer.get_init()
+        if size not in (-16, 32):
+            raise ValueError(f"不支持的混音器样本格式: {size}")
+        self._out_dtype = np.int16 if size == -16 else np.float32
+        self.wav = WavFile(path, use_mmap)
+        self.chunk_frames = chunk_frames
+        self.ramp = ramp
+        self.latency = DEFAULT_MIXER_BUFFER / self.rate if latency is None else latency
+        self._ratio = self.wav.rate / self.rate       # 每个输出帧对应的源帧数
+        self.frames = int(self.wav.frames / self._ratio)  # 按混音器采样率的总帧数
+
+        self.volume = volume          # 目标音量
+        self._gain = volume           # 已送出的最后一个样本的音量
+        self._next_frame = 0          # 下一块的起始输出帧
+        self._chunks = []             # 正在播放和排队中的块：(起始帧, 帧数)
+        self._switches = deque(maxlen=16)  # 最近观察到的换块：(时刻, 开始播放的帧号)
+        self.underruns = 0
+        self.channel = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = False
+
+    @property
+    def duration(self):
+        return self.frames / self.rate
+
+    @property
+    def playing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def set_volume(self, volume, ramp=None):
+        """设置目标音量，从下一块开始在 ramp 秒内渐变过去"""
+        self.volume = min(max(volume, 0.0), 1.0)
+        if ramp is not None:
+            self.ramp = ramp
+
+    def _render(self, start, count):
+        """生成输出帧 [start, start + count) 的 Sound，按需重采样、转换声道并乘上音量渐变"""
+        if self._ratio == 1.0:
+            samples = self.wav.read(start, count)
+        else:
+            positions = (start + np.arange(count)) * self._ratio
+            first = int(positions[0])
+            source = self.wav.read(first, int(positions[-1]) - first + 2)
+            index = np.arange(len(source))
+            samples = np.stack([np.interp(positions - first, index, source[:, c])
+                                for c in range(source.shape[1])], axis=1).astype(np.float32)
+        count = len(samples)
+
+        if samples.shape[1] != self.mixer_channels:
+            if samples.shape[1] == 1:
+                samples = np.repeat(samples, self.mixer_channels, axis=1)
+            else:
+                samples = np.repeat(samples.mean(axis=1, keepdims=True), self.mixer_channels, axis=1)
+
+        target = self.volume
+        if target != self._gain:
+            steps = max(int(self.ramp * self.rate), 1)
+            gain = np.full(count, target, dtype=np.float32)
+            ramp_len = min(steps, count)
+            gain[:ramp_len] = self._gain + (target - self._gain) * (np.arange(1, ramp_len + 1) / steps)
+            self._gain = float(gain[-1])
+            samples = samples * gain[:, None]
+        elif target != 1.0:
+            samples = samples * target
+
+        if self._out_dtype == np.int16:
+            data = np.clip(samples * 32767.0, -32768, 32767).astype(np.int16)
+        else:
+            data = samples.astype(np.float32)
+        return pygame.mixer.Sound(buffer=np.ascontiguousarray(data).tobytes()), count
+
+    def _next_chunk(self):
+        if self._next_frame >= self.frames:
+            return None, 0, 0
+        start = self._next_frame
+        sound, count = self._render(start, min(self.chunk_frames, self.frames - start))
+        self._next_frame = start + count
+        return sound, start, count
+
+    def play(self, start=0.0):
+        """从 start 秒开始播放，正在播放时先停止；先送出两块再返回，其余由后台线程补充"""
+        self.stop()
+        self._next_frame = min(int(start * self.rate), self.frames)
+        self._gain = self.volume
+        self._stop = False
+        self.channel = pygame.mixer.find_channel(True)
+        sound, first, count = self._next_chunk()
+        if sound is None:
+            return self
+        queued, second, queued_count = self._next_chunk()
+        self.channel.play(sound)
+        with self._lock:
+            self._switches.clear()
+            self._switches.append((time.perf_counter(), first))
+            self._chunks = [(first, count)]
+            if queued is not None:
+                self.channel.queue(queued)
+                self._chunks.append((second, queued_count))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        poll = self.chunk_frames / self.rate / 8
+        while not self._stop:
+            channel = self.channel
+            with self._lock:
+                queue_empty = channel.get_queue() is None
+                busy = channel.get_busy()
+                if not busy:
+                    self._chunks = []
+                elif queue_empty and len(self._chunks) > 1:
+                    self._chunks.pop(0)  # 排队的块已开始播放
+                    self._switches.append((time.perf_counter(), self._chunks[0][0]))
+            if busy and not queue_empty:
+                time.sleep(poll)
+                continue
+
+            sound, start, count = self._next_chunk()
+            if sound is None:
+                if not busy:
+                    break  # 全部播放完
+                time.sleep(poll)
+                continue
+            with self._lock:
+                if self._stop:
+                    break
+                if busy and self._chunks:
+                    self.channel.queue(sound)
+                    self._chunks.append((start, count))
+                else:
+                    # 欠载：已经没有声音在播放，从现在重新开始计时
+                    self.underruns += 1
+                    self.channel.play(sound)
+                    self._chunks = [(start, count)]
+                    self._switches.clear()
+                    self._switches.append((time.perf_counter(), start))
+
+    def stop(self, timeout=1.0):
+        self._stop = True
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+        if self.channel is not None:
+            self.channel.stop()
+        with self._lock:
+            self._chunks = []
+
+    def position_at(self, t):
+        """perf_counter 时刻 t 正在从扬声器发出的内容位置（秒）"""
+        with self._lock:
+            chunks = list(self._chunks)
+            anchor = min((at - frame / self.rate for at, frame in self._switches), default=None)
+        if not chunks or anchor is None:
+            return min(self._next_frame, self.frames) / self.rate
+        last_start, last_count = chunks[-1]
+        frame = (t - self.latency - anchor) * self.rate
+        return min(max(frame, chunks[0][0]), last_start + last_count) / self.rate
+
+    def position(self):
+        return self.position_at(time.perf_counter())
+
+    def close(self):
+        self.stop()
+        self.wav.close()
@@ -0,0 +1,294 @@
+"""无界面回放基准测试
+
+用录制的视频或合成帧驱动与 VideoThread 相同的检测、分类、平滑和串口编码流程，
+串口替换为空设备或 loop://，输出 FPS 和各阶段 p50/p95/p99 延迟（JSON）。
+
+示例:
+    python bench_pipeline.py --video session.mp4 --skip-frames 0
+    python bench_pipeline.py --synthetic 600 --no-detect --sink loop
+    python bench_pipeline.py --synthetic 600 --no-detect --angles --skip-frames 0
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from finger_angles import AngleCalibration, AngleStreamer, flexion_angles
+from finger_filters import make_filter
+from finger_state import UNKNOWN_HAND, format_finger_status
+from hand_protocol import StatusEncoder
+from latency_governor import LatencyGovernor
+
+
+class NullSink():
+    """丢弃所有数据的串口替身"""
+
+    is_open = True
+
+    def __init__(self):
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+def open_sink(name):
+    if name == "null":
+        return NullSink()
+    import serial
+    return serial.serial_for_url(name if "://" in name else "loop://", timeout=0)
+
+
+def video_frames(path):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"无法打开视频: {path}")
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+def synthetic_frames(count, width, height, seed=0):
+    """生成带移动色块的噪声帧，用于没有录像的机器"""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for n in range(count):
+        frame = base.copy()
+        x = int((n * 7) % max(width - 120, 1))
+        cv2.rectangle(frame, (x, height // 3), (x + 120, height // 3 + 160), (60, 120, 200), -1)
+        yield frame
+
+
+def synthetic_landmarks(n, width, height):
+    """--no-detect 时代替 MediaPipe 输出的关键点，手指周期性弯曲/伸直"""
+    rng = np.random.default_rng(n)
+    landmarks = rng.uniform(0, 1, (1, 21, 3)).astype(np.float32)
+    landmarks *= np.array([width, height, width], dtype=np.float32)
+    if (n // 15) % 2:
+        landmarks[0, [8, 12, 16, 20], 1] = landmarks[0, [6, 10, 14, 18], 1] + 10
+    return landmarks, np.array([n % 2], dtype=np.int8)
+
+
+class StageTimer():
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        result = {}
+        for stage, values in self.samples.items():
+            ms = np.asarray(values) * 1000
+            result[stage] = {
+                "count": int(ms.size),
+                "mean_ms": round(float(ms.mean()), 4),
+                "p50_ms": round(float(np.percentile(ms, 50)), 4),
+                "p95_ms": round(float(np.percentile(ms, 95)), 4),
+                "p99_ms": round(float(np.percentile(ms, 99)), 4),
+            }
+        return result
+
+
+def run_benchmark(frames, args):
+    detector = None
+    if not args.no_detect:
+        from hand_detector import HandDetector
+        detector = HandDetector(maxHands=args.max_hands, detectionCon=0.7, roi_tracking=args.roi)
+
+    sink = open_sink(args.sink)
+    governor = LatencyGovernor(target_fps=args.target_fps) if args.governor else None
+    finger_filter = make_filter(args.filter or f"window:{args.window}:{args.threshold}")
+    encoder = StatusEncoder(binary=args.protocol == "binary" or args.angles)
+    calibration = AngleCalibration()
+    streamer = AngleStreamer(encoder, bytes_per_second=args.baud / 10 / 2) if args.angles else None
+    timer = StageTimer()
+    clock = time.perf_counter
+
+    frame_count = 0
+    processed = 0
+    current_skip = 0
+    commands = 0
+    bytes_sent = 0
+    start = clock()
+
+    frames = iter(frames)
+    while args.max_frames <= 0 or frame_count < args.max_frames:
+        t0 = clock()
+        frame = next(frames, None)
+        if frame is None:
+            break
+        timer.add("read", clock() - t0)
+
+        frame_count += 1
+        current_skip += 1
+        skip_frames = governor.skip_frames if governor is not None else args.skip_frames
+        if current_skip <= skip_frames:
+            continue
+        current_skip = 0
+        processed += 1
+        t_frame = clock()
+
+        t0 = clock()
+        if frame.shape[1] > args.width or frame.shape[0] > args.height:
+            frame = cv2.resize(frame, (args.width, args.height))
+        frame = cv2.flip(frame, 1)
+        timer.add("preprocess", clock() - t0)
+
+        t0 = clock()
+        if detector is not None:
+            if governor is not None:
+                detector.inference_scale = governor.inference_scale
+            detector.findHands(frame, draw=False)
+            landmarks, handedness = detector.findLandmarks(frame)
+        else:
+            landmarks, handedness = synthetic_landmarks(frame_count, frame.shape[1], frame.shape[0])
+        timer.add("detect", clock() - t0)
+
+        # 分类和时间滤波（滤波器内部分类）
+        t0 = clock()
+        if len(landmarks) > 0:
+            changed = finger_filter.update(landmarks[0], int(handedness[0]), frame_count / args.target_fps)
+        else:
+            changed = finger_filter.update(None, UNKNOWN_HAND, frame_count / args.target_fps)
+        timer.add("filter", clock() - t0)
+
+        if streamer is not None:
+            # 比例跟随模式：按模拟的相机时钟限速，与机器快慢无关
+            t0 = clock()
+            data = None
+            if len(landmarks) > 0:
+                targets = calibration.to_pwm(flexion_angles(landmarks[0]))
+                data = streamer.update(targets, frame_count / args.target_fps)
+            timer.add("angles", clock() - t0)
+            if data:
+                t0 = clock()
+                sink.write(data)
+                sink.flush()
+                sink.reset_input_buffer()
+                timer.add("serial", clock() - t0)
+                commands += 1
+                bytes_sent += len(data)
+        elif changed:
+            t0 = clock()
+            data = encoder.encode(format_finger_status(finger_filter.state))
+            sink.write(data)
+            sink.flush()
+            sink.reset_input_buffer()  # loop:// 不读走会一直累积
+            timer.add("serial", clock() - t0)
+            commands += 1
+            bytes_sent += len(data)
+
+        timer.add("total", clock() - t_frame)
+        if governor is not None:
+            governor.update(clock() - t_frame)
+
+    elapsed = clock() - start
+    sink.close()
+    return {
+        "config": {
+            "source": args.video or f"synthetic:{args.synthetic}",
+            "width": args.width,
+            "height": args.height,
+            "skip_frames": args.skip_frames,
+            "filter": finger_filter.describe(),
+            "detector": "none" if detector is None else "mediapipe",
+            "roi_tracking": bool(args.roi),
+            "governor": bool(args.governor),
+            "sink": args.sink,
+            "protocol": "binary" if args.angles else args.protocol,
+            "angles": bool(args.angles),
+        },
+        "platform": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "opencv": cv2.__version__,
+        },
+        "frames_read": frame_count,
+        "frames_processed": processed,
+        "elapsed_s": round(elapsed, 4),
+        "input_fps": round(frame_count / elapsed, 2) if elapsed > 0 else 0.0,
+        "processed_fps": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        "commands_sent": commands,
+        "bytes_sent": bytes_sent,
+        "stages": timer.summary(),
+        "angle_stream": None if streamer is None else {
+            "frames": streamer.frames,
+            "keyframes": streamer.keyframes,
+            "suppressed": streamer.suppressed,
+            "limited": streamer.limited,
+            # 按模拟相机时钟折算的平均线路占用
+            "bytes_per_s": round(streamer.bytes / (frame_count / args.target_fps), 2) if frame_count else 0.0,
+            "link_bytes_per_s": args.baud / 10,
+        },
+        "governor": None if governor is None else {
+            "skip_frames": governor.skip_frames,
+            "inference_scale": governor.inference_scale,
+            "average_ms": round((governor.average or 0.0) * 1000, 4),
+        },
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="手势识别流水线无界面基准测试")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="录制的视频文件")
+    source.add_argument("--synthetic", type=int, metavar="N", help="生成N帧合成画面")
+    parser.add_argument("--width", type=int, default=640, help="推理宽度 (默认640)")
+    parser.add_argument("--height", type=int, default=480, help="推理高度 (默认480)")
+    parser.add_argument("--skip-frames", type=int, default=1, help="每处理1帧前跳过的帧数 (默认1)")
+    parser.add_argument("--window", type=int, default=2, help="平滑窗口大小 (默认2)")
+    parser.add_argument("--threshold", type=int, default=1, help="窗口内弯曲帧数阈值 (默认1)")
+    parser.add_argument("--filter", help="手指状态滤波设置，如 hysteresis:0.05:0.05（默认按 --window/--threshold 的滑动窗口）")
+    parser.add_argument("--max-hands", type=int, default=1)
+    parser.add_argument("--max-frames", type=int, default=0, help="最多读取的帧数，0表示不限")
+    parser.add_argument("--no-detect", action="store_true", help="不运行MediaPipe，使用合成关键点")
+    parser.add_argument("--roi", action="store_true", help="启用ROI跟踪模式")
+    parser.add_argument("--governor", action="store_true", help="用调速器代替固定的 --skip-frames")
+    parser.add_argument("--target-fps", type=float, default=30.0, help="调速器目标帧率 (默认30)")
+    parser.add_argument("--sink", default="null", help="串口替身: null 或 loop:// 等pyserial URL")
+    parser.add_argument("--protocol", choices=["ascii", "binary"], default="ascii", help="串口编码方式")
+    parser.add_argument("--angles", action="store_true", help="比例跟随模式：发送连续PWM目标值（二进制差量帧）")
+    parser.add_argument("--baud", type=int, default=115200, help="比例跟随模式限流所按的波特率 (默认115200)")
+    parser.add_argument("--output", help="结果JSON写入文件（默认输出到标准输出）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.video:
+        frames = video_frames(args.video)
+    else:
+        frames = synthetic_frames(args.synthetic, args.width, args.height)
+
+    report = run_benchmark(frames, args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""串口协议吞吐基准（pty 虚拟串口对，仅限 Linux/macOS）
+
+上位机一端用 pyserial 打开 pty 从设备写入，另一端在线程中读取并解码，
+比较 ASCII 与二进制帧的编码/解码速度、每条消息字节数和给定波特率下的线路耗时。
+解码结果逐条与发送内容比对，确认计时的是完整传输；编解码的正确性由 tests/test_hand_protocol.py 检查。
+
+示例:
+    python bench_protocol.py --messages 20000 --baud 9600 115200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import serial
+
+from hand_protocol import FrameDecoder, StatusEncoder, mask_to_status
+
+
+def random_statuses(count, seed=0):
+    rng = random.Random(seed)
+    return ["".join(rng.choice("01") for _ in range(6)) for _ in range(count)]
+
+
+def open_pty_pair():
+    master, slave = os.openpty()
+    port = serial.Serial(os.ttyname(slave), timeout=0)
+    os.close(slave)
+    return master, port
+
+
+def run_mode(statuses, binary):
+    master, port = open_pty_pair()
+    encoder = StatusEncoder(binary=binary)
+    payloads = [encoder.encode(s) for s in statuses]
+    total_bytes = sum(len(p) for p in payloads)
+
+    received = []
+    done = threading.Event()
+
+    def reader():
+        decoder = FrameDecoder()
+        pending = b""
+        while len(received) < len(statuses):
+            data = os.read(master, 4096)
+            if binary:
+                received.extend(mask_to_status(f.mask) for f in decoder.feed(data))
+            else:
+                pending += data
+                *lines, pending = pending.split(b"\n")
+                received.extend(line.decode("ascii") for line in lines)
+        done.set()
+
+    thread = threading.Thread(target=reader, daemon=True)
+    start = time.perf_counter()
+    thread.start()
+    encode_start = time.perf_counter()
+    for status in statuses:
+        encoder.encode(status)
+    encode_s = time.perf_counter() - encode_start
+    for payload in payloads:
+        port.write(payload)
+    port.flush()
+    done.wait(30)
+    elapsed = time.perf_counter() - start
+    port.close()
+    os.close(master)
+
+    assert received == statuses, "经pty传输后解码结果不一致"
+    return {
+        "bytes_per_message": total_bytes / len(statuses),
+        "encode_us_per_message": encode_s / len(statuses) * 1e6,
+        "pty_messages_per_s": len(statuses) / elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="串口协议吞吐基准")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--baud", type=int, nargs="+", default=[9600, 115200],
+                        help="估算线路耗时所用的波特率")
+    args = parser.parse_args(argv)
+
+    statuses = random_statuses(args.messages)
+    report = {}
+    for name, binary in (("ascii", False), ("binary", True)):
+        result = run_mode(statuses, binary)
+        # 8N1 每字节10位
+        result["wire_ms_per_message"] = {
+            str(baud): round(result["bytes_per_message"] * 10 / baud * 1000, 3) for baud in args.baud}
+        report[name] = {k: round(v, 3) if isinstance(v, float) else v for k, v in result.items()}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,62 +5,94 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout
                              QWidget, QPushButton, QComboBox, QLabel, 
                              QGroupBox, QCheckBox, QTextEdit, QSpinBox)
 from PyQt5.QtCore import QThread, pyqtSignal
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serial_transport import SerialTransport
+from gesture_sequencer import GestureSequencer, list_timelines, load_timeline
+from finger_angles import AngleCalibration
+from hand_protocol import StatusEncoder, negotiate_binary
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GESTURE_DIR = os.path.join(BASE_DIR, "gestures")
+CALIBRATION_PATH = os.path.join(BASE_DIR, "finger_calibration.json")
+BINARY_BAUDRATE = 115200
 
 class SerialThread(QThread):
     data_received = pyqtSignal(str)
     connection_status = pyqtSignal(bool)
+    protocol_changed = pyqtSignal(bool)  # 协商结果：是否使用二进制协议
     
     def __init__(self, port=None, baudrate=9600):
         super().__init__()
         self.port = port
         self.baudrate = baudrate
-        self.serial_conn = None
-        self.running = False
+        self.encoder = StatusEncoder()  # 默认ASCII协议，协商成功后切换为二进制帧
+        # 阻塞读取，有数据立即回调，空闲时不占CPU；拔线后自动重连
+        # 每次打开串口后在本线程中协商二进制协议（重连时下位机已复位为ASCII）
+        self.transport = SerialTransport(
+            port=port,
+            baudrate=baudrate,
+            on_line=lambda line, received_at: self.data_received.emit(line),
+            on_state=self._on_state,
+            on_open=self._negotiate
+        )
         
     def run(self):
         if not self.port:
             self.connection_status.emit(False)
             return
-            
-        try:
-            self.serial_conn = serial.Serial(
-                port=self.port,
-                baudrate=self.baudrate,
-                timeout=1
-            )
-            self.connection_status.emit(True)
-            self.running = True
-            
-            while self.running:
-                if self.serial_conn.in_waiting:
-                    data = self.serial_conn.readline().decode('utf-8').strip()
-                    if data:
-                        self.data_received.emit(data)
-                        
-        except Exception as e:
-            self.connection_status.emit(False)
-            self.data_received.emit(f"Error: {str(e)}")
+        self.transport.run()
+    
+    def _negotiate(self, ser):
+        self.encoder.binary = False
+        self.protocol_changed.emit(False)
+        self.encoder.binary = negotiate_binary(ser, BINARY_BAUDRATE)
+        if self.encoder.binary:
+            self.data_received.emit(f"已切换到二进制协议 {BINARY_BAUDRATE}bps")
+            self.protocol_changed.emit(True)
+    
+    def _on_state(self, connected, message):
+        self.connection_status.emit(connected)
+        if not connected:
+            self.data_received.emit(f"Error: {message}")
             
     def stop(self):
-        self.running = False
-        if self.serial_conn and self.serial_conn.is_open:
-            self.serial_conn.close()
+        self.transport.stop()
         self.wait()
         
     def send_data(self, data):
-        if self.serial_conn and self.serial_conn.is_open:
-            try:
-                self.serial_conn.write((data + '\n').encode('utf-8'))
-            except Exception as e:
-                self.data_received.emit(f"Send Error: {str(e)}")
+        """发送6位手势，按当前协议编码"""
+        try:
+            self.transport.write(self.encoder.encode(data))
+        except Exception as e:
+            self.data_received.emit(f"Send Error: {str(e)}")
+    
+    def send_targets(self, targets):
+        """二进制协议下发送6路PWM目标值"""
+        try:
+            self.transport.write(self.encoder.encode_targets(targets))
+        except Exception as e:
+            self.data_received.emit(f"Send Error: {str(e)}")
 
 class HandControlApp(QMainWindow):
+    sequence_step = pyqtSignal(str, str)  # 序列播放线程 -> 界面线程 (手势, 说明)
+    sequence_finished = pyqtSignal()
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("机械手控制工具")
         self.setGeometry(100, 100, 600, 500)
         
         self.serial_thread = None
+        # 手势序列在独立线程中按时间线发送，界面只负责显示
+        # 二进制协议下带过渡时间的步按插值后的PWM目标值平滑过渡，使用与主程序相同的标定
+        calibration = AngleCalibration.load(CALIBRATION_PATH) \
+            if os.path.exists(CALIBRATION_PATH) else AngleCalibration()
+        self.sequencer = GestureSequencer(self.send_sequence_gesture, on_step=self._on_sequence_step,
+                                          on_finished=self.sequence_finished.emit,
+                                          pwm_ranges=calibration.pwm_ranges)
+        self.sequence_step.connect(self.show_sequence_step)
+        self.sequence_finished.connect(self.stop_sequence)
         self.init_ui()
         
     def init_ui(self):
@@ -144,11 +176,24 @@ class HandControlApp(QMainWindow):
         preset_layout.addWidget(self.point_btn)
         preset_layout.addWidget(self.ok_btn)
         
+        # 手势序列（gestures 目录下的时间线文件）
+        sequence_layout = QHBoxLayout()
+        self.sequence_combo = QComboBox()
+        self.timelines = list_timelines(GESTURE_DIR)
+        self.sequence_combo.addItems(list(self.timelines))
+        self.play_btn = QPushButton("播放序列")
+        self.play_btn.clicked.connect(self.toggle_sequence)
+        self.play_btn.setEnabled(False)
+        sequence_layout.addWidget(QLabel("手势序列:"))
+        sequence_layout.addWidget(self.sequence_combo)
+        sequence_layout.addWidget(self.play_btn)
+        
         finger_layout.addLayout(wrist_layout)
         finger_layout.addLayout(fingers_layout)
         finger_layout.addLayout(speed_layout)
         finger_layout.addWidget(self.send_btn)
         finger_layout.addLayout(preset_layout)
+        finger_layout.addLayout(sequence_layout)
         finger_group.setLayout(finger_layout)
         
         # 日志区域
@@ -195,12 +240,15 @@ class HandControlApp(QMainWindow):
         self.serial_thread = SerialThread(port, baudrate)
         self.serial_thread.data_received.connect(self.handle_received_data)
         self.serial_thread.connection_status.connect(self.update_connection_status)
+        self.serial_thread.protocol_changed.connect(self.update_protocol)
         self.serial_thread.start()
         
         self.connect_btn.setText("断开")
         self.send_btn.setEnabled(True)
+        self.play_btn.setEnabled(bool(self.timelines))
         
     def disconnect_serial(self):
+        self.stop_sequence()
         if self.serial_thread:
             self.serial_thread.stop()
             self.serial_thread = None
@@ -208,6 +256,7 @@ class HandControlApp(QMainWindow):
         self.connect_btn.setText("连接")
         self.status_label.setText("状态: 未连接")
         self.send_btn.setEnabled(False)
+        self.play_btn.setEnabled(False)
         
     def update_connection_status(self, connected):
         if connected:
@@ -217,6 +266,9 @@ class HandControlApp(QMainWindow):
             self.status_label.setText("状态: 连接失败")
             self.log_text.append("连接失败")
             
+    def update_protocol(self, binary):
+        self.sequencer.send_targets = self.send_sequence_targets if binary else None
+        
     def handle_received_data(self, data):
         self.log_text.append(f"接收: {data}")
         
@@ -252,6 +304,42 @@ class HandControlApp(QMainWindow):
         self.thumb_check.setChecked(gesture[4] == '1')
         self.pinky_check.setChecked(gesture[5] == '1')
         
+    def toggle_sequence(self):
+        if self.sequencer.running:
+            self.stop_sequence()
+            return
+        name = self.sequence_combo.currentText()
+        try:
+            timeline = load_timeline(self.timelines[name])
+        except (OSError, ValueError, KeyError) as e:
+            self.log_text.append(f"错误: 无法加载序列 {name}: {e}")
+            return
+        self.sequencer.play(timeline)
+        self.play_btn.setText("停止序列")
+        self.log_text.append(f"播放序列: {timeline.name} ({timeline.mode}, {len(timeline.steps)}步)")
+    
+    def stop_sequence(self):
+        if self.sequencer.running:
+            self.sequencer.stop()
+            self.log_text.append("序列已停止")
+        self.play_btn.setText("播放序列")
+    
+    def send_sequence_gesture(self, gesture):
+        # 在序列播放线程中调用，串口写入本身是线程安全的
+        if self.serial_thread:
+            self.serial_thread.send_data(gesture)
+    
+    def send_sequence_targets(self, targets):
+        if self.serial_thread:
+            self.serial_thread.send_targets(targets)
+    
+    def _on_sequence_step(self, index, step):
+        self.sequence_step.emit(step.pattern, step.label or f"第{index + 1}步")
+    
+    def show_sequence_step(self, gesture, label):
+        self.set_preset(gesture)
+        self.log_text.append(f"发送: {gesture} ({label})")
+        
     def clear_log(self):
         self.log_text.clear()
         
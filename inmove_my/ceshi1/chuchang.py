@@ -1,20 +1,26 @@
 import sys
-import serial
+from collections import deque
 from serial.tools import list_ports
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QPushButton, 
                             QComboBox, QTextEdit, QGroupBox)
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, pyqtSignal
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serial_transport import SerialTransport
 import matplotlib
 matplotlib.use('Qt5Agg')
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
 
 class SerialVisualizer(QMainWindow):
+    line_received = pyqtSignal(str)  # 串口线程 -> 界面线程
+
     def __init__(self):
         super().__init__()
-        self.serial_port = None
-        self.received_data = []
+        self.transport = None
+        self.received_data = deque(maxlen=1000)  # 只保留最近的接收行，长时间运行不增长
+        self.line_received.connect(self.handle_received_line)
         
         # 初始化UI
         self.setWindowTitle("串口通信可视化")
@@ -93,9 +99,9 @@ class SerialVisualizer(QMainWindow):
     
     def toggle_connection(self):
         """切换串口连接状态"""
-        if self.serial_port and self.serial_port.is_open:
-            self.serial_port.close()
-            self.serial_port = None
+        if self.transport:
+            self.transport.stop()
+            self.transport = None
             self.connect_btn.setText("连接")
             self.log_message("串口已断开")
         else:
@@ -105,15 +111,22 @@ class SerialVisualizer(QMainWindow):
                 return
             
             try:
-                self.serial_port = serial.Serial(port, 9600, timeout=1)
+                self.transport = SerialTransport(
+                    port=port,
+                    baudrate=9600,
+                    on_line=lambda line, received_at: self.line_received.emit(line),
+                    on_state=lambda connected, message: self.line_received.emit(f"[串口] {message}")
+                )
+                self.transport.open()
+                self.transport.start()
                 self.connect_btn.setText("断开")
-                self.log_message(f"已连接到 {port}")
             except Exception as e:
+                self.transport = None
                 self.log_message(f"连接失败: {str(e)}")
     
     def send_data(self):
         """发送串口数据"""
-        if not (self.serial_port and self.serial_port.is_open):
+        if not self.transport:
             self.log_message("错误：请先连接串口")
             return
         
@@ -123,12 +136,19 @@ class SerialVisualizer(QMainWindow):
             return
         
         try:
-            self.serial_port.write(data.encode())
+            if not self.transport.write(data.encode()):
+                self.log_message("发送失败: 串口未打开")
+                return
             self.log_message(f"发送: {data}")
             self.update_plot()
         except Exception as e:
             self.log_message(f"发送失败: {str(e)}")
     
+    def handle_received_line(self, line):
+        """显示下位机返回的数据"""
+        self.received_data.append(line)
+        self.log_message(f"接收: {line}")
+    
     def update_plot(self):
         """更新可视化图表"""
         self.figure.clear()
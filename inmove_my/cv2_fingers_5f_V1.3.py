@@ -1,126 +1,39 @@
 import cv2
-import mediapipe as mp
 import time
 import serial
 import threading
-from collections import deque
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout, 
                              QHBoxLayout, QWidget, QLabel, QFrame, QComboBox)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
-from PyQt5.QtGui import QImage, QPixmap
-from test7 import get_frame_generator
+from PyQt5.QtGui import QImage, QPixmap, QPainter
+from test7 import HEIGHT as VIZ_HEIGHT, WIDTH as VIZ_WIDTH, MusicVisualizer
+from hud_overlay import HudOverlay
+from hand_detector import HandDetector
+from finger_state import HANDEDNESS_LABELS, UNKNOWN_HAND, format_finger_status
+from finger_filters import make_filter
+from finger_angles import AngleCalibration, AngleStreamer, flexion_angles
+from hand_protocol import StatusEncoder, describe_bytes, negotiate_binary
+from serial_writer import CoalescingSerialWriter
+from serial_transport import SerialTransport
+from frame_pipeline import DropOldestQueue, LatestFrameGrabber
+from frame_presenter import FramePresenter, PresentedFrame
+from session_recorder import SessionRecorder
+from latency_governor import LatencyGovernor
+from metrics import AckTracker, Metrics
+from music_scheduler import ActuationEstimator, MusicScheduler, compile_score
+from audio_stream import AudioStream
+from live_instrument import LiveInstrument
+from gesture_sequencer import GestureSequencer, GestureTimeline, load_timeline
+from score_loader import ScoreError, from_lists, load_score
+from event_bus import DEBUG, ERROR, FINGER, GOVERNOR, SERIAL_RX, SERIAL_TX, STATUS, VOLUME, EventBus, coalesce
+import os
 import sys
-import numpy as np
-from PIL import Image, ImageDraw, ImageFont
 import traceback
 import pygame
-from pygame import mixer
-
-class HandDetector():
-    def __init__(self, mode=False, maxHands=1, detectionCon=0.7, trackCon=0.5):
-        self.mode = mode
-        self.maxHands = maxHands
-        self.detectionCon = detectionCon
-        self.trackCon = trackCon
-
-        self.mpHands = mp.solutions.hands
-        self.hands = self.mpHands.Hands(
-            static_image_mode=self.mode,
-            max_num_hands=self.maxHands,
-            min_detection_confidence=self.detectionCon,
-            min_tracking_confidence=self.trackCon
-        )
-        self.mpDraw = mp.solutions.drawing_utils
-        self.handedness = None  # 存储手的左右信息
-
-    def findHands(self, frame, draw=True):
-        imgRGB = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        self.results = self.hands.process(imgRGB)
-        
-        if self.results.multi_hand_landmarks:
-            self.handedness = []
-            for hand_landmarks, handedness in zip(self.results.multi_hand_landmarks, self.results.multi_handedness):
-                if draw:
-                    self.mpDraw.draw_landmarks(frame, hand_landmarks, self.mpHands.HAND_CONNECTIONS)
-                # 获取手的左右信息
-                self.handedness.append(handedness.classification[0].label)
-        return frame
-    
-    def findPosition(self, frame, handNo=0, draw=False):
-        lmList = []
-        handType = None
-
-        if self.results.multi_hand_landmarks:
-            if handNo < len(self.results.multi_hand_landmarks):
-                myHand = self.results.multi_hand_landmarks[handNo]
-                if self.handedness and handNo < len(self.handedness):
-                    handType = self.handedness[handNo]
-
-                for id, lm in enumerate(myHand.landmark):
-                    h, w, c = frame.shape
-                    cx, cy = int(lm.x * w), int(lm.y * h)
-
-                    lmList.append([id, cx, cy])
-
-                    if draw and id == 0:
-                        cv2.circle(frame, (cx, cy), 10, (255, 0, 255), -1)
-        return lmList, handType
-
-def serial_monitor(ser, status_signal):
-    """独立线程监听Arduino串口输出"""
-    while True:
-        try:
-            if ser.in_waiting > 0:
-                arduino_data = ser.readline().decode('utf-8').strip()
-                if arduino_data:
-                    status_signal.emit(f"[Arduino]: {arduino_data}")
-        except Exception as e:
-            status_signal.emit(f"串口连接异常: {str(e)}")
-            break
-        time.sleep(0.01)
-
-def draw_text_with_chinese(frame, text, position, font_size=16, color=(255, 255, 0)):
-    """使用PIL绘制中文文本（适配小屏幕字体）"""
-    try:
-        # 将OpenCV的BGR格式转为PIL的RGB格式
-        img_pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        draw = ImageDraw.Draw(img_pil)
-        
-        # 设置中文字体路径
-        font_path = None
-        try:
-            # Windows系统默认中文字体
-            font_path = "C:/Windows/Fonts/simhei.ttf"
-            font = ImageFont.truetype(font_path, font_size, encoding="utf-8")
-        except:
-            try:
-                # Linux系统默认中文字体
-                font_path = "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc"
-                font = ImageFont.truetype(font_path, font_size, encoding="utf-8")
-            except:
-                try:
-                    # macOS系统默认中文字体
-                    font_path = "/System/Library/Fonts/PingFang.ttc"
-                    font = ImageFont.truetype(font_path, font_size, encoding="utf-8")
-                except:
-                    # 如果都找不到，使用默认字体
-                    font = ImageFont.load_default()
-                    print("警告: 未找到中文字体，使用默认字体")
-        
-        # 绘制文本
-        draw.text(position, text, font=font, fill=(color[2], color[1], color[0]))  # PIL使用RGB顺序
-        
-        # 将PIL图像转回OpenCV格式
-        return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
-    except Exception as e:
-        print(f"文本绘制错误: {e}")
-        # 出错时返回原始帧
-        return frame
 
 class VideoThread(QThread):
     """视频处理线程"""
-    update_frame = pyqtSignal(np.ndarray)
-    update_status = pyqtSignal(str)
+    update_frame = pyqtSignal(object)  # PresentedFrame，已缩放为显示尺寸的 RGB32 图像
     
     def __init__(self, detector, ser, parent=None):
         super().__init__(parent)
@@ -130,34 +43,53 @@ class VideoThread(QThread):
         self.running = False
         self.prev_finger_state = "000000"  # 初始手指状态
         self.finger_changed = False
-        self.demo_mode = False
+        # 演示模式：序列播放线程按时间线发送手势，检测到手时由实时跟踪接管
         self.demo_patterns = ["000000","001111","000111","000011","000010","000000","011111","000000"]
-        self.demo_index = 0
-        self.demo_timer = 0
         self.demo_interval = 1.5  # 秒
+        self.demo_timeline_path = os.path.join("gestures", "demo.json")
+        self.sequencer = GestureSequencer(self.send_finger_status, on_step=self._on_sequence_step)
+        self.music_scheduler = None  # 自动演奏：按乐谱提前发送指令（MainWindow 设置）
         self.hand = [["手腕", False], ["食指", False], ["中指", False], 
                     ["无名指", False], ["拇指", False], ["小指", False]]
         self.frame_count = 0
         self.PROCESSING_INTERVAL = 1
-        self.WINDOW_SIZE = 2
-        self.finger_history = {
-            0: deque(maxlen=self.WINDOW_SIZE),  # 手腕
-            1: deque(maxlen=self.WINDOW_SIZE),  # 食指
-            2: deque(maxlen=self.WINDOW_SIZE),  # 中指
-            3: deque(maxlen=self.WINDOW_SIZE),  # 无名指
-            4: deque(maxlen=self.WINDOW_SIZE),  # 拇指
-            5: deque(maxlen=self.WINDOW_SIZE)   # 小指
-        }
-        for i in range(self.WINDOW_SIZE):
-            for finger in self.finger_history:
-                self.finger_history[finger].append(False)
+        # 手指状态时间滤波，每帧评估（可选设置见 finger_filters.py，用 filter_eval.py 比较）
+        self.finger_filter = make_filter("hysteresis:0.05:0.05")
         
         # 视频优化参数
         self.resize_frame = True  # 是否调整帧尺寸
         self.target_width = 640   # 目标宽度（小屏幕优化）
         self.target_height = 480  # 目标高度
-        self.skip_frames = 1      # 跳帧处理，每N帧处理1帧
         self.current_skip = 0
+        # 调速器根据处理耗时决定跳帧数和推理分辨率
+        self.governor = LatencyGovernor(target_fps=30.0)
+        self.governor_status = self.governor.summary()
+        self.hud = HudOverlay()   # 缓存字体和文字的HUD叠加层
+        self.presenter = FramePresenter()  # 在本线程缩放/转换显示帧，界面线程只绘制
+        self.events = EventBus()  # 状态事件，由界面定时取出显示，不在本线程更新界面
+        self.metrics = Metrics()  # 各阶段延迟直方图和计数（--metrics 时可通过HTTP/CSV查看）
+        self.acks = AckTracker(self.metrics)  # 串口读线程收到 "Received:" 时配对计时
+        self.grabber = None
+        self.render_queue = None
+        self.last_command_latency = None  # 最近一次采集到发送指令的延迟（秒）
+        self.last_sent_bytes = b""        # 最近一次写入串口的原始字节
+        self.encoder = StatusEncoder()    # 默认ASCII协议，协商成功后切换为二进制帧
+        self.writer = None                # 异步串口写线程（attach_writer 设置）
+        self.instrument = None            # 实时乐器（--instrument），手指弯曲时发出对应的音
+        
+        # 比例跟随模式：按弯曲角度连续控制舵机（需要二进制协议）
+        self.angle_mode = False
+        self.calibration_path = "finger_calibration.json"
+        self.calibration = AngleCalibration.load(self.calibration_path) \
+            if os.path.exists(self.calibration_path) else AngleCalibration()
+        self.sequencer.pwm_ranges = self.calibration.pwm_ranges  # 演示过渡插值使用标定的PWM范围
+        self.streamer = None
+        self.last_angles = None
+        
+        # 会话录制（用于离线回放调参）
+        self.record_sessions = False
+        self.session_dir = "sessions"
+        self.recorder = None
         
     def run(self):
         try:
@@ -167,39 +99,139 @@ class VideoThread(QThread):
             # 打开摄像头（添加错误处理）
             cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
             if not cap.isOpened():
-                self.update_status.emit("摄像头打开失败")
+                self.events.publish(ERROR, "摄像头打开失败")
                 return
                 
             # 设置摄像头分辨率（小屏幕优化）
             cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.target_width)
             cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.target_height)
             cap.set(cv2.CAP_PROP_FPS, 30)
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # 尽量减少驱动端缓冲的旧帧
             
-            self.update_status.emit(f"系统就绪，正在检测手势...")
+            if self.record_sessions:
+                path = os.path.join(self.session_dir, time.strftime("session_%Y%m%d_%H%M%S.hrec"))
+                self.recorder = SessionRecorder(path, self.target_width, self.target_height)
+                self.events.publish(STATUS, f"会话录制: {path}")
+            
+            # 采集 -> 推理 -> 渲染 三级流水线，阶段之间只保留最新数据
+            self.grabber = LatestFrameGrabber(cap).start()
+            self.render_queue = DropOldestQueue(maxsize=1)
+            inference_thread = threading.Thread(target=self._inference_loop, daemon=True)
+            inference_thread.start()
+            
+            self.events.publish(STATUS, f"系统就绪，正在检测手势...")
 
+            # 渲染阶段：绘制关键点和HUD，不影响串口指令的决策
             while self.running:
-                # 演示模式处理
-                if self.demo_mode:
-                    current_time = time.time()
-                    if current_time - self.demo_timer > self.demo_interval:
-                        self.demo_timer = current_time
-                        pattern = self.demo_patterns[self.demo_index]
-                        self.send_finger_status(pattern)
-                        self.demo_index = (self.demo_index + 1) % len(self.demo_patterns)
-                        continue  # 跳过正常检测流程
+                packet = self.render_queue.get(timeout=0.1)
+                if packet is None:
+                    if not inference_thread.is_alive():
+                        break
+                    continue
+                frame = packet.frame
+                render_start = time.perf_counter()
+                
+                # 绘制手部关键点和ROI跟踪区域
+                self.detector.drawHands(frame, packet.results)
+                if packet.roi is not None:
+                    x0, y0, x1, y1 = packet.roi
+                    cv2.rectangle(frame, (x0, y0), (x1 - 1, y1 - 1), (255, 255, 0), 1)
                 
-                ret, frame = cap.read()
-                if not ret:
-                    self.update_status.emit("读取帧失败")
-                    break
+                # 计算并显示实际FPS（字体大小调整为18）
+                hud_items = []
+                currentTime = time.time()
+                if prevTime != 0:
+                    fps = 1 / (currentTime - prevTime)
+                    hud_items.append((f"实际FPS: {int(fps)}", (10, 50), 18, (255, 0, 255)))
+                prevTime = currentTime
+                
+                # 显示处理参数（字体大小调整为18）
+                hud_items.append((f"滤波: {self.finger_filter.describe()}", (10, 80), 18, (255, 255, 0)))
+                hud_items.append((f"帧计数: {packet.frame_count}", (10, 110), 18, (255, 255, 0)))
+                if self.last_command_latency is not None:
+                    hud_items.append((f"指令延迟: {self.last_command_latency * 1000:.0f}ms", (10, 20), 18, (255, 255, 0)))
+                hud_items.append((self.governor_status, (10, frame.shape[0] - 30), 16, (255, 255, 0)))
+                if self.writer is not None:
+                    w = self.writer
+                    write_ms = f"{w.last_latency * 1000:.1f}ms" if w.last_latency is not None else "-"
+                    hud_items.append((f"串口: 发送{w.sent} 合并{w.coalesced} 丢弃{w.dropped} 写入{write_ms}",
+                                      (10, frame.shape[0] - 55), 16, (255, 255, 0)))
+                if self.angle_mode and self.streamer is not None:
+                    hud_items.append((self.streamer.summary(), (10, frame.shape[0] - 80), 16, (255, 255, 0)))
+                if self.music_scheduler is not None:
+                    hud_items.append((self.music_scheduler.summary(), (10, frame.shape[0] - 105), 16, (255, 255, 0)))
+
+                # 添加状态显示（字体大小调整为16，间距缩小）
+                y_offset = 140
+                # 显示手的左右信息
+                if packet.hand_type:
+                    hud_items.append((f"检测到: {packet.hand_type}", (10, y_offset), 16, (255, 255, 255)))
+                    y_offset += 30
+                
+                for i, (name, state) in enumerate(packet.hand_state):
+                    color = (0, 255, 0) if state else (0, 0, 255)
+                    hud_items.append((
+                        f"{name}: {'弯曲' if state else '伸直'}", 
+                        (10, y_offset + i * 30),  # 行间距缩小
+                        16,  # 字体大小减小
+                        color
+                    ))
+
+                # 所有文字一次性叠加到帧上
+                frame = self.hud.render(frame, hud_items)
+
+                # 缩放到显示尺寸并转换为RGB32，写入复用缓冲区后交给界面线程直接绘制
+                presented = self.presenter.present(frame)
+                self.metrics.observe("render", time.perf_counter() - render_start)
+                if presented is not None:
+                    height, width = presented.buffer.shape[:2]
+                    presented.image = QImage(presented.buffer.data, width, height, width * 4, QImage.Format_RGB32)
+                    presented.capture_time = packet.capture_time
+                    self.update_frame.emit(presented)
+                else:
+                    self.metrics.count("frames_dropped_display")
+
+            self.running = False
+            inference_thread.join(timeout=1)
+            self.grabber.stop()
+            cap.release()
+            if self.recorder is not None:
+                self.recorder.close()
+                self.recorder = None
+            self.events.publish(STATUS, "视频线程已停止")
+        except Exception as e:
+            self.events.publish(ERROR, f"视频线程异常: {str(e)}")
+            import traceback
+            print(traceback.format_exc())
+
+    def _inference_loop(self):
+        """推理阶段：取最新帧检测手势、分类并决定串口指令"""
+        try:
+            last_seq = 0
+            while self.running:
+                packet = self.grabber.read(last_seq, timeout=0.5)
+                if packet is None:
+                    if self.grabber.failed:
+                        self.events.publish(ERROR, "读取帧失败")
+                        break
+                    continue
+                if packet.seq - last_seq > 1 and last_seq:
+                    self.metrics.count("frames_missed", packet.seq - last_seq - 1)
+                last_seq = packet.seq
+                frame = packet.frame
                     
                 self.frame_count += 1
                 self.current_skip += 1
                 
                 # 跳帧处理，减少计算量
-                if self.current_skip <= self.skip_frames:
+                if self.current_skip <= self.governor.skip_frames:
+                    self.metrics.count("frames_skipped")
                     continue
                 self.current_skip = 0
+                process_start = time.perf_counter()
+                # capture: 从摄像头读出到推理线程开始处理的等待
+                self.metrics.observe("capture", process_start - packet.capture_time)
+                self.metrics.count("frames_processed")
                 
                 # 调整帧尺寸（如果原始尺寸过大）
                 if self.resize_frame and (frame.shape[1] > self.target_width or frame.shape[0] > self.target_height):
@@ -208,164 +240,314 @@ class VideoThread(QThread):
                 # 水平镜像画面（保持检测逻辑不变）
                 frame = cv2.flip(frame, 1)
                 
-                # 始终检测手部并绘制关键点
-                frame = self.detector.findHands(frame)
-                lmList, handType = self.detector.findPosition(frame)
+                # 始终检测手部，关键点留到渲染阶段绘制
+                self.detector.inference_scale = self.governor.inference_scale
+                stage_start = time.perf_counter()
+                frame = self.detector.findHands(frame, draw=False)
+                landmarks, handedness = self.detector.findLandmarks(frame)
+                self.metrics.observe("inference", time.perf_counter() - stage_start)
+                handType = HANDEDNESS_LABELS.get(int(handedness[0])) if len(handedness) else None
                 
-                # 每帧都检测手指状态，但只在必要时更新平均值
-                current_state = [False] * 6  # 初始化当前帧的手指状态
+                sent = b""
                 
-                if len(lmList) > 0: 
-                    j = 1
-                    
-                    for i in range(1, 6):
-                            if i == 1:  # 拇指检测
-                                # 根据左右手决定是否取反
-                                if (handType == "Left" and lmList[4][1] <= lmList[3][1]) or \
-                                   (handType == "Right" and lmList[4][1] > lmList[3][1]):
-                                    current_state[4] = True  # 拇指弯曲
-                            else:  # 其他四指检测
-                                finger_tip = i * 4
-                                finger_pip = i * 4 - 2
-                                
-                                if finger_tip < len(lmList) and finger_pip < len(lmList):
-                                    if lmList[finger_tip][2] > lmList[finger_pip][2]:
-                                        current_state[j] = True  # 手指弯曲
-                                
-                                if j == 3:
-                                    j += 2
-                                else:
-                                    j += 1
+                # 演示播放中检测到手：实时跟踪接管，刚接管时立即按当前状态发送一次
+                if len(landmarks) > 0 and self.sequencer.running and self.sequencer.preempt():
+                    self.events.publish(STATUS, "[演示] 检测到手，实时跟踪接管")
+                    if self.streamer is not None:
+                        self.streamer.invalidate()
+                    if not self.angle_mode:
+                        self.send_finger_status(format_finger_status(self.finger_filter.state))
+                live = not self.sequencer.active and not (self.music_scheduler is not None and self.music_scheduler.running)
                 
-                # 更新滑动窗口数据
-                for i in range(6):
-                    self.finger_history[i].append(current_state[i])
+                # 比例跟随模式：每帧计算弯曲角，变化明显的通道以差量帧发送
+                if self.angle_mode and live and len(landmarks) > 0:
+                    self.last_angles = flexion_angles(landmarks[0])
+                    data = self.streamer.update(self.calibration.to_pwm(self.last_angles), packet.capture_time)
+                    if data is not None and self.send_bytes(data, capture_time=packet.capture_time):
+                        sent = data
                 
-                # 每5帧计算一次平均值并决定最终状态
-                if self.frame_count % self.WINDOW_SIZE == 0:
-                    change = False
-                    threshold = 1  # 窗口大小为2时，只需1帧为True则认为弯曲
+                # 每帧分类并滤波，未检测到手时按全部伸直处理
+                stage_start = time.perf_counter()
+                if len(landmarks) > 0:
+                    changed = self.finger_filter.update(landmarks[0], int(handedness[0]), packet.capture_time)
+                else:
+                    changed = self.finger_filter.update(None, UNKNOWN_HAND, packet.capture_time)
+                self.metrics.observe("classify", time.perf_counter() - stage_start)
+                if changed:
+                    for i in changed:
+                        new_state = self.finger_filter.state[i]
+                        self.hand[i][1] = new_state
+                        self.events.publish(FINGER, f"[Python] Frame {self.frame_count}: {self.hand[i][0]}: {'弯曲' if new_state else '伸直'}",
+                                            finger=i, bent=new_state, frame=self.frame_count)
                     
-                    for i in range(6):
-                        # 计算平均值
-                        count_true = sum(self.finger_history[i])
-                        new_state = count_true > threshold
-                        
-                        # 如果状态变化，记录变化
-                        if new_state != self.hand[i][1]:
-                            self.hand[i][1] = new_state
-                            change = True
-                            self.update_status.emit(f"[Python] Frame {self.frame_count}: {self.hand[i][0]}: {'弯曲' if new_state else '伸直'}")
+                    # 实时乐器不依赖串口，直接在这里触发
+                    if self.instrument is not None:
+                        self.instrument.update(format_finger_status(self.finger_filter.state), packet.capture_time)
                     
                     # 如果状态变化，发送新命令
-                    if change and self.ser and self.ser.is_open:
-                        msg = ""
-                        for i in range(6):
-                            if self.hand[i][1]:
-                                msg += "1"
-                            else:
-                                msg += "0"
-
-                        msg = msg.strip()
+                    if self.ser and self.ser.is_open:
+                        msg = format_finger_status(self.finger_filter.state)
                         # 检测手指状态变化
                         current_state = msg
                         self.finger_changed = current_state != self.prev_finger_state
                         self.prev_finger_state = current_state
 
-                        print(f"finger stage: {current_state}, change: {self.finger_changed}")
+                        self.events.publish(DEBUG, f"finger stage: {current_state}, change: {self.finger_changed}")
 
-                        if self.parent() is not None:
-                            print(f"Parent exists - play_mode: {getattr(self.parent(), 'play_mode', False)}")
-                        else:
-                            print("Warning: Parent is None!")
+                        if self.parent() is None:
+                            self.events.publish(DEBUG, "Warning: Parent is None!")
 
                         # 如果手指状态变化且处于演奏模式，发送信号
                         # if self.finger_changed and hasattr(self.parent(), 'play_mode') and self.parent().play_mode:
                         if self.finger_changed and hasattr(self, '_main_window'):
-                            print(f"finger stage: {current_state}")
                             self._main_window.last_boost_time = time.time()
                             self._main_window.set_volume(self._main_window.boost_volume)
-                            self.update_status.emit(f"[音量提升] 检测到手势变化，音量提升至{int(self._main_window.boost_volume*100)}%")
+                            self.events.publish(VOLUME, f"[音量提升] 检测到手势变化，音量提升至{int(self._main_window.boost_volume*100)}%")
                             # 仅提升音量，不发送信号给Arduino
                         
-                        self.update_status.emit(f"[Python] Sending: {msg}")
-                        self.send_finger_status(msg)
+                        # 比例跟随模式下开关状态只用于显示和音量提升
+                        if not self.angle_mode and live:
+                            self.events.publish(SERIAL_TX, f"[Python] Sending: {msg}", status=msg)
+                        if not self.angle_mode and live and self.send_finger_status(msg, capture_time=packet.capture_time):
+                            sent = self.last_sent_bytes
+                            # 从采集到指令交给串口的延迟（有写线程时在写完后更新）
+                            packet.command_latency = time.perf_counter() - packet.capture_time
+                            if self.writer is None:
+                                self.last_command_latency = packet.command_latency
                 
-                # 计算并显示实际FPS（字体大小调整为18）
-                currentTime = time.time()
-                if prevTime != 0:
-                    fps = 1 / (currentTime - prevTime)
-                    frame = draw_text_with_chinese(frame, f"实际FPS: {int(fps)}", (10, 50), 18, (255, 0, 255))
-                prevTime = currentTime
+                # 调速器根据本帧处理耗时调整后续的跳帧和分辨率
+                process_time = time.perf_counter() - process_start
+                self.metrics.observe("process", process_time)
+                if self.governor.update(process_time):
+                    self.governor_status = self.governor.summary()
+                    self.events.publish(GOVERNOR, f"[调速] {self.governor_status}")
                 
-                # 显示处理参数（字体大小调整为18）
-                frame = draw_text_with_chinese(frame, f"滑动窗口: {self.WINDOW_SIZE}帧", (10, 80), 18, (255, 255, 0))
-                frame = draw_text_with_chinese(frame, f"帧计数: {self.frame_count}", (10, 110), 18, (255, 255, 0))
-
-                # 添加状态显示（字体大小调整为16，间距缩小）
-                y_offset = 140
-                # 显示手的左右信息
-                if handType:
-                    frame = draw_text_with_chinese(
-                        frame,
-                        f"检测到: {handType}",
-                        (10, y_offset),
-                        16,
-                        (255, 255, 255))
-                    y_offset += 30
+                if self.recorder is not None:
+                    self.recorder.write(packet.capture_time, self.frame_count, landmarks, handedness,
+                                        self.finger_filter.raw, self.finger_filter.state, sent)
                 
-                for i, (name, state) in enumerate(self.hand):
-                    color = (0, 255, 0) if state else (0, 0, 255)
-                    frame = draw_text_with_chinese(
-                        frame, 
-                        f"{name}: {'弯曲' if state else '伸直'}", 
-                        (10, y_offset + i * 30),  # 行间距缩小
-                        16,  # 字体大小减小
-                        color
-                    )
-
-                # 转换BGR到RGB用于Qt显示
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                self.update_frame.emit(frame)
-
-            cap.release()
-            self.update_status.emit("视频线程已停止")
+                # 交给渲染阶段，队列满时丢弃旧帧
+                packet.frame = frame
+                packet.results = self.detector.results
+                packet.roi = self.detector.roi_used
+                packet.hand_type = handType
+                packet.hand_state = [(name, state) for name, state in self.hand]
+                packet.frame_count = self.frame_count
+                self.render_queue.put(packet)
         except Exception as e:
-            self.update_status.emit(f"视频线程异常: {str(e)}")
+            self.events.publish(ERROR, f"推理线程异常: {str(e)}")
             import traceback
             print(traceback.format_exc())
 
     def stop(self):
         self.running = False
+        self.sequencer.stop()
         self.wait()  # 等待线程安全退出
 
-    def send_finger_status(self, finger_status):
+    @property
+    def demo_mode(self):
+        return self.sequencer.running
+
+    @demo_mode.setter
+    def demo_mode(self, enabled):
+        if enabled:
+            self.play_sequence(self.demo_timeline_path)
+        else:
+            self.sequencer.stop()
+
+    def play_sequence(self, path):
+        """播放手势时间线文件，文件不存在时播放内置的演示手势"""
+        if os.path.exists(path):
+            timeline = load_timeline(path)
+        else:
+            timeline = GestureTimeline.from_patterns(self.demo_patterns, self.demo_interval, name="演示")
+        self.sequencer.play(timeline)
+        return timeline
+
+    def set_binary(self, binary):
+        """切换ASCII/二进制协议；二进制协议下演示中带过渡时间的步按插值后的PWM目标值平滑过渡"""
+        self.encoder.binary = binary
+        self.sequencer.send_targets = self._send_sequence_targets if binary else None
+
+    def _send_sequence_targets(self, targets):
+        self.send_bytes(self.encoder.encode_targets(targets))
+
+    def _on_sequence_step(self, index, step):
+        self.events.publish(STATUS, f"[演示] {self.sequencer.timeline.name} 第{index + 1}步: {step.label or step.pattern}")
+
+    def send_finger_status(self, finger_status, priority=False, capture_time=None):
         """
         发送手指状态到下位机
         :param finger_status: 6位字符串，如"011111"
-        :return: bool 发送是否成功
+        :param priority: 优先指令，插队发送且不会被后续手势覆盖
+        :param capture_time: 触发该指令的帧的采集时刻，用于统计动作到指令的延迟
+        :return: bool 是否已交给串口（有写线程时只表示已投递）
         """
+        return self.send_bytes(self.encoder.encode(finger_status), priority, capture_time)
+
+    def send_bytes(self, data, priority=False, capture_time=None):
+        """发送已编码的指令字节，参数和返回值同 send_finger_status"""
         if not self.ser or not self.ser.is_open:
-            self.update_status.emit("串口未连接，无法发送")
+            self.events.publish(ERROR, "串口未连接，无法发送")
             return False
         
+        self.last_sent_bytes = data
+        if self.writer is not None:
+            self.writer.submit(data, priority=priority, tag=capture_time)
+            return True
+
         try:
-            msg = finger_status + '\n'
-            self.ser.write(msg.encode("ascii"))
+            write_start = time.perf_counter()
+            self.ser.write(data)
             self.ser.flush()
-            self.update_status.emit(f"[发送成功]: {msg.strip()}")
+            self._record_sent(data, time.perf_counter() - write_start, capture_time)
+            self.events.publish(SERIAL_TX, f"[发送成功]: {describe_bytes(data)}")
             return True
         except serial.SerialException as e:
-            self.update_status.emit(f"串口发送失败: {str(e)}")
+            self.metrics.count("serial_errors")
+            self.events.publish(ERROR, f"串口发送失败: {str(e)}")
             return False
         except Exception as e:
-            self.update_status.emit(f"发送异常: {str(e)}")
+            self.metrics.count("serial_errors")
+            self.events.publish(ERROR, f"发送异常: {str(e)}")
+            return False
+
+    def emergency_open(self):
+        """紧急张开手：跳过排队中的手势立即发送，并退出比例跟随模式"""
+        self.angle_mode = False
+        return self.send_finger_status("000000", priority=True)
+
+    def set_angle_mode(self, enabled):
+        """切换比例跟随模式，返回是否已启用"""
+        if enabled and not self.encoder.binary:
+            self.events.publish(STATUS, "比例跟随需要二进制协议，继续使用开关模式")
+            return False
+        if enabled:
+            # 串口按一半带宽限流，给回读和优先指令留余量
+            baudrate = self.ser.baudrate if self.ser else 115200
+            self.streamer = AngleStreamer(self.encoder, bytes_per_second=baudrate / 10 / 2)
+        self.angle_mode = enabled
+        if not enabled:
+            # 回到开关模式时按当前平滑状态重发一次，下位机据此退出跟随
+            self.send_finger_status(format_finger_status(self.finger_filter.state))
+        return enabled
+
+    def calibrate(self, pose):
+        """用最近一帧的弯曲角标定 "open"/"closed" 并保存"""
+        if self.last_angles is None:
+            self.events.publish(STATUS, "标定失败：比例跟随模式下还没有检测到手")
             return False
+        self.calibration.capture(self.last_angles, pose)
+        self.calibration.save(self.calibration_path)
+        self.events.publish(STATUS, f"已标定{'伸直' if pose == 'open' else '握拳'}，保存到 {self.calibration_path}")
+        return True
+
+    def _record_sent(self, data, latency, capture_time):
+        """指令写入串口后记录写入耗时、采集到写入的延迟，并开始等待下位机确认"""
+        self.acks.sent(data)
+        self.metrics.count("commands_sent")
+        self.metrics.observe("serial_write", latency)
+        if capture_time is not None:
+            self.metrics.observe("command", time.perf_counter() - capture_time)
+
+    def _on_serial_sent(self, data, latency, capture_time):
+        """写线程回调：一条指令已写入串口"""
+        self._record_sent(data, latency, capture_time)
+        scheduler = self.music_scheduler
+        if scheduler is not None:
+            scheduler.sent(describe_bytes(data), time.perf_counter())
+        if capture_time is not None:
+            self.last_command_latency = time.perf_counter() - capture_time
+        self.events.publish(SERIAL_TX, f"[发送成功]: {describe_bytes(data)}", latency_ms=round(latency * 1000, 3))
+
+    def _on_serial_coalesced(self, data, capture_time):
+        """普通指令被后一条覆盖：差量帧丢失后下一帧改发关键帧"""
+        self.metrics.count("commands_coalesced")
+        if self.streamer is not None:
+            self.streamer.invalidate()
+
+    def _on_serial_error(self, data, error):
+        self.metrics.count("serial_errors")
+        if self.streamer is not None:
+            self.streamer.invalidate()
+        if error is None:
+            self.events.publish(ERROR, "串口未连接，无法发送")
+        elif isinstance(error, serial.SerialException):
+            self.events.publish(ERROR, f"串口发送失败: {str(error)}")
+        else:
+            self.events.publish(ERROR, f"发送异常: {str(error)}")
+
+    def attach_writer(self, writer):
+        """使用异步写线程发送指令"""
+        self.writer = writer
+        writer.on_sent = self._on_serial_sent
+        writer.on_error = self._on_serial_error
+        writer.on_coalesced = self._on_serial_coalesced
+
+
+class VideoLabel(QLabel):
+    """直接绘制 VideoThread 准备好的帧，不在界面线程缩放；尺寸变化时通知 FramePresenter"""
+
+    def __init__(self, text="", parent=None):
+        super().__init__(text, parent)
+        self.presenter = None
+        self.current = None  # 正在显示的 PresentedFrame
+        self.metrics = None  # 设置后记录从采集到界面显示的延迟
+
+    def set_presenter(self, presenter):
+        self.presenter = presenter
+        presenter.set_target_size(self.width(), self.height())
+
+    def show_frame(self, presented):
+        """显示新帧，并把上一帧的缓冲区归还给缓冲池"""
+        previous, self.current = self.current, presented
+        if self.metrics is not None and presented.capture_time is not None:
+            self.metrics.observe("display", time.perf_counter() - presented.capture_time)
+        if self.presenter is not None:
+            self.presenter.release(previous)
+        if self.text():
+            QLabel.setText(self, "")
+        self.update()
+
+    def clear_frame(self):
+        if self.presenter is not None:
+            self.presenter.release(self.current)
+        self.current = None
+        self.update()
+
+    def setText(self, text):
+        self.clear_frame()
+        super().setText(text)
+
+    def resizeEvent(self, event):
+        if self.presenter is not None:
+            self.presenter.set_target_size(event.size().width(), event.size().height())
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)  # 样式表的边框和背景
+        if self.current is None:
+            return
+        image = self.current.image
+        area = self.contentsRect()
+        painter = QPainter(self)
+        painter.fillRect(area, Qt.black)
+        painter.drawImage(area.x() + (area.width() - image.width()) // 2,
+                          area.y() + (area.height() - image.height()) // 2, image)
+        painter.end()
 
 
 class MainWindow(QMainWindow):
+    protocol_changed = pyqtSignal(bool)  # 串口线程协商完成：是否使用二进制协议
+
     def __init__(self):
         super().__init__()
+        # 各线程的状态事件汇总到事件总线，界面每100ms取出合并后刷新一次
+        self.events = EventBus()
+        self._events_seen = -1
+        # 各阶段延迟直方图，串口回显的 "Received:" 用于统计下位机确认延迟
+        self.metrics = Metrics()
+        self.acks = AckTracker(self.metrics)
         
         # 初始化音频控制属性
         pygame.mixer.init()
@@ -374,6 +556,7 @@ class MainWindow(QMainWindow):
         self.boost_volume = 0.9    # 手指变化时提升到的音量
         self.boost_duration = 0.5  # 音量提升持续时间(秒)
         self.last_boost_time = 0   # 上次音量提升时间
+        self.current_volume = self.default_volume
         
         # 图片显示相关
         self.image_label = QLabel()
@@ -386,12 +569,74 @@ class MainWindow(QMainWindow):
         # 先初始化状态变量
         self.ser = None
         self.serial_thread = None
+        self.serial_writer = None
         self.is_running = False  # 移到这里，在init_ui之前初始化
         self.play_mode = False  # 演奏模式状态
+        self.record_sessions = "--record" in sys.argv  # 命令行加 --record 录制会话
+        self.roi_tracking = "--roi" in sys.argv         # 命令行加 --roi 启用ROI跟踪（低配机器）
+        self.binary_protocol = "--ascii" not in sys.argv  # 命令行加 --ascii 跳过二进制协议协商
+        self.binary_baudrate = 115200
+        self.angle_mode = "--angles" in sys.argv         # 命令行加 --angles 启用比例跟随模式
+        self.fast_scale = "--fast-scale" in sys.argv     # 命令行加 --fast-scale 视频用最近邻缩放（低配/4K屏）
+        self.autoplay = "--autoplay" in sys.argv         # 命令行加 --autoplay 演奏模式下机械手按乐谱自动演奏
+        self.music_scheduler = None
+        # 命令行加 --score <文件> 指定演奏模式的乐谱（简谱 .txt 或 .mid），可视化和自动演奏共用
+        score_path = sys.argv[sys.argv.index("--score") + 1] if "--score" in sys.argv[:-1] \
+            else os.path.join("scores", "canhaiyi.txt")
+        try:
+            self.score = load_score(score_path)
+        except (OSError, ScoreError) as e:
+            self.score = from_lists()
+            self.events.publish(ERROR, f"乐谱加载失败，使用内置乐谱: {e}")
+        # 命令行加 --filter <设置> 选择手指状态滤波，如 --filter window:2:1 恢复原滑动窗口
+        self.filter_spec = sys.argv[sys.argv.index("--filter") + 1] if "--filter" in sys.argv[:-1] else None
+        
+        # 命令行加 --event-log 把全部事件持续写入 sessions/events_*.jsonl，加 --verbose 同时打印到控制台
+        if "--event-log" in sys.argv or "--verbose" in sys.argv:
+            os.makedirs("sessions", exist_ok=True)
+            log_path = os.path.join("sessions", time.strftime("events_%Y%m%d_%H%M%S.jsonl")) \
+                if "--event-log" in sys.argv else os.devnull
+            self.events.start_log(log_path, echo="--verbose" in sys.argv)
+        
+        # 命令行加 --metrics 开启本机 HTTP 指标接口（默认端口8765，--metrics-port 指定）并定期写 sessions/metrics_*.csv
+        if "--metrics" in sys.argv:
+            port = int(sys.argv[sys.argv.index("--metrics-port") + 1]) if "--metrics-port" in sys.argv[:-1] else 8765
+            os.makedirs("sessions", exist_ok=True)
+            self.metrics.start_csv(os.path.join("sessions", time.strftime("metrics_%Y%m%d_%H%M%S.csv")))
+            try:
+                port = self.metrics.serve(port)
+                self.events.publish(STATUS, f"指标接口: http://127.0.0.1:{port}/metrics")
+            except OSError as e:
+                self.events.publish(ERROR, f"指标接口启动失败: {e}")
+        
+        # 命令行加 --instrument 把手指变成乐器：弯曲即发出对应的五声音阶音，--samples <目录> 使用采样音色，
+        # --instrument-latency <毫秒> 为回录测得的系统音频输出延迟，计入延迟估计
+        self.instrument = None
+        if "--instrument" in sys.argv:
+            sample_dir = sys.argv[sys.argv.index("--samples") + 1] if "--samples" in sys.argv[:-1] else None
+            device_latency = float(sys.argv[sys.argv.index("--instrument-latency") + 1]) / 1000 \
+                if "--instrument-latency" in sys.argv[:-1] else 0.0
+            try:
+                self.instrument = LiveInstrument(sample_dir=sample_dir, metrics=self.metrics,
+                                                 device_latency=device_latency).start()
+                note = "" if device_latency else "，延迟估计不含系统音频缓冲"
+                self.events.publish(STATUS, f"实时乐器已启动（每块{self.instrument.block}帧，"
+                                            f"输出延迟估计{self.instrument.output_latency * 1000:.1f}ms{note}）")
+            except Exception as e:
+                self.instrument = None
+                self.events.publish(ERROR, f"实时乐器启动失败: {e}")
         
         # 初始化UI
         self.init_ui()
         
+        # 串口线程的协商结果回到界面线程处理
+        self.protocol_changed.connect(self._on_protocol_changed)
+        
+        # 固定频率刷新状态文本，生产者从不直接更新界面
+        self.event_timer = QTimer(self)
+        self.event_timer.timeout.connect(self.drain_events)
+        self.event_timer.start(100)
+        
         # 启动时全屏显示
         self.showFullScreen()
         
@@ -417,7 +662,7 @@ class MainWindow(QMainWindow):
         video_layout = QVBoxLayout(video_frame)
         
         # 手势视频显示 (主窗口)
-        self.video_label = QLabel("等待视频流...")
+        self.video_label = VideoLabel("等待视频流...")
         self.video_label.setAlignment(Qt.AlignCenter)
         self.video_label.setStyleSheet("background-color: black; color: white;")
         video_layout.addWidget(self.video_label)
@@ -580,8 +825,9 @@ class MainWindow(QMainWindow):
         control_layout.addStretch(1)
 
                 # 音乐可视化显示区域 (替换原来的logo)
-        self.music_viz_label = QLabel()
-        self.music_viz_label.setFixedSize(520, 320)
+        # 可视化帧已是最终尺寸和 RGB32 字节序，直接绘制；内容区（去掉边距10和边框1）正好是帧的大小
+        self.music_viz_label = VideoLabel()
+        self.music_viz_label.setFixedSize(VIZ_WIDTH + 22, VIZ_HEIGHT + 22)
         self.music_viz_label.setStyleSheet("""
             background-color: black; 
             border: 1px solid white;
@@ -662,19 +908,36 @@ class MainWindow(QMainWindow):
             )
             self.status_text.setText(f"串口 {self.ser.port} 打开成功")
             
-            # 启动串口监听线程
-            self.serial_thread = threading.Thread(
-                target=serial_monitor, 
-                args=(self.ser, self.update_status),
-                daemon=True
-            )
-            self.serial_thread.start()
+            # 启动串口监听线程（阻塞读取，断线后自动重连同一个串口对象）
+            # 二进制帧协议在监听线程开始读取前协商，最长约2.5秒，不阻塞界面；
+            # 协商完成前按ASCII协议发送，下位机不支持时继续使用ASCII
+            self.serial_thread = SerialTransport(
+                self.ser,
+                on_line=self._on_serial_line,
+                on_state=lambda connected, message: self.events.publish(STATUS if connected else ERROR, message),
+                on_open=self._negotiate_protocol if self.binary_protocol else None
+            ).start()
             
             # 启动视频处理线程
-            self.detector = HandDetector(maxHands=1, detectionCon=0.7)
+            self.detector = HandDetector(maxHands=1, detectionCon=0.7, roi_tracking=self.roi_tracking)
             self.video_thread = VideoThread(self.detector, self.ser, self)  # 传递self作为parent
+            self.video_thread.record_sessions = self.record_sessions
+            self.video_thread.presenter.fast_transform = self.fast_scale
+            self.video_label.set_presenter(self.video_thread.presenter)
+            self.video_label.metrics = self.metrics
+            if self.filter_spec:
+                self.video_thread.finger_filter = make_filter(self.filter_spec)
+            self.video_thread.encoder = StatusEncoder()
+            self.serial_writer = CoalescingSerialWriter(self.ser)
+            self.video_thread.attach_writer(self.serial_writer)
+            self.serial_writer.start()
             self.video_thread.update_frame.connect(self.update_video_frame)
-            self.video_thread.update_status.connect(self.update_status)
+            self.video_thread.events = self.events
+            self.video_thread.metrics = self.metrics
+            self.video_thread.acks = self.acks
+            self.video_thread.instrument = self.instrument
+            if self.angle_mode and not self.binary_protocol:
+                self.video_thread.set_angle_mode(True)  # 提示需要二进制协议
             self.video_thread.start()
             
             # 更新状态
@@ -737,19 +1000,17 @@ class MainWindow(QMainWindow):
         """设置音量接口"""
         if hasattr(self, 'current_sound') and self.current_sound:
             self.current_sound.set_volume(volume)
-            # 更新状态显示
+            self.current_volume = volume
+            # 更新状态显示（可能在视频线程中调用，经事件总线交给界面）
             vol_percent = int(volume * 100)
-            self.status_text.setText(f"音量设置为: {vol_percent}%")
+            self.events.publish(VOLUME, f"音量设置为: {vol_percent}%", volume=volume)
 
     def check_volume_boost(self):
         """检查是否需要恢复默认音量"""
         current_time = time.time()
-        if current_time - self.last_boost_time > self.boost_duration:
+        if current_time - self.last_boost_time > self.boost_duration and self.current_volume != self.default_volume:
             self.set_volume(self.default_volume)
-            # 添加状态更新
-            current_text = self.status_text.text()
-            if "音量恢复" not in current_text:
-                self.status_text.setText(current_text + f"\n音量恢复默认: {int(self.default_volume*100)}%")
+            self.events.publish(VOLUME, f"音量恢复默认: {int(self.default_volume*100)}%")
 
     def toggle_play_mode(self):
         """切换演奏模式"""
@@ -814,9 +1075,10 @@ class MainWindow(QMainWindow):
                     background-color: #2E7D32;
                 }
             """)
+            self.stop_autoplay()
             # 停止音频播放
             if hasattr(self, 'current_sound') and self.current_sound:
-                self.current_sound.stop()
+                self.current_sound.close()
                 self.current_sound = None
             
             # 停止音量检查定时器
@@ -837,7 +1099,9 @@ class MainWindow(QMainWindow):
         # 停止音乐可视化
         if hasattr(self, 'music_timer'):
             self.music_timer.stop()
-        self.music_viz_label.clear()
+        self.music_viz_label.clear_frame()
+        
+        self.stop_autoplay()
         
         # 确保演示模式也被关闭
         if hasattr(self, 'video_thread') and self.video_thread.isRunning():
@@ -847,6 +1111,16 @@ class MainWindow(QMainWindow):
         if hasattr(self, 'video_thread') and self.video_thread.isRunning():
             self.video_thread.stop()
         
+        # 停止串口写线程（已投递的优先指令会先发出）
+        if self.serial_writer is not None:
+            self.serial_writer.stop()
+            self.serial_writer = None
+        
+        # 停止串口监听线程
+        if self.serial_thread is not None:
+            self.serial_thread.stop()
+            self.serial_thread = None
+        
         # 关闭串口
         if self.ser and self.ser.is_open:
             self.ser.close()
@@ -862,23 +1136,33 @@ class MainWindow(QMainWindow):
     
     def start_playback(self):
         """3秒后开始播放音乐"""
+        if not self.play_mode:
+            return  # 等待期间已关闭演奏模式
         try:
             # 隐藏图片
             self.image_label.hide()
             
             # 加载并播放音频
-            self.current_sound = mixer.Sound("audio/canhaiyi.wav")
-            self.current_sound.set_volume(self.default_volume)
-            self.current_sound.play(0)  # 0表示一次性播放
+            # 流式播放：只解析文件头，边播边读，不在界面线程解码整首曲子
+            self.current_sound = AudioStream("audio/canhaiyi.wav", volume=self.default_volume)
+            self.current_volume = self.default_volume
+            self.current_sound.play()
+            clock = self.current_sound  # 播放位置按声卡实际取走的样本计算，作为可视化和自动演奏的时钟
+            
+            # 自动演奏：按音频时钟提前一个动作延迟发送，手指在音符落键时到位
+            if self.autoplay and hasattr(self, 'video_thread') and self.video_thread.isRunning():
+                self.start_autoplay(clock)
 
             # 启动音量检查定时器
             self.volume_timer = QTimer()
             self.volume_timer.timeout.connect(self.check_volume_boost)
             self.volume_timer.start(100)  # 每100ms检查一次
             
-            # 启动音乐可视化
-            self.music_generator = get_frame_generator()
+            # 启动音乐可视化：画面时刻取自音频时钟，定时器只决定刷新节奏，跳帧不会让画面和音乐错位
+            self.audio_clock = clock
+            self.music_visualizer = MusicVisualizer(self.score)
             self.music_timer = QTimer()
+            self.music_timer.setTimerType(Qt.PreciseTimer)
             self.music_timer.timeout.connect(self.update_music_viz)
             self.music_timer.start(1000//60)  # 60 FPS
             self.music_viz_label.show()
@@ -887,47 +1171,121 @@ class MainWindow(QMainWindow):
             self.status_text.setText(f"音频播放失败: {str(e)}")
             self.play_mode = False
 
+    def start_autoplay(self, clock):
+        thread = self.video_thread
+        estimator = ActuationEstimator(baudrate=self.ser.baudrate, frame_bytes=len(thread.encoder.encode("000000")))
+        self.music_scheduler = MusicScheduler(thread.send_finger_status, clock, estimator,
+                                              on_command=self._on_autoplay_command,
+                                              confirm_sent=thread.writer is not None)
+        thread.music_scheduler = self.music_scheduler
+        self.music_scheduler.start(compile_score(timeline=self.score))
+        self.events.publish(STATUS, f"自动演奏已开始，动作延迟估计 {estimator.latency * 1000:.0f}ms")
+
+    def stop_autoplay(self):
+        if self.music_scheduler is None:
+            return
+        self.music_scheduler.stop()
+        self.events.publish(STATUS, self.music_scheduler.summary(), **self.music_scheduler.drift_summary())
+        if hasattr(self, 'video_thread'):
+            self.video_thread.music_scheduler = None
+        self.music_scheduler = None
+
+    def _on_autoplay_command(self, command, drift):
+        self.events.publish(DEBUG, f"[自动演奏] {command.pattern} 音符{command.note} 调度误差{drift * 1000:+.1f}ms")
+
     def update_music_viz(self):
         """更新音乐可视化显示"""
-        try:
-            frame = next(self.music_generator)
-            height, width, channel = frame.shape
-            bytes_per_line = 3 * width
-            q_img = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
-            self.music_viz_label.setPixmap(QPixmap.fromImage(q_img))
-        except StopIteration:
+        position = self.audio_clock.position()
+        if self.music_visualizer.finished(position):
             self.music_timer.stop()
             self.music_viz_label.setText("音乐播放结束")
+            return
+        buffer = self.music_visualizer.render_frame(position)  # 可视化器的内部缓冲区，每帧只重画了变化的区域
+        height, width = buffer.shape[:2]
+        presented = PresentedFrame(buffer, None)
+        presented.image = QImage(buffer.data, width, height, width * 4, QImage.Format_RGB32)
+        self.music_viz_label.show_frame(presented)
 
-    def update_video_frame(self, frame):
-        """更新视频帧显示，确保铺满视频区域"""
-        height, width, channel = frame.shape
-        bytes_per_line = channel * width
-        qt_image = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
-        # 让视频帧自适应视频标签大小，保持比例并平滑缩放
-        self.video_label.setPixmap(QPixmap.fromImage(qt_image).scaled(
-            self.video_label.size(), 
-            Qt.KeepAspectRatio, 
-            Qt.SmoothTransformation
-        ))
-    
-    def update_status(self, message):
-        """更新状态文本"""
-        self.status_text.setText(message)
+    def update_video_frame(self, presented):
+        """更新视频帧显示：帧已在视频线程中按标签大小保持比例缩放"""
+        self.video_label.show_frame(presented)
     
-    def resizeEvent(self, event):
-        """窗口大小变化时，更新视频显示"""
-        if hasattr(self, 'video_label') and self.video_label.pixmap():
-            self.video_label.setPixmap(self.video_label.pixmap().scaled(
-                self.video_label.size(), 
-                Qt.KeepAspectRatio, 
-                Qt.SmoothTransformation
-            ))
-        super().resizeEvent(event)
+    def _negotiate_protocol(self, ser):
+        """串口监听线程中调用（打开和每次重连后）：协商二进制协议，结果通过信号交给界面线程"""
+        video_thread = getattr(self, 'video_thread', None)
+        if video_thread is not None and video_thread.encoder.binary:
+            # 重连：下位机已复位为ASCII协议（波特率已由 SerialTransport 恢复），协商完成前先按ASCII发送
+            video_thread.set_binary(False)
+            self.protocol_changed.emit(False)
+        binary = negotiate_binary(ser, self.binary_baudrate)
+        self.protocol_changed.emit(binary)
+
+    def _on_protocol_changed(self, binary):
+        """界面线程：按协商结果切换编码器，比例跟随模式需要二进制协议"""
+        if not self.is_running or not hasattr(self, 'video_thread'):
+            return
+        self.video_thread.set_binary(binary)
+        if binary:
+            self.events.publish(STATUS, f"串口 {self.ser.port} 已切换到二进制协议 {self.binary_baudrate}bps")
+            if self.angle_mode and not self.video_thread.angle_mode:
+                self.video_thread.set_angle_mode(True)
+        else:
+            self.events.publish(STATUS, f"串口 {self.ser.port} 使用ASCII协议")
+            if self.video_thread.angle_mode:
+                self.video_thread.set_angle_mode(False)
+
+    def _on_serial_line(self, line, received_at):
+        """串口读线程回调：确认行用于统计下位机延迟，所有行作为事件显示"""
+        self.acks.received(line, received_at)
+        scheduler = self.music_scheduler
+        if scheduler is not None:
+            scheduler.feed_line(line, received_at)
+        self.events.publish(SERIAL_RX, f"[Arduino]: {line}")
+
+    def drain_events(self):
+        """定时取出新事件，按类型合并后一次性更新状态文本"""
+        events, lost = self.events.read(self._events_seen)
+        if not events:
+            return
+        self._events_seen = events[-1].seq
+        lines = [event.message if count == 1 else f"{event.message}  (×{count})"
+                 for event, count in coalesce(e for e in events if e.kind != DEBUG).values()]
+        if lines:
+            self.status_text.setText("\n".join(lines[-4:]))
+
+    def dump_events(self):
+        """把事件缓冲区导出到 sessions 目录"""
+        os.makedirs("sessions", exist_ok=True)
+        path = os.path.join("sessions", time.strftime("events_%Y%m%d_%H%M%S.jsonl"))
+        count = self.events.dump(path)
+        self.status_text.setText(f"已导出{count}条事件: {path}")
     
+    def keyPressEvent(self, event):
+        """Esc: 紧急张开机械手；A: 切换比例跟随模式；O/C: 标定伸直/握拳；L: 导出事件日志"""
+        if event.key() == Qt.Key_L:
+            self.dump_events()
+            return
+        if hasattr(self, 'video_thread') and self.video_thread.isRunning():
+            if event.key() == Qt.Key_Escape:
+                self.video_thread.emergency_open()
+                self.status_text.setText("紧急张开")
+                return
+            if event.key() == Qt.Key_A:
+                enabled = self.video_thread.set_angle_mode(not self.video_thread.angle_mode)
+                self.status_text.setText("比例跟随模式" if enabled else "开关模式")
+                return
+            if event.key() in (Qt.Key_O, Qt.Key_C) and self.video_thread.angle_mode:
+                self.video_thread.calibrate("open" if event.key() == Qt.Key_O else "closed")
+                return
+        super().keyPressEvent(event)
+
     def closeEvent(self, event):
         """窗口关闭事件处理"""
         self.stop_program()
+        self.events.stop_log()
+        if self.instrument is not None:
+            self.instrument.stop()
+        self.metrics.stop()
         event.accept()
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+"""状态/事件总线
+
+各线程用 publish(kind, message) 发布事件，只做一次计数和一次列表赋值，不加锁、不碰界面、不写标准输出；
+界面线程用 QTimer 按固定频率调用 read() 取出新事件，合并后刷新一次状态栏。
+
+事件保存在定长环形缓冲区中，可按类型/文字/时间查询，也可 dump() 到 JSON Lines 文件；
+start_log() 启动后台线程把全部事件持续追加到文件（可选同时打印），满足完整历史的需要。
+"""
+import itertools
+import json
+import threading
+import time
+
+# 事件类型
+STATUS = "status"        # 一般状态
+FINGER = "finger"        # 手指状态变化
+SERIAL_TX = "serial_tx"  # 指令发送
+SERIAL_RX = "serial_rx"  # 下位机返回
+VOLUME = "volume"        # 音量变化
+GOVERNOR = "governor"    # 调速决策
+ERROR = "error"          # 异常
+DEBUG = "debug"          # 调试信息（原 print）
+
+
+class Event():
+    __slots__ = ("seq", "time", "kind", "message", "data")
+
+    def __init__(self, seq, event_time, kind, message, data):
+        self.seq = seq
+        self.time = event_time
+        self.kind = kind
+        self.message = message
+        self.data = data
+
+    def to_dict(self):
+        item = {"seq": self.seq, "time": round(self.time, 6), "kind": self.kind, "message": self.message}
+        if self.data:
+            item["data"] = self.data
+        return item
+
+    def __repr__(self):
+        return f"Event({self.seq}, {self.kind}, {self.message!r})"
+
+
+class EventBus():
+    """定长环形缓冲区，多生产者无锁发布
+
+    序号由 itertools.count 分配（CPython 中 next() 是原子的），每个事件写入 seq % capacity 槽位。
+    读取方按序号顺序扫描，遇到尚未写完的槽位就停下，下次从该处继续；被覆盖的事件计入 lost。
+    """
+
+    def __init__(self, capacity=8192):
+        self.capacity = capacity
+        self._ring = [None] * capacity
+        self._counter = itertools.count()
+        self._last = -1
+        self._log_thread = None
+        self._log_running = False
+
+    def publish(self, kind, message, **data):
+        """发布一条事件，返回序号；data 为可选的结构化字段（需可JSON序列化）"""
+        seq = next(self._counter)
+        self._ring[seq % self.capacity] = Event(seq, time.time(), kind, message, data or None)
+        if seq > self._last:
+            self._last = seq
+        return seq
+
+    @property
+    def last_seq(self):
+        return self._last
+
+    def read(self, after=-1, limit=None):
+        """按序返回序号大于 after 的事件
+
+        :return: (events, lost) lost 为已被覆盖、读不到的事件数
+        """
+        last = self._last
+        start = max(after + 1, last - self.capacity + 1)
+        lost = start - (after + 1)
+        events = []
+        for seq in range(start, last + 1):
+            event = self._ring[seq % self.capacity]
+            if event is None or event.seq < seq:
+                break  # 该序号已分配但还没写入
+            if event.seq > seq:
+                lost += 1  # 读取期间被新事件覆盖
+                continue
+            events.append(event)
+            if limit is not None and len(events) >= limit:
+                break
+        return events, lost
+
+    def query(self, kind=None, contains=None, since=None, until=None):
+        """在缓冲区中的历史事件里查询，kind 可以是字符串或集合，since/until 为 time.time() 时间"""
+        kinds = {kind} if isinstance(kind, str) else kind
+        events, _ = self.read()
+        return [e for e in events
+                if (kinds is None or e.kind in kinds)
+                and (contains is None or contains in e.message)
+                and (since is None or e.time >= since)
+                and (until is None or e.time <= until)]
+
+    def dump(self, path, events=None):
+        """把缓冲区中的事件写成 JSON Lines 文件，返回写入条数"""
+        if events is None:
+            events, _ = self.read()
+        with open(path, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event.to_dict(), ensure_ascii=False) + "\n")
+        return len(events)
+
+    def start_log(self, path, interval=1.0, echo=False):
+        """后台线程每 interval 秒把新事件追加到文件，echo=True 时同时打印到标准输出"""
+        self._log_running = True
+        self._log_thread = threading.Thread(target=self._log_loop, args=(path, interval, echo), daemon=True)
+        self._log_thread.start()
+
+    def _log_loop(self, path, interval, echo):
+        after = self._last
+        with open(path, "a", encoding="utf-8") as f:
+            while True:
+                running = self._log_running
+                events, lost = self.read(after)
+                if lost:
+                    f.write(json.dumps({"lost": lost}) + "\n")
+                for event in events:
+                    f.write(json.dumps(event.to_dict(), ensure_ascii=False) + "\n")
+                    if echo:
+                        print(f"[{event.kind}] {event.message}")
+                if events:
+                    after = events[-1].seq
+                    f.flush()
+                if not running:
+                    break
+                time.sleep(interval)
+
+    def stop_log(self):
+        self._log_running = False
+        if self._log_thread is not None:
+            self._log_thread.join(timeout=2.0)
+            self._log_thread = None
+
+
+def coalesce(events):
+    """把一批事件按类型合并：{kind: (最后一条事件, 条数)}，保持各类型首次出现的顺序"""
+    merged = {}
+    for event in events:
+        count = merged[event.kind][1] + 1 if event.kind in merged else 1
+        merged[event.kind] = (event, count)
+    return merged
@@ -0,0 +1,161 @@
+"""比较手指状态滤波器的稳定性与延迟
+
+回放录制的会话（--record 生成的 .hrec），对每种滤波设置逐帧运行，统计:
+    flips/s      四指和拇指每秒状态翻转次数（越少越稳定），raw 一行为未滤波的分类结果
+    added_ms     输出翻转相对于未滤波分类中对应翻转的平均/95分位延迟
+    us/frame     每帧滤波耗时
+没有录制文件时可用 --synthetic 生成带噪声和临界抖动的合成手势。
+
+示例:
+    python filter_eval.py sessions/session_20250101_120000.hrec
+    python filter_eval.py --synthetic 120 --filters window:2:1 vote:2:3 hysteresis:0.05:0.05
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from finger_filters import make_filter
+from finger_state import FINGER_COLUMNS, THUMB, RIGHT, classify_fingers
+from session_recorder import SessionReplay
+
+DEFAULT_FILTERS = ["none", "window:2:1", "vote:2:3", "vote:3:5",
+                   "hysteresis:0.05:0.05", "hysteresis:0.1:0.1", "oneeuro:1:0.01", "oneeuro:3:0.05"]
+EVAL_COLUMNS = FINGER_COLUMNS + [THUMB]  # 手腕不参与判断
+
+
+def load_session(path):
+    replay = SessionReplay(path)
+    landmarks, handedness, present = replay.primary_hand()
+    data = (np.array(replay.timestamps, dtype=np.float64), np.array(landmarks),
+            np.array(handedness), np.array(present))
+    replay.close()
+    return data
+
+
+def synthetic_session(seconds, fps=30.0, noise=2.0, dropout=0.02, seed=0):
+    """合成右手：各手指在伸直/弯曲之间随机保持和过渡，叠加关键点噪声和偶发丢帧"""
+    rng = np.random.default_rng(seed)
+    count = int(seconds * fps)
+    timestamps = np.arange(count) / fps
+    flex = np.zeros((count, 6))
+    for column in EVAL_COLUMNS:
+        level, target, i = 0.0, 0.0, 0
+        while i < count:
+            hold = int(rng.uniform(0.5, 2.0) * fps)
+            target = 1.0 - target
+            ramp = max(int(rng.uniform(0.1, 0.4) * fps), 1)
+            seg = np.concatenate([np.linspace(level, target, ramp), np.full(hold, target)])
+            # 部分动作停在临界位置附近，制造抖动
+            if rng.random() < 0.3:
+                seg[ramp:] = 0.5 + rng.uniform(-0.05, 0.05)
+            flex[i:i + len(seg), column] = seg[:count - i]
+            level = flex[min(i + len(seg), count) - 1, column]
+            i += len(seg)
+
+    # 手掌尺寸100像素：手腕(0)到中指根部(9)
+    landmarks = np.zeros((count, 21, 3), dtype=np.float32)
+    landmarks[:, 0] = (320, 400, 0)
+    landmarks[:, 9] = (320, 300, 0)
+    for tip, pip, column in zip([8, 12, 16, 20], [6, 10, 14, 18], FINGER_COLUMNS):
+        landmarks[:, pip] = (320, 250, 0)
+        landmarks[:, tip, 0] = 320
+        landmarks[:, tip, 1] = 250 + (flex[:, column] - 0.5) * 80
+    landmarks[:, 3] = (260, 320, 0)
+    landmarks[:, 4, 0] = 260 + (flex[:, THUMB] - 0.5) * 60
+    landmarks[:, 4, 1] = 300
+    landmarks += rng.normal(0, noise, landmarks.shape).astype(np.float32)
+
+    handedness = np.full(count, RIGHT, dtype=np.int8)
+    present = rng.random(count) > dropout
+    return timestamps, landmarks, handedness, present
+
+
+def flip_times(states, timestamps):
+    """每列状态翻转的 (帧序号, 新状态) 列表"""
+    flips = []
+    for column in range(states.shape[1]):
+        idx = np.flatnonzero(states[1:, column] != states[:-1, column]) + 1
+        flips.append([(int(i), bool(states[i, column])) for i in idx])
+    return flips
+
+
+def added_latency(raw_flips, out_flips, timestamps):
+    """输出每次翻转到新状态 v，相对于原始分类最近一次翻转到 v 的延迟（秒）"""
+    delays = []
+    for raw, out in zip(raw_flips, out_flips):
+        j = 0
+        last = {True: None, False: None}
+        for k, value in out:
+            while j < len(raw) and raw[j][0] <= k:
+                last[raw[j][1]] = raw[j][0]
+                j += 1
+            if last[value] is not None:
+                delays.append(timestamps[k] - timestamps[last[value]])
+    return np.array(delays)
+
+
+def evaluate(spec, timestamps, landmarks, handedness, present, raw_flips):
+    f = make_filter(spec)
+    states = np.zeros((len(timestamps), 6), dtype=bool)
+    start = time.perf_counter()
+    for i in range(len(timestamps)):
+        f.update(landmarks[i] if present[i] else None, int(handedness[i]), float(timestamps[i]))
+        states[i] = f.state
+    cost = (time.perf_counter() - start) / max(len(timestamps), 1)
+
+    out_flips = flip_times(states[:, EVAL_COLUMNS], timestamps)
+    delays = added_latency(raw_flips, out_flips, timestamps)
+    duration = max(float(timestamps[-1] - timestamps[0]), 1e-6)
+    return {
+        "filter": spec,
+        "flips_per_s": round(sum(len(f) for f in out_flips) / duration, 3),
+        "added_ms_mean": round(float(delays.mean()) * 1000, 1) if len(delays) else 0.0,
+        "added_ms_p95": round(float(np.percentile(delays, 95)) * 1000, 1) if len(delays) else 0.0,
+        "us_per_frame": round(cost * 1e6, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="手指状态滤波器稳定性/延迟对比")
+    parser.add_argument("sessions", nargs="*", help="会话文件 (.hrec)")
+    parser.add_argument("--synthetic", type=float, metavar="SECONDS", help="使用合成手势代替会话文件")
+    parser.add_argument("--filters", nargs="+", default=DEFAULT_FILTERS, help="滤波设置，见 finger_filters.py")
+    parser.add_argument("--json", action="store_true", help="输出JSON")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        sources = [("synthetic", synthetic_session(args.synthetic))]
+    elif args.sessions:
+        sources = [(path, load_session(path)) for path in args.sessions]
+    else:
+        parser.error("需要会话文件或 --synthetic")
+
+    report = []
+    for name, (timestamps, landmarks, handedness, present) in sources:
+        if len(timestamps) < 2:
+            continue
+        raw = classify_fingers(landmarks, handedness) & present[:, None]
+        raw_flips = flip_times(raw[:, EVAL_COLUMNS], timestamps)
+        duration = float(timestamps[-1] - timestamps[0])
+        rows = [{"filter": "raw", "flips_per_s": round(sum(len(f) for f in raw_flips) / duration, 3),
+                 "added_ms_mean": 0.0, "added_ms_p95": 0.0, "us_per_frame": 0.0}]
+        rows += [evaluate(spec, timestamps, landmarks, handedness, present, raw_flips) for spec in args.filters]
+        report.append({"source": name, "frames": len(timestamps), "duration_s": round(duration, 2), "results": rows})
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+    for item in report:
+        print(f"{item['source']}: {item['frames']}帧 {item['duration_s']}s")
+        print(f"  {'filter':<22}{'flips/s':>9}{'added_ms':>10}{'p95_ms':>9}{'us/frame':>10}")
+        for row in item["results"]:
+            print(f"  {row['filter']:<22}{row['flips_per_s']:>9}{row['added_ms_mean']:>10}"
+                  f"{row['added_ms_p95']:>9}{row['us_per_frame']:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
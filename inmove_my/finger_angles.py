@@ -0,0 +1,192 @@
+"""比例跟随模式：连续的手指弯曲角度 -> 舵机PWM目标值
+
+classify_fingers 只给出弯曲/伸直两种状态，下位机再执行固定的伸直→弯曲扫动。
+这里用三维关键点计算每根手指各关节弯曲角之和，经每路标定线性映射到PWM，
+由 AngleStreamer 以差量帧（只含明显变化的通道）限速发送，机械手按相机帧率平滑跟随。
+"""
+import json
+import threading
+
+import numpy as np
+
+from finger_state import FINGER_NAMES, INDEX, MIDDLE, PINKY, RING, THUMB
+
+# 每根手指从手腕到指尖的关键点链，在链的中间三个点处计算弯曲角
+FINGER_CHAINS = {
+    INDEX: [0, 5, 6, 7, 8],
+    MIDDLE: [0, 9, 10, 11, 12],
+    RING: [0, 13, 14, 15, 16],
+    THUMB: [0, 1, 2, 3, 4],
+    PINKY: [0, 17, 18, 19, 20],
+}
+_CHAIN_COLUMNS = list(FINGER_CHAINS)
+_CHAINS = np.array([FINGER_CHAINS[column] for column in _CHAIN_COLUMNS])
+
+# 与 music_low.ino 中 music_2 的 (伸直, 弯曲) PWM 一致，状态列顺序即舵机通道顺序
+DEFAULT_PWM_RANGES = [(102, 502), (120, 380), (450, 180), (500, 250), (110, 270), (500, 250)]
+# 伸直/握拳时的关节角之和（度）；手腕不计算角度，始终保持伸直
+DEFAULT_ANGLE_RANGES = [(0, 90), (25, 200), (25, 210), (25, 200), (35, 110), (25, 190)]
+
+
+def flexion_angles(landmarks):
+    """向量化计算每根手指的弯曲角（度）
+
+    :param landmarks: (..., 21, 3) 关键点数组，z 与 x/y 同一尺度（HandDetector.findLandmarks）
+    :return: (..., 6) float32，列顺序同状态列，伸直约为0，手腕列为0
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    bones = np.diff(landmarks[..., _CHAINS, :], axis=-2)  # (..., 5, 4, 3)
+    a = bones[..., :-1, :]
+    b = bones[..., 1:, :]
+    cos = np.sum(a * b, axis=-1) / (np.linalg.norm(a, axis=-1) * np.linalg.norm(b, axis=-1) + 1e-6)
+    joints = np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+    angles = np.zeros(landmarks.shape[:-2] + (6,), dtype=np.float32)
+    angles[..., _CHAIN_COLUMNS] = joints.sum(axis=-1)
+    return angles
+
+
+class AngleCalibration():
+    """每路舵机的标定：弯曲角范围线性映射到 (伸直, 弯曲) PWM 范围"""
+
+    def __init__(self, angle_ranges=None, pwm_ranges=None):
+        self.angle_ranges = np.array(angle_ranges or DEFAULT_ANGLE_RANGES, dtype=np.float32)
+        self.pwm_ranges = np.array(pwm_ranges or DEFAULT_PWM_RANGES, dtype=np.float32)
+
+    def to_pwm(self, angles):
+        """(..., 6) 弯曲角 -> (..., 6) int PWM，超出标定范围时夹紧"""
+        open_angle, closed_angle = self.angle_ranges[:, 0], self.angle_ranges[:, 1]
+        span = np.where(closed_angle > open_angle, closed_angle - open_angle, 1.0)
+        ratio = np.clip((np.asarray(angles, dtype=np.float32) - open_angle) / span, 0.0, 1.0)
+        straighten, flex = self.pwm_ranges[:, 0], self.pwm_ranges[:, 1]
+        return np.rint(straighten + ratio * (flex - straighten)).astype(np.int32)
+
+    def capture(self, angles, pose):
+        """用当前手型标定，pose 为 "open"（五指伸直）或 "closed"（握拳），手腕列不变"""
+        column = {"open": 0, "closed": 1}[pose]
+        self.angle_ranges[_CHAIN_COLUMNS, column] = np.asarray(angles, dtype=np.float32)[_CHAIN_COLUMNS]
+
+    def save(self, path):
+        data = {"channels": [
+            {"name": FINGER_NAMES[i],
+             "angle": [round(float(v), 1) for v in self.angle_ranges[i]],
+             "pwm": [int(v) for v in self.pwm_ranges[i]]}
+            for i in range(6)]}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            channels = json.load(f)["channels"]
+        if len(channels) != 6:
+            raise ValueError(f"标定文件需要6个通道: {path}")
+        return cls([c["angle"] for c in channels], [c["pwm"] for c in channels])
+
+
+class AngleStreamer():
+    """把每帧的PWM目标值变成串口帧：平滑、死区、限速
+
+    - 与上次发送值相差不足 deadband 的通道不发送，全部通道都没变化时不发帧
+    - 相邻两帧至少间隔 min_interval 秒，另按 bytes_per_second 做令牌桶限流，不让串口排队
+    - 每 keyframe_interval 秒发送一次完整的6路关键帧；丢帧或被写线程合并后调用 invalidate()，
+      下一帧立即发送关键帧，保证下位机状态最终一致
+
+    update() 在推理线程中调用，invalidate() 在串口写线程中调用，两者对 sent 的读写用锁保护，
+    不会出现作废被 update() 末尾的赋值覆盖、下一帧仍按下位机没收到的状态发差量的情况。
+    """
+
+    def __init__(self, encoder, deadband=4, min_interval=1 / 30, keyframe_interval=1.0,
+                 bytes_per_second=None, alpha=0.5):
+        """
+        :param encoder: 二进制模式的 StatusEncoder
+        :param alpha: PWM目标值的指数平滑系数，1表示不平滑
+        """
+        self.encoder = encoder
+        self.deadband = deadband
+        self.min_interval = min_interval
+        self.keyframe_interval = keyframe_interval
+        self.bytes_per_second = bytes_per_second
+        self.alpha = alpha
+
+        self.filtered = None
+        self.sent = None        # 认为下位机当前持有的目标值，None 表示需要关键帧
+        self._sent_lock = threading.Lock()
+        self._last_time = None
+        self._last_keyframe = None
+        self._tokens = 0.0
+        self._token_time = None
+
+        self.frames = 0
+        self.keyframes = 0
+        self.bytes = 0
+        self.suppressed = 0     # 死区内没有发送的帧
+        self.limited = 0        # 因限速没有发送的帧
+
+    def invalidate(self):
+        with self._sent_lock:
+            self.sent = None
+
+    def _allow_bytes(self, size, now):
+        if not self.bytes_per_second:
+            return True
+        burst = max(self.bytes_per_second * 0.1, 32)
+        if self._token_time is None:
+            self._tokens = burst
+        else:
+            self._tokens = min(burst, self._tokens + (now - self._token_time) * self.bytes_per_second)
+        self._token_time = now
+        if size > self._tokens:
+            return False
+        self._tokens -= size
+        return True
+
+    def update(self, targets, now):
+        """输入本帧PWM目标值，返回需要发送的字节，不需要发送时返回None"""
+        targets = np.asarray(targets, dtype=np.float32)
+        if self.filtered is None:
+            self.filtered = targets.copy()
+        else:
+            self.filtered += self.alpha * (targets - self.filtered)
+
+        # 留出相机帧间隔抖动的余量，避免按相机帧率输入时隔帧被丢弃
+        if self._last_time is not None and now - self._last_time < self.min_interval * 0.8:
+            return None
+        values = np.rint(self.filtered).astype(np.int32)
+        with self._sent_lock:
+            return self._encode(values, now)
+
+    def _encode(self, values, now):
+        sent = self.sent
+        keyframe = sent is None or now - self._last_keyframe >= self.keyframe_interval
+        if keyframe:
+            changed = np.ones(6, dtype=bool)
+            size = 17
+        else:
+            changed = np.abs(values - sent) >= self.deadband
+            if not changed.any():
+                self.suppressed += 1
+                return None
+            size = 6 + 2 * int(changed.sum())
+        if not self._allow_bytes(size, now):
+            self.limited += 1
+            return None
+
+        if keyframe:
+            data = self.encoder.encode_targets(values.tolist())
+            self.sent = values
+            self._last_keyframe = now
+            self.keyframes += 1
+        else:
+            data = self.encoder.encode_delta({int(i): int(values[i]) for i in np.flatnonzero(changed)})
+            sent = sent.copy()
+            sent[changed] = values[changed]
+            self.sent = sent
+        self._last_time = now
+        self.frames += 1
+        self.bytes += len(data)
+        return data
+
+    def summary(self):
+        return (f"跟随: {self.frames}帧({self.keyframes}关键帧) {self.bytes}B "
+                f"死区{self.suppressed} 限速{self.limited}")
@@ -0,0 +1,204 @@
+"""手指状态时间滤波
+
+所有滤波器接口相同，每帧调用一次:
+    changed = f.update(landmarks, handedness, timestamp)
+    landmarks: 一只手的 (21, 3) 关键点，没检测到手时为 None
+               （连续超过 MISSING_HOLD 帧才按全部伸直处理，偶发的漏检不会让所有手指翻转）
+    返回本帧状态发生变化的列序号，当前结果在 f.state，本帧未滤波的分类在 f.raw
+
+用 make_filter("vote:2:3") 这样的字符串创建，便于命令行和 filter_eval.py 比较不同设置:
+    window:W:T        原滑动窗口，每W帧评估一次，窗口内弯曲帧数>T为弯曲（兼容旧行为）
+    vote:N:M          每帧评估，最近M帧中有N帧弯曲/伸直才切换，否则保持
+    hysteresis:IN:OUT 用连续裕量（finger_margins）判断，>IN 变弯曲，<-OUT 变伸直
+    oneeuro:FC:BETA   关键点先经 One-Euro 低通（最小截止频率FC Hz，速度系数BETA）再分类
+    none              不滤波
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+from finger_state import FingerSmoother, classify_fingers, finger_margins
+
+MISSING_HOLD = 2
+
+
+class _FilterBase():
+    name = "none"
+
+    def __init__(self):
+        self.state = [False] * 6
+        self.raw = [False] * 6
+        self._missing = 0
+
+    def _hand_lost(self, landmarks):
+        """没检测到手时返回True；短暂漏检期间保持状态，超过 MISSING_HOLD 帧后全部伸直"""
+        if landmarks is not None:
+            self._missing = 0
+            return False
+        self._missing += 1
+        self.raw = [False] * 6
+        return True
+
+    def _lost_update(self):
+        if self._missing <= MISSING_HOLD:
+            return []
+        return self._apply([False] * 6)
+
+    def _classify(self, landmarks, handedness):
+        if landmarks is None:
+            return [False] * 6  # 未检测到手时全部伸直
+        return classify_fingers(landmarks[None], np.asarray([handedness]))[0].tolist()
+
+    def _apply(self, new_state):
+        changed = [i for i in range(6) if new_state[i] != self.state[i]]
+        for i in changed:
+            self.state[i] = new_state[i]
+        return changed
+
+    def update(self, landmarks, handedness, timestamp):
+        if self._hand_lost(landmarks):
+            return self._lost_update()
+        self.raw = self._classify(landmarks, handedness)
+        return self._apply(self.raw)
+
+    def describe(self):
+        return self.name
+
+
+class PassThroughFilter(_FilterBase):
+    """不滤波，直接使用每帧分类结果（仍保持短暂漏检）"""
+
+
+class WindowFilter(_FilterBase):
+    """原 FingerSmoother：每 window_size 帧评估一次，固定约一帧延迟，漏检帧直接按伸直计入"""
+
+    def __init__(self, window_size=2, threshold=1):
+        super().__init__()
+        self.smoother = FingerSmoother(window_size, threshold)
+        self.state = self.smoother.state
+        self.name = f"window:{window_size}:{threshold}"
+        self._frames = 0
+
+    def update(self, landmarks, handedness, timestamp):
+        self.raw = self._classify(landmarks, handedness)
+        self._frames += 1
+        return self.smoother.update(self.raw, self._frames)
+
+
+class VoteFilter(_FilterBase):
+    """N-of-M 投票：每帧评估，最近 m 帧中有 n 帧一致才切换"""
+
+    def __init__(self, n=2, m=3):
+        super().__init__()
+        if not 0 < n <= m:
+            raise ValueError(f"投票参数需要 0 < n <= m: {n}/{m}")
+        self.n = n
+        self.history = deque(maxlen=m)
+        self.name = f"vote:{n}:{m}"
+
+    def update(self, landmarks, handedness, timestamp):
+        if self._hand_lost(landmarks):
+            return self._lost_update()
+        self.raw = self._classify(landmarks, handedness)
+        self.history.append(self.raw)
+        bent = np.sum(self.history, axis=0)
+        straight = len(self.history) - bent
+        new_state = [True if bent[i] >= self.n else False if straight[i] >= self.n else self.state[i]
+                     for i in range(6)]
+        return self._apply(new_state)
+
+
+class HysteresisFilter(_FilterBase):
+    """迟滞：裕量需要越过 enter 才变弯曲、低于 -exit 才变伸直，中间区域保持不变
+
+    大幅度的弯曲/伸直在当帧生效，没有额外延迟；只有在临界位置附近抖动的帧被抑制。
+    """
+
+    def __init__(self, enter=0.05, exit=0.05):
+        super().__init__()
+        self.enter = enter
+        self.exit = exit
+        self.name = f"hysteresis:{enter:g}:{exit:g}"
+
+    def update(self, landmarks, handedness, timestamp):
+        if self._hand_lost(landmarks):
+            return self._lost_update()
+        margins = finger_margins(landmarks, handedness)
+        self.raw = (margins > 0).tolist()
+        new_state = [True if margins[i] > self.enter else False if margins[i] < -self.exit else self.state[i]
+                     for i in range(6)]
+        return self._apply(new_state)
+
+
+class OneEuro():
+    """One-Euro 低通滤波（Casiez 等, 2012），对数组逐元素滤波
+
+    截止频率随变化速度升高：静止时强平滑去抖，快速运动时跟得上。
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.01, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.x = None
+        self.dx = None
+        self.t = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def reset(self):
+        self.x = None
+
+    def __call__(self, x, t):
+        x = np.asarray(x, dtype=np.float32)
+        if self.x is None or t <= self.t:
+            self.x = x.copy()
+            self.dx = np.zeros_like(x)
+            self.t = t
+            return self.x
+        dt = t - self.t
+        self.t = t
+        a_d = self._alpha(self.d_cutoff, dt)
+        self.dx += a_d * ((x - self.x) / dt - self.dx)
+        cutoff = self.min_cutoff + self.beta * np.abs(self.dx)
+        self.x += self._alpha(cutoff, dt) * (x - self.x)
+        return self.x
+
+
+class OneEuroFilter(_FilterBase):
+    """关键点坐标经 One-Euro 平滑后再分类，手消失时重置"""
+
+    def __init__(self, min_cutoff=1.0, beta=0.01, d_cutoff=1.0):
+        super().__init__()
+        self.euro = OneEuro(min_cutoff, beta, d_cutoff)
+        self.name = f"oneeuro:{min_cutoff:g}:{beta:g}"
+
+    def update(self, landmarks, handedness, timestamp):
+        if self._hand_lost(landmarks):
+            self.euro.reset()
+            return self._lost_update()
+        self.raw = self._classify(landmarks, handedness)
+        smoothed = self.euro(landmarks, timestamp)
+        return self._apply(self._classify(smoothed, handedness))
+
+
+FILTERS = {
+    "none": PassThroughFilter,
+    "window": WindowFilter,
+    "vote": VoteFilter,
+    "hysteresis": HysteresisFilter,
+    "oneeuro": OneEuroFilter,
+}
+
+
+def make_filter(spec):
+    """按 "类型:参数1:参数2" 创建滤波器，见模块说明"""
+    kind, *params = spec.split(":")
+    if kind not in FILTERS:
+        raise ValueError(f"未知的滤波器: {spec}（可选 {', '.join(FILTERS)}）")
+    cast = int if kind in ("window", "vote") else float
+    return FILTERS[kind](*(cast(p) for p in params))
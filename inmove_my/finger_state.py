@@ -0,0 +1,99 @@
+from collections import deque
+
+import numpy as np
+
+# 左右手编码（HandDetector.findLandmarks 返回的 handedness 数组）
+LEFT = 0
+RIGHT = 1
+UNKNOWN_HAND = -1
+HANDEDNESS_CODES = {"Left": LEFT, "Right": RIGHT}
+HANDEDNESS_LABELS = {LEFT: "Left", RIGHT: "Right"}
+
+# 状态列顺序与串口协议一致：手腕, 食指, 中指, 无名指, 拇指, 小指
+FINGER_NAMES = ["手腕", "食指", "中指", "无名指", "拇指", "小指"]
+WRIST, INDEX, MIDDLE, RING, THUMB, PINKY = range(6)
+
+# 四指的状态列、指尖和第二关节(PIP)关键点编号
+FINGER_COLUMNS = [INDEX, MIDDLE, RING, PINKY]
+FINGER_TIPS = [8, 12, 16, 20]
+FINGER_PIPS = [6, 10, 14, 18]
+
+
+def classify_fingers(landmarks, handedness, detect_wrist=False):
+    """向量化计算六个关节的弯曲状态
+
+    :param landmarks: (..., 21, 3) 关键点数组，可以是单帧多手或多帧批量
+    :param handedness: (...) 左右手编码，形状与landmarks去掉最后两维一致
+    :param detect_wrist: 是否判断手腕（中指根部低于手腕视为下弯），默认与原逻辑一致始终伸直
+    :return: (..., 6) bool数组，True表示弯曲
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    handedness = np.asarray(handedness)
+    states = np.zeros(landmarks.shape[:-2] + (6,), dtype=bool)
+
+    # 四指：指尖低于第二关节即弯曲（图像y轴向下）
+    states[..., FINGER_COLUMNS] = landmarks[..., FINGER_TIPS, 1] > landmarks[..., FINGER_PIPS, 1]
+
+    # 拇指：比较指尖和指间关节的x坐标，左右手方向相反
+    thumb_dx = landmarks[..., 4, 0] - landmarks[..., 3, 0]
+    states[..., THUMB] = (((handedness == LEFT) & (thumb_dx <= 0)) |
+                          ((handedness == RIGHT) & (thumb_dx > 0)))
+
+    if detect_wrist:
+        states[..., WRIST] = landmarks[..., 9, 1] > landmarks[..., 0, 1]
+    return states
+
+
+def finger_margins(landmarks, handedness):
+    """classify_fingers 的连续版本：大于0表示弯曲，数值越大越确定
+
+    四指为 指尖y - 第二关节y，拇指为按左右手取向后的 指尖x - 指间关节x，
+    都除以手腕到中指根部的距离，使阈值与手离镜头的远近无关。手腕列始终为 -1（伸直）。
+
+    :return: (..., 6) float32
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    handedness = np.asarray(handedness)
+    scale = np.linalg.norm(landmarks[..., 9, :2] - landmarks[..., 0, :2], axis=-1) + 1e-6
+    margins = np.full(landmarks.shape[:-2] + (6,), -1.0, dtype=np.float32)
+
+    margins[..., FINGER_COLUMNS] = (landmarks[..., FINGER_TIPS, 1] - landmarks[..., FINGER_PIPS, 1]) / scale[..., None]
+    thumb_dx = (landmarks[..., 4, 0] - landmarks[..., 3, 0]) / scale
+    margins[..., THUMB] = np.where(handedness == LEFT, -thumb_dx,
+                                   np.where(handedness == RIGHT, thumb_dx, -1.0))
+    return margins
+
+
+def format_finger_status(states):
+    """把一手的6个状态转为串口发送的6位字符串，如"011111" """
+    return "".join("1" if state else "0" for state in states)
+
+
+class FingerSmoother():
+    """手指状态滑动窗口
+
+    每帧记录一次状态，每 window_size 帧评估一次：
+    窗口内弯曲帧数超过 threshold 时认为该手指弯曲。
+    """
+
+    def __init__(self, window_size=2, threshold=1):
+        self.window_size = window_size
+        self.threshold = threshold
+        self.history = [deque([False] * window_size, maxlen=window_size) for _ in range(6)]
+        self.state = [False] * 6
+
+    def update(self, current_state, frame_count):
+        """加入一帧状态，返回本次状态发生变化的列序号列表"""
+        for i in range(6):
+            self.history[i].append(bool(current_state[i]))
+
+        if frame_count % self.window_size != 0:
+            return []
+
+        changed = []
+        for i in range(6):
+            new_state = sum(self.history[i]) > self.threshold
+            if new_state != self.state[i]:
+                self.state[i] = new_state
+                changed.append(i)
+        return changed
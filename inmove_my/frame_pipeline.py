@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import deque
+
+
+class FramePacket():
+    """在各处理阶段之间传递的一帧数据，携带采集时间戳用于测量延迟"""
+
+    def __init__(self, seq, frame, capture_time):
+        self.seq = seq
+        self.frame = frame
+        self.capture_time = capture_time  # time.perf_counter() 采集时刻
+        self.results = None               # MediaPipe 检测结果（用于绘制关键点）
+        self.roi = None                   # ROI跟踪时推理使用的裁剪区域
+        self.hand_type = None
+        self.hand_state = None            # 推理阶段的手指状态快照 [(名称, 状态), ...]
+        self.frame_count = 0
+        self.command_latency = None       # 采集到发送指令的延迟（秒）
+
+
+class DropOldestQueue():
+    """有界队列，满时丢弃最旧的元素，生产者永不阻塞"""
+
+    def __init__(self, maxsize=1):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """取出最旧的元素，超时返回None"""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class LatestFrameGrabber():
+    """独立线程持续读取摄像头，只保留最新一帧，避免驱动缓冲造成的旧帧"""
+
+    def __init__(self, cap):
+        self.cap = cap
+        self.failed = False
+        self.dropped = 0
+        self._packet = None
+        self._seq = 0
+        self._read_seq = 0   # 最近一次被 read() 取走的帧序号
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            ret, frame = self.cap.read()
+            now = time.perf_counter()
+            with self._cond:
+                if not ret:
+                    self.failed = True
+                    self._cond.notify_all()
+                    break
+                if self._packet is not None and self._packet.seq > self._read_seq:
+                    self.dropped += 1  # 上一帧还没被取走就被覆盖
+                self._seq += 1
+                self._packet = FramePacket(self._seq, frame, now)
+                self._cond.notify_all()
+
+    def read(self, last_seq=0, timeout=None):
+        """返回序号大于last_seq的最新帧，超时或读取失败返回None"""
+        with self._cond:
+            if self._packet is None or self._packet.seq <= last_seq:
+                self._cond.wait_for(
+                    lambda: self.failed or (self._packet is not None and self._packet.seq > last_seq),
+                    timeout)
+            if self._packet is None or self._packet.seq <= last_seq:
+                return None
+            self._read_seq = max(self._read_seq, self._packet.seq)
+            return self._packet
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1)
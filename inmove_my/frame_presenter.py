@@ -0,0 +1,132 @@
+"""视频帧显示准备：在工作线程中缩放到显示尺寸并转换为 Qt 的 RGB32 格式
+
+原流程在界面线程上做 QImage -> QPixmap -> scaled(SmoothTransformation)，
+全屏4K时每帧几十毫秒，界面线程来不及处理输入事件。
+这里由工作线程把帧写进复用的缓冲池（(h, w, 4) uint8，字节序 B,G,R,A 即小端的 QImage.Format_RGB32），
+界面线程只需把缓冲区包成 QImage 直接绘制，不再缩放、不再转换。
+
+缓冲区由界面显示完下一帧后归还（release）；全部缓冲都在使用中说明界面跟不上，
+此时直接丢弃新帧，而不是在事件队列里越积越多。
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class PresentedFrame():
+    """一帧待显示的数据：buffer 为缓冲池中的数组，image 由调用方包装（如 QImage）"""
+    __slots__ = ("buffer", "token", "image", "capture_time")
+
+    def __init__(self, buffer, token):
+        self.buffer = buffer
+        self.token = token
+        self.image = None
+        self.capture_time = None  # 对应摄像头帧的采集时刻，用于统计显示延迟
+
+
+class FramePresenter():
+    """保持宽高比缩放到目标尺寸并转换为 RGB32，写入复用的缓冲池"""
+
+    def __init__(self, pool_size=3, fast_transform=False):
+        """
+        :param pool_size: 缓冲区个数，至少3个（显示中、排队中、正在写入）
+        :param fast_transform: True 用最近邻缩放（最快），False 用双线性/区域插值
+        """
+        self.pool_size = max(pool_size, 3)
+        self.fast_transform = fast_transform
+        self._lock = threading.Lock()
+        self._target = None     # (宽, 高)，None 表示保持原尺寸
+        self._shape = None
+        self._buffers = []
+        self._free = []
+        self._generation = 0
+        self._bgra = None       # 原尺寸的 BGRA 中间缓冲
+        self.presented = 0
+        self.dropped = 0
+
+    def set_target_size(self, width, height):
+        """显示区域尺寸变化时由界面线程调用"""
+        with self._lock:
+            self._target = (max(int(width), 1), max(int(height), 1))
+
+    def _output_size(self, width, height):
+        if self._target is None:
+            return width, height
+        scale = min(self._target[0] / width, self._target[1] / height)
+        return max(int(width * scale), 1), max(int(height * scale), 1)
+
+    def _acquire(self, shape):
+        with self._lock:
+            if shape != self._shape:
+                # 尺寸变化：重新分配缓冲池，旧缓冲由仍在显示的帧持有引用，归还时丢弃
+                self._shape = shape
+                self._generation += 1
+                self._buffers = [np.empty(shape, dtype=np.uint8) for _ in range(self.pool_size)]
+                self._free = list(range(self.pool_size))
+            if not self._free:
+                return None
+            index = self._free.pop()
+            return PresentedFrame(self._buffers[index], (self._generation, index))
+
+    def release(self, frame):
+        """界面不再使用该帧时归还缓冲区"""
+        if frame is None:
+            return
+        generation, index = frame.token
+        with self._lock:
+            if generation == self._generation and index not in self._free:
+                self._free.append(index)
+
+    def present(self, frame):
+        """BGR帧 -> 缩放后的 RGB32 缓冲区，缓冲池用尽时返回None（丢帧）"""
+        height, width = frame.shape[:2]
+        with self._lock:
+            out_w, out_h = self._output_size(width, height)
+        presented = self._acquire((out_h, out_w, 4))
+        if presented is None:
+            self.dropped += 1
+            return None
+
+        # 先在原尺寸下加 alpha 通道（像素少），再直接缩放进缓冲区
+        if self._bgra is None or self._bgra.shape[:2] != (height, width):
+            self._bgra = np.empty((height, width, 4), dtype=np.uint8)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=self._bgra)
+        if (out_w, out_h) == (width, height):
+            np.copyto(presented.buffer, self._bgra)
+        else:
+            if self.fast_transform:
+                interpolation = cv2.INTER_NEAREST
+            elif out_w < width:
+                interpolation = cv2.INTER_AREA
+            else:
+                interpolation = cv2.INTER_LINEAR
+            cv2.resize(self._bgra, (out_w, out_h), dst=presented.buffer, interpolation=interpolation)
+        self.presented += 1
+        return presented
+
+
+def benchmark(frames=200, source=(640, 480), targets=((1280, 720), (3840, 2160))):
+    """测量工作线程中每帧的缩放+转换耗时（毫秒）"""
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (source[1], source[0], 3), dtype=np.uint8)
+    results = {}
+    for target in targets:
+        for fast in (False, True):
+            presenter = FramePresenter(fast_transform=fast)
+            presenter.set_target_size(*target)
+            previous = None
+            start = time.perf_counter()
+            for _ in range(frames):
+                current = presenter.present(frame)
+                presenter.release(previous)  # 模拟界面显示新帧后归还旧帧
+                previous = current
+            elapsed = (time.perf_counter() - start) / frames * 1000
+            results[f"{target[0]}x{target[1]} {'fast' if fast else 'smooth'}"] = round(elapsed, 3)
+    return results
+
+
+if __name__ == "__main__":
+    for name, ms in benchmark().items():
+        print(f"{name}: {ms}ms/帧")
@@ -0,0 +1,239 @@
+"""手势序列播放
+
+时间线由若干步组成，每步一个6位手势（顺序同 format_finger_status：手腕, 食指, 中指, 无名指, 拇指, 小指）、
+保持时间和过渡时间，可从 JSON 文件加载:
+
+    {
+      "name": "demo",
+      "mode": "loop",            # once / loop / pingpong
+      "repeat": 0,               # 循环次数，0 表示一直循环（once 时忽略）
+      "steps": [
+        {"pattern": "000000", "hold": 1.5},
+        {"pattern": "001111", "hold": 1.5, "transition": 0.4}
+      ]
+    }
+
+GestureSequencer 在独立线程中按单调时钟的绝对时刻调度，两步之间用 Event.wait 睡眠而不是轮询，
+误差不会逐步累积；停止、切换时间线和被实时跟踪抢占时立即唤醒。
+过渡时间大于0且提供了 send_targets（二进制协议）时，按 rate 发送插值后的PWM目标值，
+插值结束后再发送该步的手势，让下位机退出目标值跟随；否则直接发送手势，由下位机按自己的速度扫动。
+pwm_ranges 应使用与实时跟踪相同的标定（AngleCalibration.pwm_ranges），插值终点才与手势位置一致。
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from finger_angles import DEFAULT_PWM_RANGES
+from hand_protocol import GESTURE_LENGTH
+
+MODES = ("once", "loop", "pingpong")
+
+
+class GestureStep():
+    __slots__ = ("pattern", "hold", "transition", "label")
+
+    def __init__(self, pattern, hold=1.0, transition=0.0, label=""):
+        if len(pattern) != GESTURE_LENGTH or set(pattern) - {"0", "1"}:
+            raise ValueError(f"手势应为{GESTURE_LENGTH}位0/1字符串: {pattern!r}")
+        if hold < 0 or transition < 0:
+            raise ValueError(f"保持/过渡时间不能为负: {pattern} {hold} {transition}")
+        self.pattern = pattern
+        self.hold = float(hold)
+        self.transition = float(transition)
+        self.label = label
+
+    @property
+    def duration(self):
+        return self.transition + self.hold
+
+    def __repr__(self):
+        return f"GestureStep({self.pattern!r}, hold={self.hold:g}, transition={self.transition:g})"
+
+
+class GestureTimeline():
+    def __init__(self, steps, mode="loop", repeat=0, name=""):
+        if not steps:
+            raise ValueError("时间线至少需要一步")
+        if mode not in MODES:
+            raise ValueError(f"未知的播放方式: {mode}（可选 {', '.join(MODES)}）")
+        self.steps = list(steps)
+        self.mode = mode
+        self.repeat = int(repeat)
+        self.name = name
+
+    @classmethod
+    def from_patterns(cls, patterns, hold=1.0, mode="loop", name=""):
+        return cls([GestureStep(p, hold) for p in patterns], mode, name=name)
+
+    @classmethod
+    def from_dict(cls, data, name=""):
+        steps = [GestureStep(s["pattern"], s.get("hold", 1.0), s.get("transition", 0.0), s.get("label", ""))
+                 for s in data["steps"]]
+        return cls(steps, data.get("mode", "loop"), data.get("repeat", 0), data.get("name", name))
+
+    def order(self):
+        """依次产生要播放的步序号"""
+        count = len(self.steps)
+        forward = list(range(count))
+        if self.mode == "pingpong" and count > 1:
+            cycle = forward + forward[-2:0:-1]  # 0..n-1..1，首尾不重复
+        else:
+            cycle = forward
+        passes = 1 if self.mode == "once" else self.repeat
+        n = 0
+        while passes <= 0 or n < passes:
+            yield from cycle
+            n += 1
+        if self.mode == "pingpong" and count > 1:
+            yield 0  # 回到起始手势
+
+
+def load_timeline(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return GestureTimeline.from_dict(data, os.path.splitext(os.path.basename(path))[0])
+
+
+def list_timelines(directory):
+    """目录下所有时间线文件 {名称: 路径}"""
+    if not os.path.isdir(directory):
+        return {}
+    return {os.path.splitext(name)[0]: os.path.join(directory, name)
+            for name in sorted(os.listdir(directory)) if name.endswith(".json")}
+
+
+def pattern_to_pwm(pattern, pwm_ranges=DEFAULT_PWM_RANGES):
+    ranges = np.asarray(pwm_ranges, dtype=np.float32)
+    return np.where([c == "1" for c in pattern], ranges[:, 1], ranges[:, 0])
+
+
+class GestureSequencer():
+    """在独立线程中播放时间线
+
+    send(pattern) 发送一个手势；send_targets(pwm) 可选，用于过渡插值（6路PWM整数数组）；
+    on_step(index, step) 每步开始时回调；on_finished() 时间线正常播放完时回调。回调都在播放线程中执行。
+    """
+
+    def __init__(self, send, send_targets=None, on_step=None, on_finished=None, rate=30.0,
+                 pwm_ranges=DEFAULT_PWM_RANGES):
+        self.send = send
+        self.send_targets = send_targets
+        self.on_step = on_step
+        self.on_finished = on_finished
+        self.rate = rate
+        self.pwm_ranges = pwm_ranges
+        self.timeline = None
+        self._thread = None
+        # 每次 play() 新建停止和唤醒事件并传给播放线程：stop() 等待超时后旧线程仍只看自己的事件，
+        # 不会因为下一次 play() 而恢复运行，两个线程同时给机械手发指令
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._preempted_until = 0.0
+        self.steps_played = 0
+        self.max_lateness = 0.0   # 实际发送时刻晚于计划时刻的最大值（秒）
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def preempted(self):
+        return time.monotonic() < self._preempted_until
+
+    @property
+    def active(self):
+        """正在播放且未被抢占，此时实时跟踪不应发送指令"""
+        return self.running and not self.preempted
+
+    def play(self, timeline):
+        """开始播放，正在播放的时间线立即停止"""
+        self.stop()
+        self.timeline = timeline
+        self._preempted_until = 0.0
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(timeline, self._stop, self._wake), daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def preempt(self, hold=2.0):
+        """实时跟踪接管 hold 秒（每次检测到手时调用以延长），到期后从当前步重新开始
+
+        :return: 本次调用是否刚开始抢占（调用方据此立即发送实时状态）
+        """
+        started = self.running and not self.preempted
+        self._preempted_until = time.monotonic() + hold
+        if started:
+            self._wake.set()
+        return started
+
+    def _sleep_until(self, deadline, stop, wake):
+        """睡到 deadline，被停止或抢占时提前返回False"""
+        while not stop.is_set():
+            if self.preempted:
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            wake.wait(remaining)
+            wake.clear()
+        return False
+
+    def _wait_preempt(self, stop, wake):
+        while not stop.is_set() and self.preempted:
+            wake.wait(max(self._preempted_until - time.monotonic(), 0.001))
+            wake.clear()
+
+    def _run(self, timeline, stop, wake):
+        previous = None
+        order = timeline.order()
+        index = next(order)
+        deadline = time.monotonic()
+        while not stop.is_set():
+            step = timeline.steps[index]
+            lateness = time.monotonic() - deadline
+            if lateness > self.max_lateness:
+                self.max_lateness = lateness
+            if self.on_step:
+                self.on_step(index, step)
+
+            completed = self._play_step(step, previous, deadline, stop, wake)
+            if stop.is_set():
+                break
+            if not completed:
+                # 被抢占：等实时跟踪结束后重放当前步（机械手位置已未知，不做过渡）
+                self._wait_preempt(stop, wake)
+                previous = None
+                deadline = time.monotonic()
+                continue
+            self.steps_played += 1
+            previous = step
+            deadline += step.duration
+            index = next(order, None)
+            if index is None:
+                if self.on_finished:
+                    self.on_finished()
+                break
+
+    def _play_step(self, step, previous, start, stop, wake):
+        """发送一步并保持到结束时刻，被打断时返回False"""
+        if step.transition > 0 and self.send_targets is not None and previous is not None:
+            begin = pattern_to_pwm(previous.pattern, self.pwm_ranges)
+            end = pattern_to_pwm(step.pattern, self.pwm_ranges)
+            ticks = max(int(step.transition * self.rate), 1)
+            for tick in range(1, ticks + 1):
+                targets = np.rint(begin + (end - begin) * (tick / ticks)).astype(np.int32)
+                self.send_targets(targets)
+                if not self._sleep_until(start + step.transition * tick / ticks, stop, wake):
+                    return False
+        self.send(step.pattern)
+        return self._sleep_until(start + step.duration, stop, wake)
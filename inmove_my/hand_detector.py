@@ -0,0 +1,160 @@
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from finger_state import HANDEDNESS_CODES, UNKNOWN_HAND
+
+
+class HandDetector():
+    def __init__(self, mode=False, maxHands=1, detectionCon=0.7, trackCon=0.5,
+                 roi_tracking=False, roi_expand=1.6, roi_min_size=160, roi_refresh=30):
+        self.mode = mode
+        self.maxHands = maxHands
+        self.detectionCon = detectionCon
+        self.trackCon = trackCon
+
+        self.mpHands = mp.solutions.hands
+        self.hands = self._create_hands()
+        self.mpDraw = mp.solutions.drawing_utils
+        self.handedness = None  # 存储手的左右信息
+        self.results = None
+        self.inference_scale = 1.0  # 送入MediaPipe前的缩放比例（由调速器调整）
+
+        # ROI跟踪：检测到手后只对上一帧手部周围的扩展区域做推理
+        self.roi_tracking = roi_tracking
+        self.roi_expand = roi_expand        # 包围盒放大倍数
+        self.roi_min_size = roi_min_size    # 裁剪区域最小边长（像素）
+        self.roi_refresh = roi_refresh      # 每隔N帧强制全帧搜索一次，0表示不强制
+        self.roi = None                     # 下一帧使用的裁剪区域 (x0, y0, x1, y1)
+        self.roi_used = None                # 本帧实际使用的裁剪区域，全帧时为None
+        self.roi_hands = None               # 裁剪画面单独使用一个实例，避免两种坐标系互相干扰跟踪
+        self._frames_since_full = 0
+
+    def _create_hands(self):
+        return self.mpHands.Hands(
+            static_image_mode=self.mode,
+            max_num_hands=self.maxHands,
+            min_detection_confidence=self.detectionCon,
+            min_tracking_confidence=self.trackCon
+        )
+
+    def findHands(self, frame, draw=True):
+        h, w = frame.shape[:2]
+        self.roi_used = None
+        self.results = None
+
+        if self.roi_tracking and self.roi is not None and \
+                (self.roi_refresh <= 0 or self._frames_since_full < self.roi_refresh):
+            x0, y0, x1, y1 = self.roi
+            if self.roi_hands is None:
+                self.roi_hands = self._create_hands()
+            results = self._process(self.roi_hands, frame[y0:y1, x0:x1])
+            if results.multi_hand_landmarks:
+                self._map_to_frame(results, self.roi, w, h)
+                self.results = results
+                self.roi_used = self.roi
+                self._frames_since_full += 1
+
+        if self.results is None:
+            # 未启用跟踪或跟踪丢失，回退到全帧搜索
+            self.results = self._process(self.hands, frame)
+            self._frames_since_full = 0
+
+        if self.roi_tracking:
+            self.roi = self._next_roi(self.results, w, h)
+        
+        if self.results.multi_hand_landmarks:
+            self.handedness = []
+            for hand_landmarks, handedness in zip(self.results.multi_hand_landmarks, self.results.multi_handedness):
+                if draw:
+                    self.mpDraw.draw_landmarks(frame, hand_landmarks, self.mpHands.HAND_CONNECTIONS)
+                # 获取手的左右信息
+                self.handedness.append(handedness.classification[0].label)
+        return frame
+
+    def _process(self, hands, image):
+        """按推理缩放比例缩小BGR图像后转RGB送入MediaPipe（输出为归一化坐标，不受缩放影响）"""
+        if self.inference_scale < 1.0:
+            image = cv2.resize(image, None, fx=self.inference_scale, fy=self.inference_scale,
+                               interpolation=cv2.INTER_LINEAR)
+        return hands.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+    @staticmethod
+    def _map_to_frame(results, roi, width, height):
+        """把裁剪区域内的归一化坐标换算回全帧归一化坐标（原地修改）"""
+        x0, y0, x1, y1 = roi
+        crop_w, crop_h = x1 - x0, y1 - y0
+        for hand_landmarks in results.multi_hand_landmarks:
+            for lm in hand_landmarks.landmark:
+                lm.x = (x0 + lm.x * crop_w) / width
+                lm.y = (y0 + lm.y * crop_h) / height
+                lm.z = lm.z * crop_w / width
+
+    def _next_roi(self, results, width, height):
+        """根据本帧关键点计算下一帧的正方形裁剪区域，无手或区域接近全帧时返回None"""
+        if not results or not results.multi_hand_landmarks:
+            return None
+        xs = [lm.x for hand in results.multi_hand_landmarks for lm in hand.landmark]
+        ys = [lm.y for hand in results.multi_hand_landmarks for lm in hand.landmark]
+        left, right = min(xs) * width, max(xs) * width
+        top, bottom = min(ys) * height, max(ys) * height
+
+        size = max(right - left, bottom - top) * self.roi_expand
+        size = int(min(max(size, self.roi_min_size), width, height))
+        if size * size >= 0.8 * width * height:
+            return None
+
+        cx, cy = (left + right) / 2, (top + bottom) / 2
+        x0 = int(min(max(cx - size / 2, 0), width - size))
+        y0 = int(min(max(cy - size / 2, 0), height - size))
+        return (x0, y0, x0 + size, y0 + size)
+
+    def drawHands(self, frame, results):
+        """在帧上绘制指定检测结果的手部关键点（可在其他线程中绘制之前的结果）"""
+        if results is not None and results.multi_hand_landmarks:
+            for hand_landmarks in results.multi_hand_landmarks:
+                self.mpDraw.draw_landmarks(frame, hand_landmarks, self.mpHands.HAND_CONNECTIONS)
+        return frame
+    
+    def findPosition(self, frame, handNo=0, draw=False):
+        lmList = []
+        handType = None
+
+        if self.results.multi_hand_landmarks:
+            if handNo < len(self.results.multi_hand_landmarks):
+                myHand = self.results.multi_hand_landmarks[handNo]
+                if self.handedness and handNo < len(self.handedness):
+                    handType = self.handedness[handNo]
+
+                for id, lm in enumerate(myHand.landmark):
+                    h, w, c = frame.shape
+                    cx, cy = int(lm.x * w), int(lm.y * h)
+
+                    lmList.append([id, cx, cy])
+
+                    if draw and id == 0:
+                        cv2.circle(frame, (cx, cy), 10, (255, 0, 255), -1)
+        return lmList, handType
+
+    def findLandmarks(self, frame):
+        """以数组形式返回所有手的关键点
+
+        :return: (landmarks, handedness)
+            landmarks: (hands, 21, 3) float32，x/y为像素坐标，z与x同尺度
+            handedness: (hands,) int8，LEFT/RIGHT/UNKNOWN_HAND
+        """
+        if self.results is None or not self.results.multi_hand_landmarks:
+            return np.zeros((0, 21, 3), dtype=np.float32), np.zeros((0,), dtype=np.int8)
+
+        h, w = frame.shape[:2]
+        landmarks = np.array(
+            [[(lm.x, lm.y, lm.z) for lm in hand.landmark] for hand in self.results.multi_hand_landmarks],
+            dtype=np.float32)
+        landmarks *= np.array([w, h, w], dtype=np.float32)
+
+        labels = self.handedness or []
+        handedness = np.array(
+            [HANDEDNESS_CODES.get(labels[i], UNKNOWN_HAND) if i < len(labels) else UNKNOWN_HAND
+             for i in range(len(landmarks))],
+            dtype=np.int8)
+        return landmarks, handedness
@@ -0,0 +1,210 @@
+"""上位机与下位机（music_low.ino）之间的串口协议
+
+ASCII模式（默认/兼容）: 6位"0/1"字符串加换行，如 b"011111\n"
+
+二进制帧模式:
+    +------+------+-----+-----+-------------+------+
+    | 0xA5 | type | seq | len | payload[len] | crc8 |
+    +------+------+-----+-----+-------------+------+
+    crc8 覆盖 type..payload，多项式 0x07（CRC-8/SMBUS）
+    FRAME_MASK    payload 1字节，bit i 对应状态列 i（手腕, 食指, 中指, 无名指, 拇指, 小指）
+    FRAME_TARGETS payload 6个 uint16 小端PWM目标值（比例跟随模式的关键帧）
+    FRAME_DELTA   payload 1字节通道掩码 + 每个置位通道一个 uint16 小端PWM目标值（按通道顺序），
+                  只携带有明显变化的通道
+
+协商: 在当前波特率下发送 ASCII 行 "BIN <baud>"，下位机回复 "ACK BIN <baud>" 后
+双方切换到新波特率和二进制帧；超时未回复则继续使用ASCII模式。
+"""
+import time
+
+SYNC = 0xA5
+FRAME_MASK = 0x01
+FRAME_TARGETS = 0x02
+FRAME_DELTA = 0x03
+FRAME_TYPES = (FRAME_MASK, FRAME_TARGETS, FRAME_DELTA)
+MAX_PAYLOAD = 16
+HEADER_SIZE = 4
+GESTURE_LENGTH = 6
+
+
+def _make_crc8_table(poly=0x07):
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return bytes(table)
+
+
+CRC8_TABLE = _make_crc8_table()
+
+
+def crc8(data, crc=0):
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def encode_ascii(finger_status):
+    """ASCII协议：6位"0/1"字符串加换行，如 b"011111\n" """
+    return (finger_status + '\n').encode("ascii")
+
+
+def status_to_mask(finger_status):
+    """"011111" -> 位掩码，第i个字符对应bit i"""
+    mask = 0
+    for i, c in enumerate(finger_status[:GESTURE_LENGTH]):
+        if c == "1":
+            mask |= 1 << i
+    return mask
+
+
+def mask_to_status(mask):
+    """位掩码 -> "011111" 形式的字符串"""
+    return "".join("1" if mask >> i & 1 else "0" for i in range(GESTURE_LENGTH))
+
+
+def describe_bytes(data):
+    """把发出的字节还原成可读的手势字符串（用于状态显示）"""
+    if data and data[0] == SYNC:
+        frames = FrameDecoder().feed(data)
+        if frames and frames[0].type == FRAME_MASK:
+            return mask_to_status(frames[0].mask)
+        if frames and frames[0].type == FRAME_TARGETS:
+            return "PWM " + ",".join(str(t) for t in frames[0].targets)
+        if frames and frames[0].type == FRAME_DELTA:
+            return "PWM " + " ".join(f"{ch}:{t}" for ch, t in frames[0].delta.items())
+        return data.hex()
+    return data.decode("ascii", errors="replace").strip()
+
+
+def encode_frame(frame_type, seq, payload=b""):
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"payload过长: {len(payload)} > {MAX_PAYLOAD}")
+    body = bytes((frame_type, seq & 0xFF, len(payload))) + bytes(payload)
+    return bytes((SYNC,)) + body + bytes((crc8(body),))
+
+
+class Frame():
+    __slots__ = ("type", "seq", "payload")
+
+    def __init__(self, frame_type, seq, payload):
+        self.type = frame_type
+        self.seq = seq
+        self.payload = payload
+
+    @property
+    def mask(self):
+        return self.payload[0]
+
+    @property
+    def targets(self):
+        return [int.from_bytes(self.payload[i:i + 2], "little") for i in range(0, len(self.payload), 2)]
+
+    @property
+    def delta(self):
+        """差量帧 -> {通道: PWM目标值}"""
+        mask = self.payload[0]
+        channels = [i for i in range(8) if mask >> i & 1]
+        return {ch: int.from_bytes(self.payload[1 + 2 * k:3 + 2 * k], "little") for k, ch in enumerate(channels)}
+
+    def __repr__(self):
+        return f"Frame(type={self.type:#04x}, seq={self.seq}, payload={self.payload.hex()})"
+
+
+class FrameDecoder():
+    """流式解析二进制帧，遇到错误字节或CRC错误时自动重新同步"""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.crc_errors = 0
+        self.skipped_bytes = 0
+
+    def feed(self, data):
+        """输入任意长度的字节，返回解析出的完整帧列表"""
+        self._buf += data
+        frames = []
+        buf = self._buf
+        while True:
+            start = buf.find(SYNC)
+            if start < 0:
+                self.skipped_bytes += len(buf)
+                buf.clear()
+                break
+            if start:
+                self.skipped_bytes += start
+                del buf[:start]
+            if len(buf) < HEADER_SIZE:
+                break
+            length = buf[3]
+            if buf[1] not in FRAME_TYPES or length > MAX_PAYLOAD:
+                self.skipped_bytes += 1
+                del buf[:1]
+                continue
+            total = HEADER_SIZE + length + 1
+            if len(buf) < total:
+                break
+            if crc8(buf[1:total - 1]) != buf[total - 1]:
+                self.crc_errors += 1
+                del buf[:1]
+                continue
+            frames.append(Frame(buf[1], buf[2], bytes(buf[HEADER_SIZE:total - 1])))
+            del buf[:total]
+        return frames
+
+
+class StatusEncoder():
+    """把手指状态字符串编码为串口字节，binary=False 时使用ASCII协议"""
+
+    def __init__(self, binary=False):
+        self.binary = binary
+        self.seq = 0
+
+    def _next_seq(self):
+        seq = self.seq
+        self.seq = (self.seq + 1) & 0xFF
+        return seq
+
+    def encode(self, finger_status):
+        if not self.binary:
+            return encode_ascii(finger_status)
+        return encode_frame(FRAME_MASK, self._next_seq(), bytes((status_to_mask(finger_status),)))
+
+    def encode_targets(self, targets):
+        """二进制模式下发送6路PWM目标值"""
+        payload = b"".join(int(t).to_bytes(2, "little") for t in targets)
+        return encode_frame(FRAME_TARGETS, self._next_seq(), payload)
+
+    def encode_delta(self, changes):
+        """二进制模式下只发送变化的通道，changes 为 {通道: PWM目标值}"""
+        mask = 0
+        payload = bytearray(1)
+        for channel in sorted(changes):
+            mask |= 1 << channel
+            payload += int(changes[channel]).to_bytes(2, "little")
+        payload[0] = mask
+        return encode_frame(FRAME_DELTA, self._next_seq(), bytes(payload))
+
+
+def negotiate_binary(ser, baudrate=115200, timeout=2.5):
+    """请求下位机切换到二进制帧和更高波特率
+
+    需要在启动串口监听线程之前调用；成功时 ser.baudrate 已切换，返回True。
+    下位机刚复位时还在初始化舵机，所以在超时前每0.5秒重发一次请求。
+    """
+    request = f"BIN {baudrate}\n".encode("ascii")
+    expected = f"ACK BIN {baudrate}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        ser.write(request)
+        ser.flush()
+        resend_at = min(time.monotonic() + 0.5, deadline)
+        while time.monotonic() < resend_at:
+            line = ser.readline().decode("ascii", errors="ignore").strip()
+            if line == expected:
+                time.sleep(0.05)  # 等下位机发完ACK并切换波特率
+                ser.baudrate = baudrate
+                ser.reset_input_buffer()
+                return True
+    return False
@@ -0,0 +1,218 @@
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# 中文字体候选路径（Windows / Linux / macOS）
+FONT_PATHS = [
+    "C:/Windows/Fonts/simhei.ttf",
+    "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+]
+
+
+def load_chinese_font(font_size):
+    """按顺序尝试加载中文字体，都找不到时使用默认字体"""
+    for font_path in FONT_PATHS:
+        try:
+            return ImageFont.truetype(font_path, font_size, encoding="utf-8")
+        except Exception:
+            continue
+    print("警告: 未找到中文字体，使用默认字体")
+    try:
+        return ImageFont.load_default(font_size)
+    except TypeError:
+        # 旧版Pillow的load_default不接受字号参数
+        return ImageFont.load_default()
+
+
+def draw_text_with_chinese(frame, text, position, font_size=16, color=(255, 255, 0)):
+    """使用PIL绘制中文文本（适配小屏幕字体）
+
+    每次调用都会重新加载字体并整帧转换颜色空间，开销较大，
+    视频循环中请使用 HudOverlay；这里保留作为基准对照。
+    """
+    try:
+        # 将OpenCV的BGR格式转为PIL的RGB格式
+        img_pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        draw = ImageDraw.Draw(img_pil)
+        font = load_chinese_font(font_size)
+
+        # 绘制文本
+        draw.text(position, text, font=font, fill=(color[2], color[1], color[0]))  # PIL使用RGB顺序
+
+        # 将PIL图像转回OpenCV格式
+        return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
+    except Exception as e:
+        print(f"文本绘制错误: {e}")
+        # 出错时返回原始帧
+        return frame
+
+
+class HudOverlay():
+    """缓存式HUD叠加层
+
+    字体每个字号只加载一次；单个字符渲染成灰度字形后缓存，
+    整行标签由缓存字形拼接并同样缓存（变化的数字只需拼接，不再调用PIL）。
+    一帧内的所有文字先写入复用的颜色/透明度缓冲区，最后一次性做alpha混合。
+    """
+
+    def __init__(self, max_labels=256):
+        self.max_labels = max_labels
+        self._fonts = {}
+        self._glyphs = {}
+        self._labels = OrderedDict()
+        self._color = None
+        self._alpha = None
+        self._dirty = None  # 上一帧写过的区域 (x0, y0, x1, y1)
+
+    def _font(self, font_size):
+        font = self._fonts.get(font_size)
+        if font is None:
+            font = load_chinese_font(font_size)
+            self._fonts[font_size] = font
+        return font
+
+    def _glyph(self, char, font_size):
+        """返回单个字符的 (灰度掩码, 步进宽度)"""
+        key = (char, font_size)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            font = self._font(font_size)
+            ascent, descent = font.getmetrics()
+            advance = int(round(font.getlength(char)))
+            right = font.getbbox(char)[2]
+            img = Image.new("L", (max(advance, right, 1), ascent + descent))
+            ImageDraw.Draw(img).text((0, 0), char, font=font, fill=255)
+            glyph = (np.asarray(img, dtype=np.uint8), advance)
+            self._glyphs[key] = glyph
+        return glyph
+
+    def _label(self, text, font_size):
+        """返回整行文字的灰度掩码，按LRU缓存"""
+        key = (text, font_size)
+        mask = self._labels.get(key)
+        if mask is not None:
+            self._labels.move_to_end(key)
+            return mask
+
+        glyphs = [self._glyph(ch, font_size) for ch in text]
+        height = glyphs[0][0].shape[0] if glyphs else 1
+        width = 1
+        x = 0
+        for glyph_mask, advance in glyphs:
+            width = max(width, x + glyph_mask.shape[1])
+            x += advance
+        mask = np.zeros((height, width), dtype=np.uint8)
+        x = 0
+        for glyph_mask, advance in glyphs:
+            h, w = glyph_mask.shape
+            np.maximum(mask[:h, x:x + w], glyph_mask, out=mask[:h, x:x + w])
+            x += advance
+
+        self._labels[key] = mask
+        if len(self._labels) > self.max_labels:
+            self._labels.popitem(last=False)
+        return mask
+
+    def _ensure_buffers(self, shape):
+        if self._color is None or self._color.shape[:2] != shape[:2]:
+            self._color = np.zeros((shape[0], shape[1], 3), dtype=np.uint8)
+            self._alpha = np.zeros((shape[0], shape[1]), dtype=np.uint8)
+            self._dirty = None
+
+    def render(self, frame, items):
+        """把HUD元素叠加到BGR帧上（原地修改并返回frame）
+
+        :param items: [(text, (x, y), font_size, (b, g, r)), ...]
+        """
+        self._ensure_buffers(frame.shape)
+        frame_h, frame_w = frame.shape[:2]
+
+        # 清除上一帧写过的区域
+        if self._dirty is not None:
+            x0, y0, x1, y1 = self._dirty
+            self._alpha[y0:y1, x0:x1] = 0
+
+        bx0, by0, bx1, by1 = frame_w, frame_h, 0, 0
+        for text, (x, y), font_size, color in items:
+            if not text:
+                continue
+            mask = self._label(text, font_size)
+            x0, y0 = max(int(x), 0), max(int(y), 0)
+            x1 = min(int(x) + mask.shape[1], frame_w)
+            y1 = min(int(y) + mask.shape[0], frame_h)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            sub = mask[y0 - int(y):y1 - int(y), x0 - int(x):x1 - int(x)]
+            alpha_roi = self._alpha[y0:y1, x0:x1]
+            covered = sub > alpha_roi
+            self._color[y0:y1, x0:x1][covered] = color
+            alpha_roi[covered] = sub[covered]
+            bx0, by0 = min(bx0, x0), min(by0, y0)
+            bx1, by1 = max(bx1, x1), max(by1, y1)
+
+        if bx0 >= bx1 or by0 >= by1:
+            self._dirty = None
+            return frame
+        self._dirty = (bx0, by0, bx1, by1)
+
+        # 只在所有文字的包围盒内做一次混合
+        alpha = self._alpha[by0:by1, bx0:bx1, None].astype(np.uint16)
+        roi = frame[by0:by1, bx0:bx1]
+        blended = (roi.astype(np.uint16) * (255 - alpha) +
+                   self._color[by0:by1, bx0:bx1].astype(np.uint16) * alpha + 127) // 255
+        roi[...] = blended.astype(np.uint8)
+        return frame
+
+
+def _benchmark_items(frame_count):
+    """模拟VideoThread每帧绘制的HUD内容"""
+    items = [
+        (f"实际FPS: {15 + frame_count % 15}", (10, 50), 18, (255, 0, 255)),
+        ("滑动窗口: 2帧", (10, 80), 18, (255, 255, 0)),
+        (f"帧计数: {frame_count}", (10, 110), 18, (255, 255, 0)),
+        ("检测到: Right", (10, 140), 16, (255, 255, 255)),
+    ]
+    names = ["手腕", "食指", "中指", "无名指", "拇指", "小指"]
+    for i, name in enumerate(names):
+        bent = (frame_count // 7 + i) % 2 == 0
+        color = (0, 255, 0) if bent else (0, 0, 255)
+        items.append((f"{name}: {'弯曲' if bent else '伸直'}", (10, 170 + i * 30), 16, color))
+    return items
+
+
+def benchmark(frames=200, width=640, height=480):
+    """对比逐条PIL绘制与缓存HUD的每帧叠加耗时（毫秒）"""
+    base = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+
+    start = time.perf_counter()
+    for n in range(frames):
+        frame = base.copy()
+        for text, position, font_size, color in _benchmark_items(n):
+            frame = draw_text_with_chinese(frame, text, position, font_size, color)
+    legacy_ms = (time.perf_counter() - start) * 1000 / frames
+
+    hud = HudOverlay()
+    start = time.perf_counter()
+    for n in range(frames):
+        frame = base.copy()
+        hud.render(frame, _benchmark_items(n))
+    cached_ms = (time.perf_counter() - start) * 1000 / frames
+
+    # 两次测量都包含相同的 base.copy()，单独扣除
+    start = time.perf_counter()
+    for n in range(frames):
+        frame = base.copy()
+    copy_ms = (time.perf_counter() - start) * 1000 / frames
+
+    return legacy_ms - copy_ms, cached_ms - copy_ms
+
+
+if __name__ == "__main__":
+    legacy_ms, cached_ms = benchmark()
+    print(f"逐条PIL绘制: {legacy_ms:.3f} ms/帧")
+    print(f"缓存HUD叠加: {cached_ms:.3f} ms/帧")
+    print(f"加速比: {legacy_ms / max(cached_ms, 1e-6):.1f}x")
@@ -0,0 +1,73 @@
+class LatencyGovernor():
+    """根据每帧处理耗时动态调整跳帧数和推理分辨率
+
+    处理耗时用指数滑动平均估计，每 adjust_interval 帧评估一次：
+    超出预算时先降低推理分辨率，再增加跳帧；
+    明显低于预算时先减少跳帧，再恢复分辨率。
+    快的机器逐帧全分辨率处理，慢的机器逐步降级而不是越积越慢。
+    """
+
+    def __init__(self, target_fps=30.0, target_latency_ms=None, scales=(1.0, 0.75, 0.5),
+                 max_skip=3, alpha=0.2, adjust_interval=15, headroom=0.6):
+        """
+        :param target_fps: 目标处理帧率，未指定 target_latency_ms 时预算为 1/target_fps
+        :param target_latency_ms: 每帧处理耗时预算（毫秒），优先于 target_fps
+        :param scales: 可选的推理缩放比例，从高到低
+        :param max_skip: 最多跳过的帧数
+        :param headroom: 耗时低于预算的该比例时才尝试升级，避免来回抖动
+        """
+        if target_latency_ms:
+            self.budget = target_latency_ms / 1000.0
+        else:
+            self.budget = 1.0 / target_fps
+        self.scales = list(scales)
+        self.max_skip = max_skip
+        self.alpha = alpha
+        self.adjust_interval = adjust_interval
+        self.headroom = headroom
+
+        self.skip_frames = 0
+        self.scale_index = 0
+        self.average = None  # 平均处理耗时（秒）
+        self._frames = 0
+
+    @property
+    def inference_scale(self):
+        return self.scales[self.scale_index]
+
+    def update(self, processing_time):
+        """记录一帧的处理耗时（秒），决策发生变化时返回True"""
+        if self.average is None:
+            self.average = processing_time
+        else:
+            self.average += self.alpha * (processing_time - self.average)
+
+        self._frames += 1
+        if self._frames < self.adjust_interval:
+            return False
+        self._frames = 0
+
+        # 每处理一帧前跳过skip帧时，单帧可用时间相应放大
+        frame_budget = self.budget * (self.skip_frames + 1)
+        if self.average > frame_budget * 1.1:
+            if self.scale_index < len(self.scales) - 1:
+                self.scale_index += 1
+                return True
+            if self.skip_frames < self.max_skip:
+                self.skip_frames += 1
+                return True
+        elif self.skip_frames > 0:
+            if self.average < self.budget * self.skip_frames * self.headroom:
+                self.skip_frames -= 1
+                return True
+        elif self.average < self.budget * self.headroom and self.scale_index > 0:
+            self.scale_index -= 1
+            return True
+        return False
+
+    def summary(self):
+        """当前决策的简短描述，用于状态栏/画面显示"""
+        average_ms = (self.average or 0.0) * 1000
+        budget_ms = self.budget * (self.skip_frames + 1) * 1000
+        return (f"调速: 跳帧{self.skip_frames} 分辨率{int(self.inference_scale * 100)}% "
+                f"耗时{average_ms:.0f}/{budget_ms:.0f}ms")
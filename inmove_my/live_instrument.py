@@ -0,0 +1,286 @@
+"""实时乐器：手指弯曲的瞬间发出该手指对应的五声音阶音
+
+手指 -> 车道 -> 音高与可视化和自动演奏一致（score_loader.LANE_COLUMNS、music_data.my_board）：
+小指、无名、中指、食指、拇指 对应 宫商角徵羽。音色可以是 NumPy 合成的拨弦音，
+也可以从目录加载采样（<音高>.wav，如 1.wav 为宫音），启动时全部转换好放在内存中。
+
+声音由 SDL 音频回调直接混合（pygame._sdl2.audio.AudioDevice，默认每块256帧，约5.8ms），
+不经过 pygame.mixer 的通道和缓冲:
+    - 复音：同时发声的音不超过 polyphony 个，超过时最早的音在约1.5ms内淡出（抢占）
+    - 同一手指再次弯曲时旧音淡出后重新发声，伸直时按 release 时间淡出
+    - 精确到样本的起音：事件按其发生时刻换算成设备帧号，统一延后一块，
+      所以每个音从事件到发声的延迟相同，不随事件落在块内的位置抖动
+
+延迟不是实测值（没有回录），而是在回调中按
+"回调时刻 + 起音在块内的偏移 + 设备报告的缓冲块时长 + device_latency" 估计，经 update() 写入指标:
+    instrument_estimate        手指状态变化 -> 发声
+    gesture_to_sound_estimate  摄像头采集 -> 发声（含推理和滤波）
+SDL 只报告自己的缓冲区大小，系统音频栈和驱动的输出延迟（Windows 共享模式常见10~30ms）不在其中，
+需要用回录等方法测出后通过 device_latency 加上，估计值才能和 "低于30ms" 的目标比较；
+不加时估计值约为两块缓冲（约11.6ms），只是下限。
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from audio_stream import WavFile
+from music_data import my_board
+from score_loader import LANE_COLUMNS, MIDI_DEGREES
+
+NOTE_ON = 1
+NOTE_OFF = 0
+STEAL_FADE = 64   # 被抢占的音的淡出帧数
+# 简谱音高 -> 相对主音的半音数
+DEGREE_SEMITONES = {degree: semitone for semitone, degree in MIDI_DEGREES.items()}
+
+
+def synthesize(frequency, rate, seconds=1.5, decay=3.0):
+    """拨弦音色：几个衰减速度不同的泛音叠加，3ms 起音避免爆音"""
+    t = np.arange(int(seconds * rate), dtype=np.float32) / rate
+    tone = np.zeros_like(t)
+    for harmonic, amplitude in ((1, 1.0), (2, 0.5), (3, 0.25), (4, 0.12)):
+        tone += amplitude * np.sin(2 * np.pi * frequency * harmonic * t) * np.exp(-decay * harmonic * t)
+    tone *= np.minimum(t / 0.003, 1.0)
+    return (tone / np.abs(tone).max() * 0.3).astype(np.float32)
+
+
+def synth_bank(rate, board=None, tonic=72):
+    """每条车道一个合成音，tonic 为宫音的 MIDI 音符号（默认 C5）"""
+    board = my_board if board is None else board
+    bank = []
+    for pitch in board:
+        note = tonic + DEGREE_SEMITONES[pitch]
+        bank.append(synthesize(440.0 * 2 ** ((note - 69) / 12), rate))
+    return bank
+
+
+def load_bank(directory, rate, board=None):
+    """从目录加载 <音高>.wav 采样，混成单声道并重采样到 rate；缺少的音高用合成音代替"""
+    board = my_board if board is None else board
+    fallback = synth_bank(rate, board)
+    bank = []
+    for lane, pitch in enumerate(board):
+        path = os.path.join(directory, f"{pitch}.wav")
+        if not os.path.exists(path):
+            bank.append(fallback[lane])
+            continue
+        wav = WavFile(path, use_mmap=False)
+        try:
+            samples = wav.read(0, wav.frames).mean(axis=1)
+            if wav.rate != rate:
+                positions = np.arange(int(len(samples) * rate / wav.rate)) * (wav.rate / rate)
+                samples = np.interp(positions, np.arange(len(samples)), samples)
+        finally:
+            wav.close()
+        bank.append(np.asarray(samples, dtype=np.float32))
+    return bank
+
+
+class Voice():
+    __slots__ = ("sample", "lane", "position", "start", "release_at", "release_frames", "done")
+
+    def __init__(self, sample, lane, start):
+        self.sample = sample
+        self.lane = lane
+        self.position = 0            # 已播放的样本数
+        self.start = start           # 起音的设备帧号
+        self.release_at = None       # 开始淡出的设备帧号
+        self.release_frames = 0
+        self.done = False
+
+    @property
+    def releasing(self):
+        return self.release_at is not None
+
+    def release(self, at, frames):
+        if self.release_at is None or at + frames < self.release_at + self.release_frames:
+            self.release_at = at
+            self.release_frames = max(frames, 1)
+
+    def mix(self, out, block_start):
+        """把本块内的样本加到 out（单声道）上"""
+        offset = max(self.start - block_start, 0)
+        count = min(len(out) - offset, len(self.sample) - self.position)
+        if count <= 0:
+            self.done = self.position >= len(self.sample)
+            return
+        segment = self.sample[self.position:self.position + count]
+        if self.release_at is not None:
+            frames = block_start + offset + np.arange(count)
+            envelope = np.clip(1.0 - (frames - self.release_at) / self.release_frames, 0.0, 1.0)
+            segment = segment * envelope
+            if envelope[-1] <= 0.0:
+                self.done = True
+        out[offset:offset + count] += segment
+        self.position += count
+        if self.position >= len(self.sample):
+            self.done = True
+
+
+class LiveInstrument():
+    """手指状态 -> 音符，在 SDL 音频回调中混音"""
+
+    def __init__(self, rate=44100, block=256, channels=2, polyphony=8, release=0.15, bank=None,
+                 sample_dir=None, metrics=None, board=None, device_latency=0.0):
+        """
+        :param device_latency: SDL 缓冲之后系统音频栈和驱动的输出延迟（秒），SDL 无法报告，需外部测量
+        """
+        self.rate = rate
+        self.block = block
+        self.channels = channels
+        self.polyphony = polyphony
+        self.release_frames = int(release * rate)
+        board = my_board if board is None else board
+        if bank is None:
+            bank = load_bank(sample_dir, rate, board) if sample_dir else synth_bank(rate, board)
+        self.bank = bank
+        self.metrics = metrics
+        self.device_latency = device_latency
+        self.output_latency = block / rate + device_latency  # 回调填好的块要等前一块播完，再经过系统音频栈
+        self.voices = []
+        self.pattern = "000000"
+        self._events = deque()            # (设备帧号, 类型, 车道, 事件时刻, 采集时刻)，视频线程追加，回调取出
+        self._measurements = deque(maxlen=1024)  # 回调中估计的 (事件->发声, 采集->发声)
+        self._frame = 0                   # 下一块的起始设备帧号
+        self._block_time = None           # 最近一次回调的时刻
+        self._block_frame = 0             # 最近一次回调那一块的起始帧号
+        self._lock = threading.Lock()     # 只保护时间基准的读写，回调中持有时间极短
+        self.device = None
+        self.steals = 0
+        self.notes_played = 0
+
+    def start(self, device_name=None):
+        """打开音频输出设备开始回调；失败时抛出 pygame 的异常"""
+        from pygame._sdl2 import audio as sdl_audio
+        from pygame._sdl2 import sdl2
+        sdl2.init_subsystem(sdl2.INIT_AUDIO)
+        if device_name is None:
+            names = sdl_audio.get_audio_device_names(False)
+            if not names:
+                raise RuntimeError("没有可用的音频输出设备")
+            device_name = names[0]
+        self.device = sdl_audio.AudioDevice(
+            devicename=device_name, iscapture=False, frequency=self.rate, audioformat=sdl_audio.AUDIO_F32,
+            numchannels=self.channels, chunksize=self.block, allowed_changes=0, callback=self._callback)
+        # 按设备实际报告的缓冲大小估计输出延迟
+        self.output_latency = self.device.chunksize / self.device.frequency + self.device_latency
+        self.device.pause(0)
+        return self
+
+    def stop(self):
+        if self.device is not None:
+            self.device.pause(1)
+            self.device.close()
+            self.device = None
+
+    def _frame_at(self, t):
+        """事件时刻 -> 起音帧号：换算成设备帧号后延后一块，保证落在尚未混音的块中"""
+        with self._lock:
+            if self._block_time is None:
+                return self._frame
+            return self._block_frame + self.block + int((t - self._block_time) * self.rate)
+
+    def note_on(self, lane, at=None, capture_time=None):
+        at = time.perf_counter() if at is None else at
+        self._events.append((self._frame_at(at), NOTE_ON, lane, at, capture_time))
+
+    def note_off(self, lane, at=None):
+        at = time.perf_counter() if at is None else at
+        self._events.append((self._frame_at(at), NOTE_OFF, lane, at, None))
+
+    def update(self, pattern, capture_time=None):
+        """传入新的6位手指状态（format_finger_status 顺序），弯曲的手指发声、伸直的手指停止
+
+        :return: 本次发声的车道列表
+        """
+        at = time.perf_counter()
+        started = []
+        for lane, column in enumerate(LANE_COLUMNS[:len(self.bank)]):
+            before, after = self.pattern[column] == "1", pattern[column] == "1"
+            if after and not before:
+                self.note_on(lane, at, capture_time)
+                started.append(lane)
+            elif before and not after:
+                self.note_off(lane, at)
+        self.pattern = pattern
+        self.flush_metrics()
+        return started
+
+    def flush_metrics(self):
+        """把回调中估计的延迟写入指标（回调本身不碰指标的锁）"""
+        while self._measurements:
+            instrument, gesture = self._measurements.popleft()
+            if self.metrics is not None:
+                self.metrics.observe("instrument_estimate", instrument)
+                if gesture is not None:
+                    self.metrics.observe("gesture_to_sound_estimate", gesture)
+
+    def _start_voice(self, lane, frame):
+        for voice in self.voices:
+            if voice.lane == lane and not voice.releasing:
+                voice.release(frame, STEAL_FADE)  # 同一手指重新弯曲
+        sounding = [voice for voice in self.voices if not voice.releasing]
+        if len(sounding) >= self.polyphony:
+            sounding[0].release(frame, STEAL_FADE)  # 抢占最早的音
+            self.steals += 1
+        self.voices.append(Voice(self.bank[lane], lane, frame))
+        self.notes_played += 1
+
+    def render(self, frames, now=None):
+        """混合接下来的 frames 帧，返回 (frames, channels) 的 float32 数组"""
+        block_start = self._frame
+        out = np.zeros(frames, dtype=np.float32)
+        events = self._events
+        while events and events[0][0] < block_start + frames:
+            frame, kind, lane, at, capture_time = events.popleft()
+            frame = max(frame, block_start)  # 回调被推迟时，已过期的事件在本块开头发声
+            if kind == NOTE_ON:
+                # 先混合到起音位置之前的声音不受影响：新音从 frame 开始，抢占的淡出也从 frame 开始
+                self._start_voice(lane, frame)
+                if now is not None:
+                    sounding = now + (frame - block_start) / self.rate + self.output_latency
+                    self._measurements.append((sounding - at, None if capture_time is None else sounding - capture_time))
+            else:
+                for voice in self.voices:
+                    if voice.lane == lane and not voice.releasing:
+                        voice.release(frame, self.release_frames)
+        for voice in self.voices:
+            voice.mix(out, block_start)
+        self.voices = [voice for voice in self.voices if not voice.done]
+        self._frame = block_start + frames
+        np.clip(out, -1.0, 1.0, out=out)
+        return np.repeat(out[:, None], self.channels, axis=1) if self.channels > 1 else out[:, None]
+
+    def _callback(self, device, stream):
+        now = time.perf_counter()
+        frames = len(stream) // (4 * self.channels)
+        with self._lock:
+            self._block_time = now
+            self._block_frame = self._frame
+        try:
+            stream[:] = self.render(frames, now).tobytes()
+        except Exception:
+            stream[:] = bytes(len(stream))  # 回调中不能抛出异常，输出静音
+
+    def latency_summary(self):
+        if self.metrics is None:
+            return {}
+        return {name: self.metrics.histogram(name).summary()
+                for name in ("instrument_estimate", "gesture_to_sound_estimate")}
+
+
+if __name__ == "__main__":
+    # 没有摄像头时的自检：依次弯曲五根手指再伸直，打印估计的延迟（不含系统音频栈）
+    from metrics import Metrics
+    instrument = LiveInstrument(metrics=Metrics()).start()
+    patterns = ["000001", "000101", "001101", "011101", "011111", "000000"] * 4
+    for gesture in patterns:
+        instrument.update(gesture, time.perf_counter())
+        time.sleep(0.25)
+    time.sleep(0.5)
+    instrument.flush_metrics()
+    instrument.stop()
+    print({"notes": instrument.notes_played, "steals": instrument.steals, **instrument.latency_summary()})
@@ -0,0 +1,273 @@
+"""运行时指标：计数器 + HDR 风格延迟直方图
+
+各阶段调用 observe(名称, 秒) 记录耗时、count(名称) 计数，记录本身只是一次分桶和几次加法。
+直方图按对数-线性分桶（每个2的幂区间再细分32格，相对误差约3%），
+1微秒到约1分钟的范围固定约700个桶，内存和记录开销与样本数无关，可以一直开着。
+
+导出方式:
+    serve(port)       本机 HTTP 接口，GET /metrics 返回 JSON 快照
+    start_csv(path)   后台线程定期追加 CSV，每行一个指标在该时间段内的统计
+AckTracker 把下位机 "Received:" 回显与发出的指令配对，统计写入到确认的耗时。
+"""
+import csv
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from hand_protocol import SYNC
+
+SUB_BITS = 6
+SUB_COUNT = 1 << SUB_BITS      # 小于64微秒的值每微秒一格
+HALF_COUNT = SUB_COUNT // 2    # 之后每个2的幂区间32格
+MAX_VALUE_US = 60_000_000      # 超过1分钟的值计入最后一格
+
+
+def _bucket_index(value_us):
+    if value_us < SUB_COUNT:
+        return value_us
+    shift = value_us.bit_length() - SUB_BITS
+    return SUB_COUNT + (shift - 1) * HALF_COUNT + (value_us >> shift) - HALF_COUNT
+
+
+def _bucket_upper(index):
+    """桶内最大值（微秒），与 HdrHistogram 一样按上界报告分位数"""
+    if index < SUB_COUNT:
+        return index
+    shift = (index - SUB_COUNT) // HALF_COUNT + 1
+    mantissa = (index - SUB_COUNT) % HALF_COUNT + HALF_COUNT
+    return ((mantissa + 1) << shift) - 1
+
+
+BUCKETS = _bucket_index(MAX_VALUE_US) + 1
+
+
+class LatencyHistogram():
+    """对数-线性分桶的延迟直方图，单位内部为微秒，接口为秒/毫秒"""
+
+    def __init__(self, counts=None):
+        self.counts = counts if counts is not None else [0] * BUCKETS
+        self.total = sum(self.counts)
+        self.sum_us = 0
+        self.min_us = None
+        self.max_us = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        value = min(max(int(seconds * 1e6), 0), MAX_VALUE_US)
+        index = _bucket_index(value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.sum_us += value
+            if value > self.max_us:
+                self.max_us = value
+            if self.min_us is None or value < self.min_us:
+                self.min_us = value
+
+    def copy(self):
+        with self._lock:
+            other = LatencyHistogram(list(self.counts))
+            other.sum_us, other.min_us, other.max_us = self.sum_us, self.min_us, self.max_us
+        return other
+
+    def since(self, previous):
+        """与之前的 copy() 相减，得到这段时间内的直方图（最小/最大值按桶边界估计）"""
+        counts = [a - b for a, b in zip(self.counts, previous.counts)]
+        delta = LatencyHistogram(counts)
+        delta.sum_us = self.sum_us - previous.sum_us
+        used = [i for i, c in enumerate(counts) if c]
+        if used:
+            delta.min_us = _bucket_upper(used[0] - 1) + 1 if used[0] else 0
+            delta.max_us = _bucket_upper(used[-1])
+        return delta
+
+    def percentile(self, p):
+        """第p百分位（毫秒），没有样本时返回None"""
+        if not self.total:
+            return None
+        rank = max(int(round(p / 100.0 * self.total)), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max_us) / 1000.0
+        return self.max_us / 1000.0
+
+    def summary(self):
+        if not self.total:
+            return {"count": 0}
+        return {
+            "count": self.total,
+            "mean_ms": round(self.sum_us / self.total / 1000.0, 3),
+            "min_ms": round((self.min_us or 0) / 1000.0, 3),
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max_us / 1000.0, 3),
+        }
+
+
+class Metrics():
+    """计数器和各阶段延迟直方图的集合，可在任意线程记录"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._csv_thread = None
+        self._csv_running = False
+
+    def histogram(self, name):
+        hist = self.histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(name, LatencyHistogram())
+        return hist
+
+    def observe(self, name, seconds):
+        self.histogram(name).record(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        return {
+            "time": round(time.time(), 3),
+            "uptime_s": round(time.time() - self.started, 3),
+            "counters": dict(self.counters),
+            "latency": {name: hist.summary() for name, hist in list(self.histograms.items())},
+        }
+
+    def serve(self, port=8765, host="127.0.0.1"):
+        """启动本机 HTTP 接口：GET /metrics（或 /）返回 JSON 快照，返回实际端口"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # 不往控制台打印访问日志
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def start_csv(self, path, interval=5.0):
+        """后台线程每 interval 秒追加一次CSV：延迟为该时间段内的统计，计数为累计值"""
+        self._csv_running = True
+        self._csv_thread = threading.Thread(target=self._csv_loop, args=(path, interval), daemon=True)
+        self._csv_thread.start()
+
+    def _csv_loop(self, path, interval):
+        fields = ["time", "name", "count", "mean_ms", "min_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+        previous = {}
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            if f.tell() == 0:
+                writer.writeheader()
+            deadline = time.monotonic()
+            while True:
+                deadline += interval
+                while self._csv_running and time.monotonic() < deadline:
+                    time.sleep(min(0.2, max(deadline - time.monotonic(), 0)))
+                now = round(time.time(), 3)
+                for name, hist in list(self.histograms.items()):
+                    current = hist.copy()
+                    window = current.since(previous[name]) if name in previous else current
+                    previous[name] = current
+                    writer.writerow({"time": now, "name": name, **window.summary()})
+                for name, value in sorted(self.counters.items()):
+                    writer.writerow({"time": now, "name": name, "count": value})
+                f.flush()
+                if not self._csv_running:
+                    break
+
+    def stop(self):
+        """关闭 HTTP 接口并写出最后一次CSV"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self._csv_running = False
+        if self._csv_thread is not None:
+            self._csv_thread.join(timeout=2.0)
+            self._csv_thread = None
+
+
+class AckTracker():
+    """把 music_low.ino 的 "Received: ..." 回显与发出的指令配对
+
+    二进制帧按序号配对（回显末尾 " #seq"），ASCII 指令按6位状态字符串配对。
+    写入串口时调用 sent()，串口读线程收到一行时调用 received()；
+    比已确认指令更早、仍未确认的指令视为丢失（下位机丢弃或被合并），计入 "ack_missing"。
+    """
+
+    def __init__(self, metrics, name="ack", max_pending=64):
+        self.metrics = metrics
+        self.name = name
+        self.max_pending = max_pending
+        self._pending = OrderedDict()  # key -> 写入时刻
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sent_key(data):
+        if len(data) >= 3 and data[0] == SYNC:
+            return data[2]
+        return data.decode("ascii", "ignore").strip()
+
+    @staticmethod
+    def _received_key(line):
+        if not line.startswith("Received:"):
+            return None
+        text = line[len("Received:"):].strip()
+        if "#" in text:
+            seq = text.rsplit("#", 1)[1].strip()
+            return int(seq) if seq.isdigit() else None
+        return text
+
+    def sent(self, data, sent_at=None):
+        key = self._sent_key(data)
+        with self._lock:
+            self._pending.pop(key, None)  # ASCII 同一手势再次发送时按最近一次计时
+            self._pending[key] = time.perf_counter() if sent_at is None else sent_at
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+                self.metrics.count(self.name + "_missing")
+
+    def received(self, line, received_at=None):
+        """处理一行回显，是确认行时返回True"""
+        key = self._received_key(line)
+        if key is None:
+            return False
+        received_at = time.perf_counter() if received_at is None else received_at
+        with self._lock:
+            sent_at = self._pending.pop(key, None)
+            if sent_at is None:
+                self.metrics.count(self.name + "_unmatched")
+                return True
+            missing = 0
+            for older in list(self._pending):
+                if self._pending[older] > sent_at:
+                    break
+                del self._pending[older]
+                missing += 1
+        if missing:
+            self.metrics.count(self.name + "_missing", missing)
+        self.metrics.count(self.name + "s")
+        self.metrics.observe(self.name, received_at - sent_at)
+        return True
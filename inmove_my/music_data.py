@@ -0,0 +1,21 @@
+"""内置乐谱数据和下落时间
+
+不依赖 pygame：调度、乐谱加载等无界面的模块从这里导入，test7 再从这里导出同名变量。
+"""
+
+my_board = [1, 2, 3, 5, 6]  # 宫商角徵羽对应的音符
+# 与 scores/canhaiyi.txt 相同；原来多出的最后一个音没有时值，一直被 zip 截掉
+my_music = [6, 5, 3, 2, 1, 3, 2, 1, 6, 5, 5, 6, 5, 6, 1, 2, 3, 5, 6, 5, 3, 2, 1]
+durations = [0.9, 0.3, 0.6, 0.6, 2.4, 0.9, 0.3, 0.6, 0.6, 2.3, 0.9, 0.3, 0.6, 0.6, 0.9, 0.3, 0.6, 0.6, 0.9, 0.3, 0.6, 0.6, 2.4]
+
+FALL_TIME = 2.5  # 音符从屏幕顶端落到底端的时间(秒)
+KEYBOARD_FRACTION = 0.2  # 键盘高度占画面高度的比例，音符下沿到达键盘上沿即为落键
+
+
+def sequential_score(music=None, note_durations=None, start=0.0):
+    """按顺序首尾相接的乐谱，逐个产生 (开始时间, 音高, 时值)"""
+    t = start
+    for note, duration in zip(my_music if music is None else music,
+                              durations if note_durations is None else note_durations):
+        yield t, note, duration
+        t += duration
@@ -0,0 +1,245 @@
+"""按乐谱提前调度机械手指令，使手指在节拍上落下
+
+乐谱为 score_loader 编译的时间线（默认由 music_data 的 my_music/durations 编译），
+音高经 my_board 对应到五个车道，车道从左到右为 小指、无名、中指、食指、拇指（draw_musical_notes），
+再对应到6位手势的状态列（时间线中的 mask）。
+compile_score 把时间线编译成以音频时钟为基准的指令列表；MusicScheduler 在独立线程中
+按 "音符时刻 - 动作延迟" 发送，动作延迟由 ActuationEstimator 估计:
+    串口传输（字节数 * 10 / 波特率）+ 下位机扫动（music_low.ino 16步 * 5ms）
+并用下位机扫动结束后打印的 "Current state: xxxxxx" 实测（写入串口到收到该行，减去该行回传时间），取最近样本的中位数。
+
+漂移统计两项:
+    send_drift     实际发送时刻 + 当时估计的动作延迟 - 音符时刻（调度误差）
+    strike_drift   实测扫动结束时刻 - 音符时刻（机械手实际相对节拍的早晚）
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from music_data import FALL_TIME, KEYBOARD_FRACTION
+from score_loader import LANE_COLUMNS, from_lists, mask_to_pattern
+
+OPEN_PATTERN = "000000"
+# 下位机开关模式扫动：MAX_ITERATIONS/STEP_SIZE+1 步，每步 delay(5)，另加主循环最多一次 delay(5)
+FIRMWARE_SWEEP = (150 // 10 + 1) * 0.005 + 0.005
+# 音符从出现到落到键盘上沿的时间，与 test7 的下落速度一致（2.0秒），与画面尺寸无关
+VISUAL_HIT_DELAY = FALL_TIME * (1 - KEYBOARD_FRACTION)
+
+
+class AudioClock():
+    """音频播放位置（秒）：以开始播放时的 perf_counter 为零点，offset 补偿声卡输出延迟"""
+
+    def __init__(self, offset=0.0):
+        self.offset = offset
+        self.started = None
+
+    def start(self, at=None):
+        self.started = time.perf_counter() if at is None else at
+
+    def position(self):
+        return self.position_at(time.perf_counter())
+
+    def position_at(self, t):
+        """perf_counter 时刻 t 对应的播放位置"""
+        if self.started is None:
+            return 0.0
+        return t - self.started - self.offset
+
+
+class ArmCommand():
+    __slots__ = ("time", "pattern", "note", "lane")
+
+    def __init__(self, command_time, pattern, note=None, lane=None):
+        self.time = command_time  # 音频时钟上手指应到位的时刻（秒）
+        self.pattern = pattern
+        self.note = note          # None 表示松开
+        self.lane = lane
+
+    def __repr__(self):
+        return f"ArmCommand({self.time:.3f}, {self.pattern!r}, note={self.note})"
+
+
+def compile_score(music=None, note_durations=None, board=None, start=VISUAL_HIT_DELAY,
+                  release_hold=0.3, lane_columns=LANE_COLUMNS, timeline=None):
+    """乐谱 -> 按时间排序的 ArmCommand 列表
+
+    每个时刻弯曲该时刻所有音符对应的手指（同时伸直其他手指）；
+    下一时刻用到同一根手指或已是最后一个时刻时，在 min(release_hold, 时值/2) 后插入一次全部伸直。
+    :param timeline: score_loader.ScoreTimeline，不提供时由 music/note_durations/board 编译
+    :param start: 乐谱0时刻在音频时钟上的时刻，默认使第一个音符与可视化的落键时刻一致
+    """
+    if timeline is None:
+        timeline = from_lists(music, note_durations, board, lane_columns)
+    commands = []
+    for onset, row, following in timeline.onsets():
+        t = start + onset
+        mask = int(row["mask"])
+        commands.append(ArmCommand(t, mask_to_pattern(mask), int(row["pitch"]), int(row["lane"])))
+        if following is None or following & mask:
+            commands.append(ArmCommand(t + min(release_hold, float(row["duration"]) / 2), OPEN_PATTERN))
+    return commands
+
+
+class ActuationEstimator():
+    """一只机械手（一个串口）的动作延迟估计：写入串口 -> 扫动结束"""
+
+    def __init__(self, baudrate=9600, frame_bytes=7, sweep=FIRMWARE_SWEEP, samples=16, max_pending=16):
+        self.default = frame_bytes * 10 / baudrate + sweep
+        self.echo = len("Current state: 000000\r\n") * 10 / baudrate  # 扫动结束后回传该行的时间
+        self.samples = deque(maxlen=samples)
+        self.max_pending = max_pending
+        self._pending = {}   # 手势 -> 写入时刻
+        self._lock = threading.Lock()
+
+    @property
+    def latency(self):
+        """当前估计（秒）：有实测样本时取中位数"""
+        if not self.samples:
+            return self.default
+        return float(np.median(self.samples))
+
+    def sent(self, pattern, sent_at=None):
+        with self._lock:
+            self._pending[pattern] = time.perf_counter() if sent_at is None else sent_at
+            if len(self._pending) > self.max_pending:
+                self._pending.pop(next(iter(self._pending)))
+
+    def received(self, line, received_at=None):
+        """处理一行下位机输出，是扫动结束行且能配对时返回 (手势, 写入时刻, 延迟)"""
+        if not line.startswith("Current state:"):
+            return None
+        pattern = line[len("Current state:"):].strip()
+        received_at = time.perf_counter() if received_at is None else received_at
+        with self._lock:
+            sent_at = self._pending.pop(pattern, None)
+        latency = None if sent_at is None else received_at - self.echo - sent_at
+        if latency is None or latency < 0:
+            return None
+        self.samples.append(latency)
+        return pattern, sent_at, latency
+
+
+class MusicScheduler():
+    """在独立线程中按音频时钟提前发送指令
+
+    send(pattern) 在调度线程中调用；on_command(command, send_drift) 每发送一条后回调。
+    串口读线程收到的每一行交给 feed_line()，用于实测动作延迟和落点漂移。
+    send 只是投递到异步写线程时设 confirm_sent=True，并在实际写入串口后调用 sent()，
+    实测的动作延迟才不包含写线程的排队时间，被合并掉没有发出的指令也不会留下等待配对的记录。
+    """
+
+    def __init__(self, send, clock, estimator=None, on_command=None, confirm_sent=False):
+        self.send = send
+        self.clock = clock
+        self.estimator = estimator or ActuationEstimator()
+        self.on_command = on_command
+        self.confirm_sent = confirm_sent
+        self.commands = []
+        self.send_drift = []
+        self.strike_drift = []
+        self._inflight = {}   # 手势 -> 最近发送的 ArmCommand
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = False
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, commands):
+        self.stop()
+        self.commands = sorted(commands, key=lambda c: c.time)
+        self.send_drift = []
+        self.strike_drift = []
+        self._inflight = {}
+        self._stop = False
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        for command in self.commands:
+            # 每条指令发送前重新读取延迟估计，实测样本随演奏逐步生效
+            while not self._stop:
+                remaining = command.time - self.estimator.latency - self.clock.position()
+                if remaining <= 0:
+                    break
+                self._wake.wait(remaining)
+            if self._stop:
+                return
+            latency = self.estimator.latency
+            self._inflight[command.pattern] = command
+            self.send(command.pattern)
+            if not self.confirm_sent:
+                self.estimator.sent(command.pattern)
+            drift = self.clock.position() + latency - command.time
+            self.send_drift.append(drift)
+            if self.on_command:
+                self.on_command(command, drift)
+
+    def sent(self, pattern, sent_at=None):
+        """写线程回调（confirm_sent=True 时）：手势已写入串口，开始计时动作延迟"""
+        if pattern in self._inflight:
+            self.estimator.sent(pattern, sent_at)
+
+    def feed_line(self, line, received_at=None):
+        """串口读线程回调；是扫动结束行时记录实际落点漂移并返回（秒）"""
+        result = self.estimator.received(line, received_at)
+        if result is None:
+            return None
+        command = self._inflight.pop(result[0], None)
+        if command is None:
+            return None
+        drift = self.clock.position_at(result[1] + result[2]) - command.time
+        self.strike_drift.append(drift)
+        return drift
+
+    def drift_summary(self):
+        def stats(values):
+            if not values:
+                return {"count": 0}
+            ms = np.asarray(values) * 1000
+            return {
+                "count": int(ms.size),
+                "mean_ms": round(float(ms.mean()), 2),
+                "p95_abs_ms": round(float(np.percentile(np.abs(ms), 95)), 2),
+                "max_abs_ms": round(float(np.abs(ms).max()), 2),
+            }
+        return {
+            "actuation_ms": round(self.estimator.latency * 1000, 1),
+            "measured": len(self.estimator.samples),
+            "send_drift": stats(self.send_drift),
+            "strike_drift": stats(self.strike_drift),
+        }
+
+    def summary(self):
+        """HUD/状态栏用的一行摘要"""
+        s = self.drift_summary()
+        strike = s["strike_drift"]
+        text = f"自动演奏: 延迟{s['actuation_ms']:.0f}ms({s['measured']}次实测)"
+        if strike["count"]:
+            text += f" 落点漂移{strike['mean_ms']:+.0f}ms p95 {strike['p95_abs_ms']:.0f}ms"
+        return text
+
+
+if __name__ == "__main__":
+    # 不连接机械手，按默认延迟空跑一遍，检查调度误差
+    clock = AudioClock()
+    scheduler = MusicScheduler(lambda pattern: None, clock)
+    commands = compile_score(start=0.2)
+    for command in commands[:8]:
+        print(command)
+    clock.start()
+    scheduler.start(commands)
+    scheduler._thread.join()
+    print(scheduler.drift_summary())
@@ -0,0 +1,198 @@
+"""离线把 test7 的乐谱可视化渲染成视频
+
+用于排练录像和展台循环播放：任意分辨率和帧率，不需要界面和声卡。
+MusicVisualizer.render_frame(t) 的画面只由时刻决定，所以总帧数可以切成若干段，
+由进程池并行渲染、各自编码成分段视频，再按顺序拼接:
+    有 ffmpeg 时用 concat 直接拷贝码流（可同时混入音频），拼接几乎不花时间；
+    没有时用 OpenCV 依次读出各段重新编码，拼接是串行的，只有渲染和分段编码是并行的。
+
+示例:
+    python render_video.py rehearsal.mp4 --size 1920x1080 --fps 60
+    python render_video.py kiosk.mp4 --size 1280x720 --fps 30 --workers 4 --audio audio/canhaiyi.wav
+    python render_video.py song.mp4 --score scores/song.mid
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # 每个工作进程导入 pygame 时不打印欢迎信息
+
+import cv2
+
+import test7
+from score_loader import load_score
+
+
+def fourcc_for(path):
+    return "MJPG" if path.lower().endswith(".avi") else "mp4v"
+
+
+def score_duration(score):
+    """最后一个音符落出屏幕的时刻（默认下落速度）"""
+    return max((start + duration for start, _, duration in score), default=0.0) + test7.FALL_TIME
+
+
+def plan_chunks(first_frame, end_frame, chunk_frames):
+    """把 [first_frame, end_frame) 切成不超过 chunk_frames 帧的连续段"""
+    return [(start, min(start + chunk_frames, end_frame)) for start in range(first_frame, end_frame, chunk_frames)]
+
+
+def render_chunk(job):
+    """工作进程：渲染一段帧并编码成视频文件，返回 (路径, 帧数, 耗时)"""
+    started = time.perf_counter()
+    cv2.setNumThreads(1)  # 并行在进程层面，编码器不再开线程
+    width, height = job["size"]
+    visualizer = test7.MusicVisualizer(job["score"], width, height)
+    writer = cv2.VideoWriter(job["path"], cv2.VideoWriter_fourcc(*job["fourcc"]), job["fps"], (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"无法创建视频文件: {job['path']}（编码器 {job['fourcc']}）")
+    try:
+        for index in range(job["start"], job["end"]):
+            buffer = visualizer.render_frame(index / job["fps"])
+            writer.write(cv2.cvtColor(buffer, cv2.COLOR_BGRA2BGR))
+    finally:
+        writer.release()
+    return job["path"], job["end"] - job["start"], time.perf_counter() - started
+
+
+def concat_ffmpeg(ffmpeg, parts, output, audio=None):
+    list_path = os.path.join(os.path.dirname(parts[0]), "parts.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for part in parts:
+            f.write("file '{}'\n".format(os.path.abspath(part).replace("'", "'\\''")))
+    command = [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio:
+        command += ["-i", audio, "-map", "0:v", "-map", "1:a", "-c:v", "copy", "-c:a", "aac"]
+    else:
+        command += ["-c", "copy"]
+    subprocess.run(command + [output], check=True)
+
+
+def concat_opencv(parts, output, fourcc, fps, size):
+    writer = cv2.VideoWriter(output, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+    if not writer.isOpened():
+        raise RuntimeError(f"无法创建视频文件: {output}")
+    frames = 0
+    try:
+        for part in parts:
+            cap = cv2.VideoCapture(part)
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                writer.write(frame)
+                frames += 1
+            cap.release()
+    finally:
+        writer.release()
+    return frames
+
+
+def render_video(output, score=None, size=(test7.WIDTH, test7.HEIGHT), fps=test7.FPS, start=0.0, duration=None,
+                 workers=None, chunk_seconds=None, audio=None, keep_chunks=False):
+    """渲染乐谱可视化视频，返回统计信息
+
+    :param score: (开始时间, 音高, 时值) 序列（如 ScoreTimeline），默认 test7 的演示乐谱
+    :param start, duration: 渲染的时间范围（秒），duration 默认到最后一个音符落出屏幕
+    :param workers: 进程数，默认 CPU 核数；1 时在当前进程内渲染
+    :param chunk_seconds: 每段时长，默认把总帧数分成 workers * 4 段，让各进程负载均衡
+    """
+    started = time.perf_counter()
+    score = list(test7.sequential_score() if score is None else score)
+    if duration is None:
+        duration = max(score_duration(score) - start, 0.0)
+    workers = workers or os.cpu_count() or 1
+    first_frame = int(round(start * fps))
+    end_frame = first_frame + int(math.ceil(duration * fps))
+    total = end_frame - first_frame
+    if total <= 0:
+        raise ValueError("没有要渲染的帧")
+    if chunk_seconds:
+        chunk_frames = max(int(chunk_seconds * fps), 1)
+    else:
+        chunk_frames = max(math.ceil(total / (workers * 4)), 1)
+
+    fourcc = fourcc_for(output)
+    extension = ".avi" if fourcc == "MJPG" else ".mp4"
+    chunk_dir = tempfile.mkdtemp(prefix="render_", dir=os.path.dirname(os.path.abspath(output)))
+    jobs = [{"score": score, "size": tuple(size), "fps": fps, "start": a, "end": b, "fourcc": fourcc,
+             "path": os.path.join(chunk_dir, f"part_{i:05d}{extension}")}
+            for i, (a, b) in enumerate(plan_chunks(first_frame, end_frame, chunk_frames))]
+    try:
+        if workers == 1:
+            results = [render_chunk(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(render_chunk, jobs))  # map 按提交顺序返回，即按时间顺序
+        render_elapsed = time.perf_counter() - started
+
+        parts = [path for path, _, _ in results]
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg:
+            concat_ffmpeg(ffmpeg, parts, output, audio)
+        else:
+            if audio:
+                print("未找到 ffmpeg，输出视频不含音频", file=sys.stderr)
+            concat_opencv(parts, output, fourcc, fps, tuple(size))
+    finally:
+        if not keep_chunks:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "output": output,
+        "size": f"{size[0]}x{size[1]}",
+        "fps": fps,
+        "frames": total,
+        "video_seconds": round(total / fps, 3),
+        "workers": workers,
+        "chunks": len(jobs),
+        "stitch": "ffmpeg" if ffmpeg else "opencv",
+        "render_seconds": round(render_elapsed, 3),
+        "total_seconds": round(elapsed, 3),
+        "frames_per_second": round(total / elapsed, 1),
+        "realtime_factor": round(total / fps / elapsed, 2),  # 大于1表示比实时快
+        "chunk_cpu_seconds": round(sum(seconds for _, _, seconds in results), 3),
+    }
+
+
+def parse_size(text):
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="离线渲染乐谱可视化视频")
+    parser.add_argument("output", help="输出文件（.mp4 用 mp4v 编码，.avi 用 MJPG）")
+    parser.add_argument("--score", help="乐谱文件（简谱 .txt 或 .mid），默认 test7 的演示乐谱")
+    parser.add_argument("--size", type=parse_size, default=(test7.WIDTH, test7.HEIGHT),
+                        help=f"分辨率 宽x高 (默认{test7.WIDTH}x{test7.HEIGHT})")
+    parser.add_argument("--fps", type=float, default=test7.FPS, help=f"帧率 (默认{test7.FPS})")
+    parser.add_argument("--start", type=float, default=0.0, help="开始时刻（秒）")
+    parser.add_argument("--duration", type=float, help="时长（秒），默认到最后一个音符落出屏幕")
+    parser.add_argument("--workers", type=int, default=0, help="进程数 (默认CPU核数)")
+    parser.add_argument("--chunk-seconds", type=float, help="每段时长（秒），默认按进程数自动划分")
+    parser.add_argument("--audio", help="混入的音频文件（需要 ffmpeg）")
+    parser.add_argument("--keep-chunks", action="store_true", help="保留分段视频")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    score = load_score(args.score) if args.score else None
+    report = render_video(args.output, score=score, size=args.size, fps=args.fps, start=args.start, duration=args.duration,
+                          workers=args.workers or None, chunk_seconds=args.chunk_seconds, audio=args.audio,
+                          keep_chunks=args.keep_chunks)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+"""乐谱文件加载：简谱文本 / MIDI -> 紧凑的 NumPy 时间线
+
+时间线是按开始时间排序的结构化数组，每行一个音符:
+    start     开始时间（秒，乐谱时间，0 为乐曲开头）
+    duration  时值（秒）
+    pitch     简谱音高 1-7（只用于显示和车道映射）
+    lane      my_board 中的车道 0-4，即可视化中从左到右的手指
+    mask      同一时刻所有音符的6位手势位掩码，第 i 位对应手势字符串的第 i 位（format_finger_status 顺序）
+可视化（MusicVisualizer(score=timeline)，逐个取 (开始时间, 音高, 时值)）和自动演奏
+（compile_score(timeline=timeline)）使用同一份时间线。
+
+简谱文本格式（UTF-8，# 之后为注释）:
+    title: 残海忆
+    beat: 0.6                 # 一拍的秒数，也可写 bpm: 100
+    6. 5_ 3 2 | 1 - - - | 5:2.3
+音符为 1-7（0 为休止），后缀 _ 时值减半、. 附点；单独的 - 延长前一个音符一拍；
+:秒数 直接指定时值；八度记号 ' , 和小节线 | 只用于阅读，不影响结果。
+
+MIDI 只读取音符和速度事件（format 0/1，不支持 SMPTE 时间），打击乐通道忽略；
+按 tonic（默认中央C）换算成简谱音高，八度不影响车道。
+
+编译结果按 "文件内容 + 车道设置" 的哈希缓存在乐谱所在目录的 .cache 下，再次加载只需读取一个 .npz。
+"""
+import hashlib
+import json
+import os
+import re
+import struct
+
+import numpy as np
+
+from music_data import durations, my_board, my_music, sequential_score
+
+# 车道 -> 手势位置（手腕, 食指, 中指, 无名指, 拇指, 小指）：小指、无名、中指、食指、拇指
+LANE_COLUMNS = [5, 3, 2, 1, 4]
+GESTURE_BITS = 6
+CACHE_VERSION = 1
+
+TIMELINE_DTYPE = np.dtype([
+    ("start", np.float64),
+    ("duration", np.float64),
+    ("pitch", np.uint8),
+    ("lane", np.uint8),
+    ("mask", np.uint8),
+])
+
+# 大调音阶中相对主音的半音数 -> 简谱音高
+MIDI_DEGREES = {0: 1, 2: 2, 4: 3, 5: 4, 7: 5, 9: 6, 11: 7}
+PERCUSSION_CHANNEL = 9
+
+_NOTE_TOKEN = re.compile(r"^([0-7])([',]*)([_.]*)(?::(\d+(?:\.\d*)?|\.\d+))?$")
+
+
+class ScoreError(ValueError):
+    """乐谱格式错误或无法映射到机械手"""
+
+
+def mask_to_pattern(mask):
+    return "".join("1" if mask >> i & 1 else "0" for i in range(GESTURE_BITS))
+
+
+class ScoreTimeline():
+    """编译后的乐谱，notes 为 TIMELINE_DTYPE 结构化数组"""
+
+    def __init__(self, notes, title="", source=None):
+        self.notes = notes
+        self.title = title
+        self.source = source
+
+    def __len__(self):
+        return len(self.notes)
+
+    def __iter__(self):
+        """逐个产生 (开始时间, 音高, 时值)，即 MusicVisualizer 的 score 格式"""
+        for start, duration, pitch in zip(self.notes["start"].tolist(), self.notes["duration"].tolist(),
+                                          self.notes["pitch"].tolist()):
+            yield start, pitch, duration
+
+    @property
+    def end_time(self):
+        if not len(self.notes):
+            return 0.0
+        return float((self.notes["start"] + self.notes["duration"]).max())
+
+    def onsets(self):
+        """按开始时刻分组，产生 (开始时间, 该时刻第一个音符的行, 下一时刻的掩码或None)"""
+        notes = self.notes
+        if not len(notes):
+            return
+        firsts = np.flatnonzero(np.r_[True, np.diff(notes["start"]) > 0])
+        for i, row in enumerate(firsts):
+            following = int(notes["mask"][firsts[i + 1]]) if i + 1 < len(firsts) else None
+            yield float(notes["start"][row]), notes[row], following
+
+    def __repr__(self):
+        return f"ScoreTimeline({self.title!r}, {len(self)} notes, {self.end_time:.1f}s)"
+
+
+def compile_notes(rows, board=None, lane_columns=LANE_COLUMNS):
+    """(开始时间, 时值, 音高) 列表 -> 时间线数组，检查时值和音高并计算车道和手势掩码
+
+    同一时刻落在同一车道上的音符（如八度重叠）只保留时值最长的一个。
+    """
+    board = my_board if board is None else board
+    if len(lane_columns) < len(board):
+        raise ScoreError(f"车道数 {len(board)} 多于手势位置数 {len(lane_columns)}")
+    by_slot = {}
+    for start, duration, pitch in rows:
+        if not start >= 0:
+            raise ScoreError(f"开始时间无效: {start}")
+        if not duration > 0:
+            raise ScoreError(f"{start:.3f}s 处的音符 {pitch} 时值无效: {duration}")
+        if pitch not in board:
+            raise ScoreError(f"{start:.3f}s 处的音符 {pitch} 不在 {board} 中，机械手无法演奏")
+        lane = board.index(pitch)
+        slot = (round(start, 6), lane)
+        if slot not in by_slot or duration > by_slot[slot][1]:
+            by_slot[slot] = (start, duration, pitch, lane)
+
+    notes = np.zeros(len(by_slot), dtype=TIMELINE_DTYPE)
+    for i, (start, duration, pitch, lane) in enumerate(sorted(by_slot.values(), key=lambda r: (r[0], r[3]))):
+        notes[i] = (start, duration, pitch, lane, 1 << lane_columns[lane])
+    if len(notes):
+        # 同一时刻的音符共用一个合并后的掩码
+        firsts = np.flatnonzero(np.r_[True, np.diff(notes["start"]) > 0])
+        notes["mask"] = np.repeat(np.bitwise_or.reduceat(notes["mask"], firsts),
+                                  np.diff(np.r_[firsts, len(notes)]))
+    return notes
+
+
+def parse_jianpu(text):
+    """简谱文本 -> ((开始时间, 时值, 音高) 列表, 标题)"""
+    beat = 0.6
+    title = ""
+    rows = []
+    t = 0.0
+    last = None   # 最近一个音符在 rows 中的序号，休止符为 -1，- 延长的就是它
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        key, sep, value = line.partition(":")
+        if sep and key.strip().isalpha():
+            key, value = key.strip().lower(), value.strip()
+            if key == "title":
+                title = value
+                continue
+            if key not in ("beat", "bpm"):
+                raise ScoreError(f"第{number}行: 未知的设置 {key}")
+            try:
+                beat = float(value) if key == "beat" else 60.0 / float(value)
+            except (ValueError, ZeroDivisionError):
+                raise ScoreError(f"第{number}行: {key} 的值无效: {value}") from None
+            if not beat > 0:
+                raise ScoreError(f"第{number}行: 拍长必须大于0")
+            continue
+
+        for token in line.split():
+            if token == "|" or token == "||":
+                continue
+            if token == "-":
+                if last is None:
+                    raise ScoreError(f"第{number}行: 延音线 - 前没有音符")
+                if last >= 0:
+                    start, duration, pitch = rows[last]
+                    rows[last] = (start, round(duration + beat, 6), pitch)
+                t = round(t + beat, 6)
+                continue
+            match = _NOTE_TOKEN.match(token)
+            if match is None:
+                raise ScoreError(f"第{number}行: 无法识别 {token!r}")
+            pitch, _, marks, seconds = match.groups()
+            if seconds is not None:
+                if marks:
+                    raise ScoreError(f"第{number}行: {token!r} 不能同时使用时值记号和 :秒数")
+                duration = float(seconds)
+            else:
+                beats = 1.0
+                for mark in marks:
+                    beats = beats / 2 if mark == "_" else beats * 1.5
+                duration = round(beats * beat, 6)
+            if duration <= 0:
+                raise ScoreError(f"第{number}行: {token!r} 时值必须大于0")
+            if pitch == "0":
+                last = -1
+            else:
+                rows.append((t, duration, int(pitch)))
+                last = len(rows) - 1
+            t = round(t + duration, 6)
+    return rows, title
+
+
+def _read_varlen(data, pos):
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+
+def parse_midi(data, tonic=60):
+    """标准 MIDI 文件 -> ((开始时间, 时值, 音高) 列表, 标题)"""
+    if data[:4] != b"MThd" or len(data) < 14:
+        raise ScoreError("不是标准 MIDI 文件")
+    header_length = struct.unpack(">I", data[4:8])[0]
+    _, track_count, division = struct.unpack(">HHH", data[8:14])
+    if division & 0x8000:
+        raise ScoreError("不支持 SMPTE 时间格式的 MIDI 文件")
+    if division == 0:
+        raise ScoreError("MIDI 文件的每拍 tick 数为 0")
+
+    tempos = []   # (tick, 每拍微秒数)
+    spans = []    # (开始tick, 结束tick, 音符号)
+    title = ""
+    pos = 8 + header_length
+    try:
+        for _ in range(track_count):
+            if data[pos:pos + 4] != b"MTrk":
+                raise ScoreError(f"MIDI 音轨头无效（偏移 {pos}）")
+            length = struct.unpack(">I", data[pos + 4:pos + 8])[0]
+            pos += 8
+            end = pos + length
+            tick = 0
+            status = None
+            pending = {}  # (通道, 音符号) -> 开始tick
+            while pos < end:
+                delta, pos = _read_varlen(data, pos)
+                tick += delta
+                if data[pos] & 0x80:
+                    status = data[pos]
+                    pos += 1
+                elif status is None:
+                    raise ScoreError(f"MIDI 事件缺少状态字节（偏移 {pos}）")
+                if status == 0xFF:
+                    meta = data[pos]
+                    size, pos = _read_varlen(data, pos + 1)
+                    body = data[pos:pos + size]
+                    if meta == 0x51 and size == 3:
+                        tempos.append((tick, int.from_bytes(body, "big")))
+                    elif meta == 0x03 and not title:
+                        title = body.decode("utf-8", "replace")
+                    pos += size
+                    status = None  # 元事件和系统码不参与 running status
+                elif status in (0xF0, 0xF7):
+                    size, pos = _read_varlen(data, pos)
+                    pos += size
+                    status = None
+                else:
+                    kind, channel = status & 0xF0, status & 0x0F
+                    if kind in (0xC0, 0xD0):
+                        pos += 1
+                        continue
+                    note, velocity = data[pos], data[pos + 1]
+                    pos += 2
+                    if channel == PERCUSSION_CHANNEL:
+                        continue
+                    if kind == 0x90 and velocity:
+                        pending.setdefault((channel, note), tick)
+                    elif kind in (0x80, 0x90):
+                        start = pending.pop((channel, note), None)
+                        if start is not None and tick > start:
+                            spans.append((start, tick, note))
+            pos = end
+    except (IndexError, struct.error):
+        raise ScoreError("MIDI 文件不完整") from None
+
+    # tick -> 秒，按速度变化分段累加
+    tempos = sorted(tempos) or [(0, 500000)]
+    if tempos[0][0] != 0:
+        tempos.insert(0, (0, 500000))
+    marks = []   # (tick, 该tick的秒数, 每tick秒数)
+    seconds = 0.0
+    for i, (tick, tempo) in enumerate(tempos):
+        if i:
+            previous_tick, _, per_tick = marks[-1]
+            seconds += (tick - previous_tick) * per_tick
+        marks.append((tick, seconds, tempo / 1e6 / division))
+    mark_ticks = [m[0] for m in marks]
+
+    def to_seconds(tick):
+        i = np.searchsorted(mark_ticks, tick, side="right") - 1
+        base_tick, base_seconds, per_tick = marks[i]
+        return base_seconds + (tick - base_tick) * per_tick
+
+    rows = []
+    for start, end, note in spans:
+        degree = MIDI_DEGREES.get((note - tonic) % 12)
+        begin = to_seconds(start)
+        if degree is None:
+            raise ScoreError(f"{begin:.3f}s 处的 MIDI 音符 {note} 不在主音 {tonic} 的大调音阶上")
+        rows.append((round(begin, 6), round(to_seconds(end) - begin, 6), degree))
+    return rows, title
+
+
+def from_lists(music=None, note_durations=None, board=None, lane_columns=LANE_COLUMNS, title=""):
+    """music_data 的 my_music/durations 形式 -> 时间线，两者长度不同时抛出 ScoreError"""
+    music = my_music if music is None else music
+    note_durations = durations if note_durations is None else note_durations
+    if len(music) != len(note_durations):
+        raise ScoreError(f"音符数 {len(music)} 与时值数 {len(note_durations)} 不一致")
+    rows = [(start, duration, pitch) for start, pitch, duration in sequential_score(music, note_durations)]
+    return ScoreTimeline(compile_notes(rows, board, lane_columns), title)
+
+
+def _cache_key(data, kind, board, lane_columns, tonic):
+    digest = hashlib.sha256()
+    digest.update(data)
+    digest.update(json.dumps([CACHE_VERSION, kind, list(board), list(lane_columns), tonic]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_score(path, board=None, lane_columns=LANE_COLUMNS, tonic=60, cache_dir=None, use_cache=True):
+    """加载 .txt（简谱）或 .mid/.midi 乐谱，返回 ScoreTimeline
+
+    :param cache_dir: 编译结果缓存目录，默认乐谱所在目录下的 .cache；缓存不可写时只是不缓存
+    """
+    board = my_board if board is None else board
+    with open(path, "rb") as f:
+        data = f.read()
+    kind = "midi" if path.lower().endswith((".mid", ".midi")) else "jianpu"
+    key = _cache_key(data, kind, board, lane_columns, tonic)
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), ".cache") if cache_dir is None else cache_dir
+    cache_path = os.path.join(cache_dir, key[:32] + ".npz")
+
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as cached:
+                return ScoreTimeline(cached["notes"], str(cached["title"]), path)
+        except (OSError, ValueError, KeyError):
+            pass  # 缓存损坏时重新编译
+
+    if kind == "midi":
+        rows, title = parse_midi(data, tonic)
+    else:
+        try:
+            text = data.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ScoreError(f"{path} 不是 UTF-8 文本") from None
+        rows, title = parse_jianpu(text)
+    if not rows:
+        raise ScoreError(f"{path} 中没有音符")
+    timeline = ScoreTimeline(compile_notes(rows, board, lane_columns), title or os.path.splitext(os.path.basename(path))[0], path)
+
+    if use_cache:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            temporary = cache_path + ".tmp.npz"
+            np.savez(temporary, notes=timeline.notes, title=np.array(timeline.title))
+            os.replace(temporary, cache_path)
+        except OSError:
+            pass
+    return timeline
+
+
+if __name__ == "__main__":
+    import sys
+    for score_path in sys.argv[1:]:
+        loaded = load_score(score_path)
+        print(loaded)
+        for start_time, row, _ in loaded.onsets():
+            print(f"  {start_time:8.3f}s  {int(row['pitch'])}  {float(row['duration']):.3f}s  {mask_to_pattern(int(row['mask']))}")
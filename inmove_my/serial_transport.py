@@ -0,0 +1,215 @@
+import threading
+import time
+
+import serial
+
+from hand_protocol import FRAME_TYPES, HEADER_SIZE, MAX_PAYLOAD, SYNC, Frame, crc8
+
+
+class SerialTransport():
+    """串口接收：阻塞读取 + 按行/按帧解析 + 断线重连
+
+    读线程阻塞在 ser.read 上，有数据立即返回，空闲时不占CPU。
+    文本行通过 on_line(line, received_at) 回调；
+    打开串口后、开始接收前在读线程中调用 on_open(ser)，用于协议协商等需要独占读取的握手；
+    parse_frames=True 时行首的 0xA5 开始的二进制帧交给 on_frame(frame, received_at)。
+    串口异常后关闭并每隔 reconnect_interval 秒尝试重新打开同一个 Serial 对象，
+    其他持有该对象的模块（如写线程）无需更新引用。重新打开前恢复初始波特率
+    （下位机复位后回到初始波特率和ASCII协议），打开后再次调用 on_open 重新握手。
+    """
+
+    def __init__(self, ser=None, port=None, baudrate=9600, timeout=0.5,
+                 on_line=None, on_frame=None, on_state=None, on_open=None,
+                 parse_frames=False, reconnect=True, reconnect_interval=1.0, encoding="utf-8"):
+        """
+        :param ser: 已打开的 serial.Serial；为None时按 port/baudrate 自行打开
+        :param on_state: 回调 on_state(connected, message)
+        :param on_open: 回调 on_open(ser)，在读线程中执行，返回前不会读取串口
+        """
+        self.ser = ser
+        self.port = port
+        self.baudrate = ser.baudrate if ser is not None else baudrate  # 初始波特率，重连时恢复
+        self.timeout = timeout
+        self.on_line = on_line
+        self.on_frame = on_frame
+        self.on_state = on_state
+        self.on_open = on_open
+        self.parse_frames = parse_frames
+        self.reconnect = reconnect
+        self.reconnect_interval = reconnect_interval
+        self.encoding = encoding
+
+        self.running = False
+        self.lines_received = 0
+        self.frames_received = 0
+        self.reconnects = 0
+        self._owns_serial = ser is None
+        self._line = bytearray()
+        self.crc_errors = 0
+        self._frame = bytearray()
+        self._frame_left = 0  # 当前二进制帧还需读取的字节数，0表示不在帧内
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def _notify_state(self, connected, message):
+        if self.on_state:
+            self.on_state(connected, message)
+
+    def _handshake(self):
+        if not self.on_open:
+            return
+        try:
+            self.on_open(self.ser)
+        except (serial.SerialException, OSError) as e:
+            self._notify_state(False, f"串口握手失败: {str(e)}")
+
+    def open(self):
+        """打开串口（已打开则直接返回），失败时抛出 serial.SerialException"""
+        if self.ser is None:
+            self.ser = serial.Serial(port=self.port, baudrate=self.baudrate, timeout=self.timeout)
+        elif not self.ser.is_open:
+            self.ser.open()
+        return self.ser
+
+    def start(self):
+        """在后台线程中运行接收循环"""
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        """接收循环，可直接在 QThread.run 中调用，stop() 后返回"""
+        self.running = True
+        try:
+            self.open()
+            self._notify_state(True, f"已连接到 {self.ser.port}")
+            self._handshake()
+        except serial.SerialException as e:
+            self._notify_state(False, f"串口打开失败: {str(e)}")
+            if not self.reconnect:
+                self.running = False
+                return
+
+        while self.running:
+            if self.ser is None or not self.ser.is_open:
+                if not self._try_reconnect():
+                    break
+                continue
+            try:
+                # 阻塞直到至少有1个字节或超时
+                data = self.ser.read(self.ser.in_waiting or 1)
+            except (serial.SerialException, OSError, TypeError) as e:
+                # 拔线时部分平台抛出 TypeError/OSError
+                if not self.running:
+                    break
+                self._notify_state(False, f"串口连接异常: {str(e)}")
+                try:
+                    self.ser.close()
+                except Exception:
+                    pass
+                if not self.reconnect:
+                    break
+                continue
+            if data:
+                self._feed(data, time.perf_counter())
+        self.running = False
+
+    def _try_reconnect(self):
+        deadline = time.monotonic() + self.reconnect_interval
+        while self.running and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if not self.running:
+            return False
+        try:
+            if self.ser is not None:
+                self.ser.baudrate = self.baudrate  # 协商切换过的波特率恢复为初始值
+            self.open()
+            self._line.clear()
+            self._frame.clear()
+            self._frame_left = 0
+            self.reconnects += 1
+            self._notify_state(True, f"已重新连接 {self.ser.port}")
+        except (serial.SerialException, OSError):
+            return True
+        self._handshake()
+        return True
+
+    def _feed(self, data, received_at):
+        if not self.parse_frames:
+            self._feed_text(data, received_at)
+            return
+        # 行首的 0xA5 开始一个二进制帧，其余按文本行处理
+        i = 0
+        while i < len(data):
+            if self._frame_left:
+                chunk = data[i:i + self._frame_left]
+                i += len(chunk)
+                self._frame += chunk
+                self._frame_left -= len(chunk)
+                if self._frame_left:
+                    continue
+                if len(self._frame) == HEADER_SIZE:
+                    if self._frame[1] in FRAME_TYPES and self._frame[3] <= MAX_PAYLOAD:
+                        self._frame_left = self._frame[3] + 1
+                        continue
+                    # 不是合法帧头，当作文本
+                    self._feed_text(bytes(self._frame), received_at)
+                else:
+                    self._emit_frame(received_at)
+                self._frame.clear()
+                continue
+            if data[i] == SYNC and not self._line:
+                self._frame_left = HEADER_SIZE
+                continue
+            newline = data.find(b"\n", i)
+            end = len(data) if newline < 0 else newline + 1
+            self._feed_text(data[i:end], received_at)
+            i = end
+
+    def _emit_frame(self, received_at):
+        frame = self._frame
+        if crc8(frame[1:-1]) != frame[-1]:
+            self.crc_errors += 1
+            return
+        self.frames_received += 1
+        if self.on_frame:
+            self.on_frame(Frame(frame[1], frame[2], bytes(frame[HEADER_SIZE:-1])), received_at)
+
+    def _feed_text(self, data, received_at):
+        self._line += data
+        while True:
+            pos = self._line.find(b"\n")
+            if pos < 0:
+                break
+            raw = bytes(self._line[:pos])
+            del self._line[:pos + 1]
+            line = raw.decode(self.encoding, errors="replace").strip()
+            if line:
+                self.lines_received += 1
+                if self.on_line:
+                    self.on_line(line, received_at)
+        if len(self._line) > 4096:
+            self._line.clear()  # 长时间没有换行，丢弃
+
+    def write(self, data):
+        """线程安全写入，返回是否成功"""
+        with self._write_lock:
+            if self.ser is None or not self.ser.is_open:
+                return False
+            self.ser.write(data)
+            return True
+
+    def stop(self, close=None):
+        """停止接收循环；close 默认只关闭自己打开的串口"""
+        self.running = False
+        if self.ser is not None and self.ser.is_open:
+            try:
+                self.ser.cancel_read()
+            except Exception:
+                pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        if close is None:
+            close = self._owns_serial
+        if close and self.ser is not None and self.ser.is_open:
+            self.ser.close()
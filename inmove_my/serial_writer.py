@@ -0,0 +1,123 @@
+import threading
+import time
+
+
+class CoalescingSerialWriter():
+    """独立线程写串口，视频循环只投递不等待
+
+    普通指令放进单槽邮箱，后到的覆盖先到的（只发送最新手势）；
+    优先指令（如紧急张开手）单独排队，总是先于普通指令发送，且不会被覆盖。
+    """
+
+    def __init__(self, ser, on_sent=None, on_error=None, on_coalesced=None):
+        """
+        :param on_sent: 回调 on_sent(data, latency, tag)，latency 为投递到写完的耗时（秒）
+        :param on_error: 回调 on_error(data, exception)，串口未打开时 exception 为None
+        :param on_coalesced: 回调 on_coalesced(data, tag)，一条普通指令被覆盖而不会发送时调用
+        """
+        self.ser = ser
+        self.on_sent = on_sent
+        self.on_error = on_error
+        self.on_coalesced = on_coalesced
+        self._cond = threading.Condition()
+        self._latest = None    # (data, 投递时刻, tag)
+        self._priority = []    # [(data, 投递时刻, tag), ...]
+        self._running = False
+        self._thread = None
+
+        self.submitted = 0
+        self.coalesced = 0     # 被更新的指令覆盖而未发送
+        self.dropped = 0       # 串口不可用或写入失败
+        self.sent = 0
+        self.priority_sent = 0
+        self.last_latency = None
+        self.max_latency = 0.0
+        self._latency_total = 0.0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, data, priority=False, tag=None):
+        """投递一条指令，立即返回；tag 原样传给 on_sent（如采集时间戳）"""
+        now = time.perf_counter()
+        with self._cond:
+            self.submitted += 1
+            replaced = self._latest
+            if priority:
+                self._priority.append((data, now, tag))
+                # 优先指令之前排队的普通手势已经过时
+                self._latest = None
+            else:
+                self._latest = (data, now, tag)
+            if replaced is not None:
+                self.coalesced += 1
+            self._cond.notify()
+        if replaced is not None and self.on_coalesced:
+            self.on_coalesced(replaced[0], replaced[2])
+
+    def _take(self):
+        with self._cond:
+            while self._running and self._latest is None and not self._priority:
+                self._cond.wait(0.5)
+            if self._priority:
+                return self._priority.pop(0) + (True,)
+            if self._latest is not None:
+                item, self._latest = self._latest, None
+                return item + (False,)
+            return None
+
+    def _run(self):
+        while self._running:
+            item = self._take()
+            if item is None:
+                continue
+            data, submitted_at, tag, priority = item
+            if not self.ser or not self.ser.is_open:
+                self.dropped += 1
+                if self.on_error:
+                    self.on_error(data, None)
+                continue
+            try:
+                self.ser.write(data)
+                self.ser.flush()
+            except Exception as e:
+                self.dropped += 1
+                if self.on_error:
+                    self.on_error(data, e)
+                continue
+
+            latency = time.perf_counter() - submitted_at
+            self.sent += 1
+            if priority:
+                self.priority_sent += 1
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self._latency_total += latency
+            if self.on_sent:
+                self.on_sent(data, latency, tag)
+
+    def stop(self, timeout=1.0):
+        """停止写线程；已投递的优先指令会在停止前尽量发出"""
+        deadline = time.monotonic() + timeout
+        while self._priority and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self._running = False
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(max(deadline - time.monotonic(), 0.1))
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "priority_sent": self.priority_sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "last_latency_ms": None if self.last_latency is None else self.last_latency * 1000,
+            "avg_latency_ms": self._latency_total / self.sent * 1000 if self.sent else None,
+            "max_latency_ms": self.max_latency * 1000,
+        }
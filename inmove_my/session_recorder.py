@@ -0,0 +1,226 @@
+"""手势会话录制与回放
+
+文件格式（小端，仅追加）:
+    文件头 32 字节: 魔数 b"HNDREC01", 版本, 记录长度, 最多手数, 发送缓冲长度,
+                    画面宽高, 录制开始的系统时间
+    之后是定长记录（RECORD_DTYPE），每处理一帧写一条。
+索引文件 <path>.idx: 每 INDEX_STRIDE 条记录追加一项 (记录序号, 时间戳)，用于按时间快速定位。
+
+回放时用 np.memmap 映射记录区，不需要 MediaPipe，可远快于实时地遍历。
+"""
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"HNDREC01"
+VERSION = 1
+HEADER_FORMAT = "<8sHHBBHHd6x"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)  # 32
+MAX_HANDS = 2
+MAX_SENT = 24  # 可容纳最长的二进制帧（6路PWM关键帧17字节，差量帧最多18字节）
+INDEX_STRIDE = 256
+
+
+def record_dtype(max_sent=MAX_SENT):
+    """记录结构，发送缓冲长度由文件头给出（早期文件为16字节）"""
+    return np.dtype([
+        ("timestamp", "<f8"),                    # 采集时刻，相对录制开始（秒）
+        ("frame_index", "<u4"),                  # VideoThread 的帧计数
+        ("hand_count", "u1"),                    # 检测到的手数（最多记录 MAX_HANDS）
+        ("raw_states", "u1"),                    # 当帧分类结果位掩码，bit i 对应状态列 i
+        ("states", "u1"),                        # 平滑后的最终状态位掩码
+        ("sent_len", "u1"),                      # 本帧串口发送的字节数
+        ("handedness", "i1", (MAX_HANDS,)),      # LEFT/RIGHT/UNKNOWN_HAND
+        ("reserved", "u1", (6,)),
+        ("landmarks", "<f4", (MAX_HANDS, 21, 3)),
+        ("sent", "u1", (max_sent,)),             # 本帧实际发送的字节
+    ])
+
+
+RECORD_DTYPE = record_dtype()
+
+INDEX_DTYPE = np.dtype([("record", "<u4"), ("timestamp", "<f8")])
+
+
+def states_to_mask(states):
+    """6个布尔状态 -> 位掩码"""
+    mask = 0
+    for i, state in enumerate(states):
+        if state:
+            mask |= 1 << i
+    return mask
+
+
+def mask_to_states(mask):
+    """位掩码（标量或数组） -> (..., 6) 布尔数组"""
+    mask = np.asarray(mask, dtype=np.uint8)
+    return (mask[..., None] >> np.arange(6, dtype=np.uint8)) & 1 == 1
+
+
+class SessionRecorder():
+    """把每帧的关键点、分类结果和串口字节追加写入会话文件"""
+
+    def __init__(self, path, width=0, height=0, buffer_records=64):
+        self.path = path
+        self.start = time.perf_counter()
+        self.count = 0
+        self._buffer = np.zeros(buffer_records, dtype=RECORD_DTYPE)
+        self._pending = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "wb")
+        self._index = open(path + ".idx", "wb")
+        self._file.write(struct.pack(
+            HEADER_FORMAT, MAGIC, VERSION, RECORD_DTYPE.itemsize,
+            MAX_HANDS, MAX_SENT, width, height, time.time()))
+
+    def write(self, capture_time, frame_index, landmarks, handedness,
+              raw_states, states, sent=b""):
+        """追加一帧
+
+        :param capture_time: time.perf_counter() 采集时刻
+        :param landmarks: (hands, 21, 3) 数组，超出 MAX_HANDS 的手被忽略
+        :param sent: 本帧发送到串口的字节，超出 MAX_SENT 的部分被截断
+        """
+        record = self._buffer[self._pending]
+        record["timestamp"] = capture_time - self.start
+        record["frame_index"] = frame_index
+        hands = min(len(landmarks), MAX_HANDS)
+        record["hand_count"] = hands
+        record["handedness"] = -1
+        record["landmarks"] = 0
+        if hands:
+            record["landmarks"][:hands] = landmarks[:hands]
+            record["handedness"][:hands] = handedness[:hands]
+        record["raw_states"] = states_to_mask(raw_states)
+        record["states"] = states_to_mask(states)
+        sent = bytes(sent)[:MAX_SENT]
+        record["sent_len"] = len(sent)
+        record["sent"] = 0
+        record["sent"][:len(sent)] = np.frombuffer(sent, dtype=np.uint8)
+
+        if self.count % INDEX_STRIDE == 0:
+            entry = np.array([(self.count, record["timestamp"])], dtype=INDEX_DTYPE)
+            self._index.write(entry.tobytes())
+
+        self.count += 1
+        self._pending += 1
+        if self._pending == len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._file.write(self._buffer[:self._pending].tobytes())
+            self._pending = 0
+        self._file.flush()
+        self._index.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SessionReplay():
+    """内存映射方式读取会话文件"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"会话文件过短: {path}")
+        (magic, version, record_size, max_hands, max_sent,
+         self.width, self.height, self.started_at) = struct.unpack(HEADER_FORMAT, header)
+        if magic != MAGIC:
+            raise ValueError(f"不是会话文件: {path}")
+        self.dtype = record_dtype(max_sent)
+        if version != VERSION or record_size != self.dtype.itemsize or max_hands != MAX_HANDS:
+            raise ValueError(f"不支持的会话文件版本: {version}")
+
+        # 录制中断时最后一条记录可能不完整，忽略之
+        count = (os.path.getsize(path) - HEADER_SIZE) // self.dtype.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=self.dtype, mode="r",
+                                     offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+
+        index_path = path + ".idx"
+        if os.path.exists(index_path) and os.path.getsize(index_path) >= INDEX_DTYPE.itemsize:
+            self.index = np.fromfile(index_path, dtype=INDEX_DTYPE)
+            self.index = self.index[self.index["record"] < count]
+        else:
+            self.index = np.zeros(0, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self):
+        return self.records["timestamp"]
+
+    @property
+    def duration(self):
+        return float(self.records["timestamp"][-1]) if len(self.records) else 0.0
+
+    def raw_states(self):
+        """(frames, 6) 每帧分类结果"""
+        return mask_to_states(self.records["raw_states"])
+
+    def states(self):
+        """(frames, 6) 每帧平滑后的状态"""
+        return mask_to_states(self.records["states"])
+
+    def primary_hand(self):
+        """返回第一只手的 (landmarks (frames,21,3), handedness (frames,), present (frames,))"""
+        present = self.records["hand_count"] > 0
+        return self.records["landmarks"][:, 0], self.records["handedness"][:, 0], present
+
+    def sent_bytes(self, i):
+        record = self.records[i]
+        return bytes(record["sent"][:record["sent_len"]])
+
+    def seek(self, t):
+        """返回第一条时间戳 >= t 的记录序号"""
+        if len(self.index):
+            block = max(int(np.searchsorted(self.index["timestamp"], t, side="right")) - 1, 0)
+            lo = int(self.index["record"][block])
+            hi = min(lo + INDEX_STRIDE, len(self.records))
+            return lo + int(np.searchsorted(self.records["timestamp"][lo:hi], t))
+        return int(np.searchsorted(self.records["timestamp"], t))
+
+    def iter_frames(self, start_time=0.0, end_time=None, speed=None):
+        """按顺序遍历记录
+
+        :param speed: None 表示尽可能快；1.0 表示按录制速度回放
+        """
+        start = self.seek(start_time)
+        stop = len(self.records) if end_time is None else self.seek(end_time)
+        if start >= stop:
+            return
+        t0 = time.perf_counter()
+        first = float(self.records["timestamp"][start])
+        for i in range(start, stop):
+            record = self.records[i]
+            if speed:
+                delay = (float(record["timestamp"]) - first) / speed - (time.perf_counter() - t0)
+                if delay > 0:
+                    time.sleep(delay)
+            yield record
+
+    def close(self):
+        # 释放对映射的引用，由垃圾回收关闭文件映射
+        self.records = np.zeros(0, dtype=self.dtype)
@@ -1,19 +1,18 @@
 import pygame
 import sys
 import time
+from bisect import bisect_left
 import cv2
 import numpy as np
 
+# 音乐数据和下落时间定义在不依赖 pygame 的 music_data 中，这里导出供原有代码使用
+from music_data import FALL_TIME, durations, my_board, my_music, sequential_score
+
 # 窗口设置
 WIDTH, HEIGHT = 500, 300
 FPS = 60
 
-# 音乐数据
-my_board = [1, 2, 3, 5, 6]  # 宫商角徵羽对应的音符
-my_music = [6, 5, 3, 2, 1, 3, 2, 1, 6, 5, 5, 6, 5, 6, 1, 2, 3, 5, 6, 5, 3, 2, 1, 2]
-durations = [0.9, 0.3, 0.6, 0.6, 2.4, 0.9, 0.3, 0.6, 0.6, 2.3, 0.9, 0.3, 0.6, 0.6, 0.9, 0.3, 0.6, 0.6, 0.9, 0.3, 0.6, 0.6, 2.4]
-
-SPEED = HEIGHT / 2.5  # 下落速度(像素/秒)
+SPEED = HEIGHT / FALL_TIME  # 下落速度(像素/秒)
 
 # 颜色定义
 WHITE = (240, 240, 240)
@@ -27,13 +26,32 @@ COLOR_PALETTE = [
     (220, 180, 220),  # 浅紫
 ]
 
+KEY_HIGHLIGHT = 0.3  # 按键高亮时间(秒)
+
+_fonts = {}
+
+
+def get_font(size):
+    """字体只创建一次（SysFont 每次都要查找系统字体，非常慢）"""
+    font = _fonts.get(size)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = _fonts[size] = pygame.font.SysFont('SimHei', size)
+    return font
+
+
 class Note:
-    def __init__(self, note, duration, speed, start_time, index):
+    def __init__(self, note, duration, speed, start_time, index, lane_width=WIDTH // 5, screen_height=HEIGHT,
+                 font_size=20):
         self.note = note
         self.duration = duration
-        self.width = WIDTH // 5
+        self.start_time = start_time
+        self.width = lane_width
         self.height = speed * duration
         self.speed = speed
+        self.screen_height = screen_height
+        self.font_size = font_size
         
         # 计算x位置
         note_index = my_board.index(note) if note in my_board else 0
@@ -49,39 +67,49 @@ class Note:
         # 音符状态
         self.active = True
         self.passed = False  # 是否已经通过键盘区域
+        self.sprite = None   # 预渲染的音符图块
     
     def update(self, current_time):
         """更新音符位置"""
         self.y = self.start_y + (current_time * self.speed)
         
         # 检查是否超出屏幕
-        if self.y > HEIGHT:
+        if self.y > self.screen_height:
             self.active = False
         
         # 检查是否通过键盘区域
-        if not self.passed and self.y >= HEIGHT - (HEIGHT // 5) - self.height:
+        if not self.passed and self.y >= self.screen_height - (self.screen_height // 5) - self.height:
             self.passed = True
             return True  # 返回True表示应该播放音符
         return False
     
     def is_visible(self):
         """检查音符是否在可见范围内"""
-        return self.y + self.height > 0 and self.y < HEIGHT
+        return self.y + self.height > 0 and self.y < self.screen_height
+
+    def rect(self):
+        return pygame.Rect(self.x, int(self.y), self.width, int(self.height))
+
+    def render_sprite(self):
+        """预渲染音符色块和数字"""
+        sprite = pygame.Surface((self.width, int(self.height)))
+        sprite.fill(self.color)
+        text = get_font(self.font_size).render(str(self.note), True, BLACK)
+        sprite.blit(text, (self.width//2 - self.font_size//4, int(self.height)//2 - self.font_size//2))
+        return sprite
     
     def draw(self, screen):
         """绘制音符"""
         if self.is_visible():
-            pygame.draw.rect(screen, self.color, (self.x, self.y, self.width, self.height))
-            # 绘制音符数字
-            font = pygame.font.SysFont('SimHei', 20)
-            text = font.render(str(self.note), True, BLACK)
-            screen.blit(text, (self.x + self.width//2 - 5, self.y + self.height//2 - 10))
+            if self.sprite is None:
+                self.sprite = self.render_sprite()
+            screen.blit(self.sprite, (self.x, int(self.y)))
 
-def draw_musical_notes(screen, width, height, alpha=10):
+def draw_musical_notes(screen, width, height, alpha=10, font_size=30):
     """在屏幕上绘制五等分的宫商角徵羽"""
     section_width = width // 5
     notes = ["小指", "无名", "中指", "食指", "拇指"]
-    font = pygame.font.SysFont('SimHei', 30)
+    font = get_font(font_size)
     
     # 创建半透明表面
     note_surface = pygame.Surface((width, height), pygame.SRCALPHA)
@@ -93,7 +121,7 @@ def draw_musical_notes(screen, width, height, alpha=10):
     
     screen.blit(note_surface, (0, 0))
 
-def draw_keyboard(screen, width, height, active_keys=None):
+def draw_keyboard(screen, width, height, active_keys=None, font_size=20):
     """在屏幕底部1/5高度绘制键盘"""
     if active_keys is None:
         active_keys = set()
@@ -106,6 +134,8 @@ def draw_keyboard(screen, width, height, active_keys=None):
     
     # 五等分绘制琴键
     key_width = width // 5
+    font = get_font(font_size)
+    note_labels = ["宫", "商", "角", "徵", "羽"]
     for i in range(5):
         key_left = i * key_width
         note = my_board[i] if i < len(my_board) else 0
@@ -117,104 +147,308 @@ def draw_keyboard(screen, width, height, active_keys=None):
         pygame.draw.rect(screen, BLACK, (key_left, keyboard_top, key_width-2, keyboard_height), 1)
         
         # 添加音阶标签
-        font = pygame.font.SysFont('SimHei', 20)
-        note_labels = ["宫", "商", "角", "徵", "羽"]
         label = font.render(note_labels[i], True, BLACK)
-        screen.blit(label, (key_left + key_width//2 - 10, keyboard_top + keyboard_height//2 - 10))
+        screen.blit(label, (key_left + key_width//2 - font_size//2, keyboard_top + keyboard_height//2 - font_size//2))
 
-def get_frame_generator():
-    # 初始化 Pygame
-    pygame.init()
-    screen = pygame.Surface((WIDTH, HEIGHT))
-    clock = pygame.time.Clock()
+
+class MusicVisualizer():
+    """音乐可视化渲染器
+
+    背景（含手指标签）、每个琴键的普通/高亮两种状态、每个音符的色块和数字都只渲染一次；
+    每帧只重画变化的区域（上一帧和这一帧音符所在矩形、时间文字、状态变化的琴键），
+    dirty_rects=False 时每帧整屏重画（用于对比）。
+
+    绘制表面直接建在 buffer 上：(高, 宽, 4) 的 uint8 数组，字节顺序 B,G,R,X，
+    即小端机器上 Qt 的 QImage.Format_RGB32，方向和尺寸就是最终显示的样子；
+    frame 是它前三个通道的BGR视图，供 OpenCV 使用。两者都不需要每帧转换或复制。
+
+    乐谱 score 是按开始时间排序的 (开始时间, 音高, 时值) 可迭代对象，按需逐个读取（可以是生成器），
+    音符按开始时间存放，当前可见的音符保存在活动窗口中：时间前进时只从 next 序号处加入新出现的音符、
+    移除已离开屏幕的音符；时间倒退或大幅跳跃时用二分查找重新定位。
+    每帧只处理可见的音符，几千个音符的乐谱和24个音符的演示每帧开销相同。
+    """
+
+    def __init__(self, score=None, width=WIDTH, height=HEIGHT, speed=None, dirty_rects=True):
+        """
+        :param width, height: 输出尺寸，文字和边距按 height / HEIGHT 缩放
+        :param speed: 下落速度（像素/秒），默认 height / FALL_TIME，即任何尺寸下音符都在相同时刻落键
+        """
+        self.width = width
+        self.height = height
+        self.speed = height / FALL_TIME if speed is None else speed
+        scale = height / HEIGHT
+        self.font_size = max(round(20 * scale), 8)
+        self.dirty_rects = dirty_rects
+        self.buffer = np.zeros((height, width, 4), dtype=np.uint8)
+        self.screen = pygame.image.frombuffer(self.buffer, (width, height), "BGRA")  # 与 buffer 共用内存
+        self.frame = self.buffer[:, :, :3]
+
+        # 已读取的音符按开始时间排列，starts 用于二分查找
+        self._source = iter(sequential_score() if score is None else score)
+        self._exhausted = False
+        self.notes = []
+        self.starts = []
+        self._longest = 0.0   # 最长时值，决定二分回溯的范围
+        self._last_end = 0.0  # 已读取音符中最晚的结束时刻
+        self._sprites = {}    # (音高, 高度) -> 音符图块，相同音符共用
+        self._next = 0        # 下一个尚未出现的音符序号（开始时间之后音符才进入屏幕）
+        self.hit_offset = (height - height // 5) / self.speed  # 音符出现到落到键盘上沿的时间
+        self.visible = []     # 活动窗口：已出现且还没落出屏幕的音符
+        self._last_time = None
+
+        # 静态背景：底色 + 手指标签
+        self.background = pygame.Surface((width, height))
+        self.background.fill(WHITE)
+        draw_musical_notes(self.background, width, height, font_size=max(round(30 * scale), 8))
+
+        # 琴键图块：[车道][是否高亮]
+        self.keyboard_height = height // 5
+        self.keyboard_top = height - self.keyboard_height
+        self.key_width = width // 5
+        self.key_sprites = []
+        for i in range(5):
+            note = my_board[i] if i < len(my_board) else 0
+            sprites = []
+            for active in (False, True):
+                layer = pygame.Surface((width, height))
+                draw_keyboard(layer, width, height, {note} if active else set(), self.font_size)
+                sprites.append(layer.subsurface((i * self.key_width, self.keyboard_top,
+                                                 self.key_width, self.keyboard_height)).copy())
+            self.key_sprites.append(sprites)
+        # 琴键之外的键盘底色（宽度不能被5整除时的右侧余量）
+        self.keyboard_base = pygame.Surface((width, self.keyboard_height))
+        self.keyboard_base.fill(GRAY)
+        self.time_rect = pygame.Rect(round(10 * scale), round(10 * scale), round(160 * scale), round(24 * scale))
+
+        self.key_active_times = {}
+        self.active_keys = None
+        self._note_rects = []
+        self.last_dirty = []
+        self.reset()
+
+    def reset(self):
+        self.key_active_times = {}
+        self.active_keys = None
+        self._note_rects = []
+        self._full_redraw = True
+        self._last_time = None
+
+    def _load_until(self, current_time):
+        """从乐谱中读取音符，直到已读取的最后一个音符开始于 current_time 之后"""
+        while not self._exhausted and (not self.starts or self.starts[-1] <= current_time):
+            item = next(self._source, None)
+            if item is None:
+                self._exhausted = True
+                break
+            start_time, pitch, duration = item
+            if self.starts and start_time < self.starts[-1]:
+                raise ValueError(f"乐谱需按开始时间排序: {start_time} < {self.starts[-1]}")
+            self.notes.append(Note(pitch, duration, self.speed, start_time, len(self.notes),
+                                   self.key_width, self.height, self.font_size))
+            self.starts.append(start_time)
+            self._longest = max(self._longest, duration)
+            self._last_end = max(self._last_end, start_time + duration)
+
+    def _enter(self, note):
+        key = (note.note, int(note.height))
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            sprite = self._sprites[key] = note.render_sprite()
+        note.sprite = sprite
+        self.visible.append(note)
+
+    def _seek(self, current_time):
+        """二分定位活动窗口：开始时间在 [t - 最长停留时间, t) 内的音符才可能可见"""
+        self._load_until(current_time)
+        self._next = bisect_left(self.starts, current_time)
+        first = bisect_left(self.starts, current_time - self._longest - self.height / self.speed)
+        self.visible = []
+        self.key_active_times = {}
+        for note in self.notes[first:self._next]:
+            note.update(current_time)
+            hit_time = note.start_time + self.hit_offset
+            note.passed = current_time >= hit_time
+            if note.passed and current_time <= hit_time + KEY_HIGHLIGHT:
+                self.key_active_times[note.note] = hit_time + KEY_HIGHLIGHT  # 恢复仍在高亮中的琴键
+            if note.y < self.height:
+                self._enter(note)
+        self._full_redraw = True
+
+    def _advance(self, current_time):
+        """前进到 current_time：加入新出现的音符、移除离开屏幕的音符，返回本帧落键的 (音高, 落键时刻)"""
+        if (self._last_time is None or current_time < self._last_time
+                or current_time - self._last_time > self._longest + self.height / self.speed):
+            self._seek(current_time)
+        self._last_time = current_time
+        self._load_until(current_time)
+        while self._next < len(self.notes) and self.notes[self._next].start_time < current_time:
+            note = self.notes[self._next]
+            note.passed = False
+            self._enter(note)
+            self._next += 1
+
+        hits = [(note.note, note.start_time + self.hit_offset) for note in self.visible if note.update(current_time)]
+        # 只移除已落出屏幕底部的音符（刚出现时可能还差不到一个像素才可见）
+        self.visible = [note for note in self.visible if note.y < self.height]
+        return hits
+
+    def _keyboard_rect(self, lane):
+        return pygame.Rect(lane * self.key_width, self.keyboard_top, self.key_width, self.keyboard_height)
+
+    def _paint(self, rect, visible, current_time):
+        """在 rect 区域内按 背景 -> 音符 -> 键盘 -> 时间 的顺序重画"""
+        screen = self.screen
+        screen.set_clip(rect)
+        screen.blit(self.background, rect, rect)
+        for note in visible:
+            if note.rect().colliderect(rect):
+                screen.blit(note.sprite, (note.x, int(note.y)))
+        if rect.bottom > self.keyboard_top:
+            screen.blit(self.keyboard_base, (0, self.keyboard_top))
+            for lane in range(5):
+                note = my_board[lane] if lane < len(my_board) else 0
+                screen.blit(self.key_sprites[lane][note in self.active_keys], self._keyboard_rect(lane))
+        if rect.colliderect(self.time_rect):
+            text = get_font(self.font_size).render(f"时间: {current_time:.2f}s", True, BLACK)
+            screen.blit(text, self.time_rect.topleft)
+        screen.set_clip(None)
+
+    def render(self, current_time):
+        """更新到 current_time，返回本帧重画的矩形列表"""
+        # 更新活动窗口内的音符状态和按键高亮
+        # 高亮按落键时刻而不是检测到的帧计时，与 _seek 恢复的结果一致
+        for pitch, hit_time in self._advance(current_time):
+            self.key_active_times[pitch] = hit_time + KEY_HIGHLIGHT
+        for key in [k for k, end in self.key_active_times.items() if current_time > end]:
+            del self.key_active_times[key]
+        active_keys = set(self.key_active_times)
+
+        visible = self.visible
+        note_rects = [note.rect().clip(self.screen.get_rect()) for note in visible]
+
+        if self._full_redraw or not self.dirty_rects:
+            self.active_keys = active_keys
+            dirty = [self.screen.get_rect()]
+            self._full_redraw = False
+        else:
+            dirty = self._note_rects + note_rects + [self.time_rect]
+            for lane in range(5):
+                note = my_board[lane] if lane < len(my_board) else 0
+                if (note in active_keys) != (note in self.active_keys):
+                    dirty.append(self._keyboard_rect(lane))
+            self.active_keys = active_keys
+        self._note_rects = note_rects
+
+        dirty = [rect for rect in dirty if rect.width > 0 and rect.height > 0]
+        for rect in dirty:
+            self._paint(rect, visible, current_time)
+        return dirty
+
+    def frame_at(self, current_time):
+        """渲染并返回BGR帧 (height, width, 3)
+
+        返回的是内部缓冲区的视图（行内不连续），下一帧会被覆盖；需要连续数组时用 np.ascontiguousarray
+        """
+        self.last_dirty = self.render(current_time)
+        return self.frame
+
+    def render_frame(self, current_time):
+        """渲染时刻 current_time（秒，乐谱时间）的画面，返回 Format_RGB32 字节序的 (height, width, 4) 缓冲区
+
+        画面只由 current_time 决定，与之前渲染过哪些时刻无关：顺序前进时增量更新，
+        倒退或跳跃时二分重新定位，两种方式画出的像素相同。因此可以直接用音频播放位置等外部时钟驱动，
+        负载高时跳过的帧不会让画面和音乐错位；本函数不等待、不限帧率。
+        """
+        self.last_dirty = self.render(current_time)
+        return self.buffer
+
+    def finished(self, current_time):
+        """乐谱已读完，且 current_time 时所有音符都已落出屏幕"""
+        self._load_until(current_time)
+        return self._exhausted and (not self.starts or current_time >= self.end_time)
+
+    @property
+    def end_time(self):
+        """已读取的音符全部落出屏幕的时刻"""
+        return self._last_end + self.height / self.speed
+
+
+def benchmark(seconds=10.0, fps=FPS):
+    """单核按 fps 步进渲染 seconds 秒的乐谱（不等待），比较整屏重画、局部重画和长乐谱的帧率"""
+    cv2.setNumThreads(1)
+    pygame.font.init()
+    results = {}
+    frames = int(seconds * fps)
+    # 长乐谱：演示乐谱重复到约2000个音符，按生成器逐个读取
+    repeat = 2000 // len(durations) + 1
+    cases = [
+        ("full_redraw", False, None),
+        ("dirty_rects", True, None),
+        (f"dirty_rects_{len(durations) * repeat}_notes", True,
+         sequential_score(my_music[:len(durations)] * repeat, durations * repeat)),
+    ]
+    for name, dirty_rects, score in cases:
+        visualizer = MusicVisualizer(score, dirty_rects=dirty_rects)
+        pixels = 0
+        start = time.perf_counter()
+        for i in range(frames):
+            visualizer.frame_at(i / fps)
+            pixels += sum(r.width * r.height for r in visualizer.last_dirty)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "fps": round(frames / elapsed, 1),
+            "ms_per_frame": round(elapsed / frames * 1000, 3),
+            "budget_used": f"{elapsed / frames * fps * 100:.1f}%",  # 占 1/fps 帧预算的比例
+            "pixels_per_frame": int(pixels / frames),
+        }
+    return results
+
+def get_frame_generator(rgb32=False, clock=None):
+    """每次 next() 产生 clock() 当前时刻的帧，乐谱结束后停止
+
+    :param rgb32: True 产生 buffer（Qt Format_RGB32），否则产生BGR帧
+    :param clock: 返回乐谱时间（秒）的函数，如 AudioClock.position；默认从第一次取帧开始计时
+    生成器本身不限帧率，由调用方（定时器、显示循环）决定取帧的节奏。
+    """
+    pygame.font.init()
     
     def main_loop():
-        # 预计算所有音符
-        all_notes = []
-        current_time = 0.0
-        for i, (note, duration) in enumerate(zip(my_music, durations)):
-            all_notes.append(Note(note, duration, SPEED, current_time, i))
-            current_time += duration
+        visualizer = MusicVisualizer()
+        position = clock
+        if position is None:
+            started = time.perf_counter()
+            position = lambda: time.perf_counter() - started
         
-        # 游戏主循环
-        running = True
-        start_time = time.time()
-        active_keys = set()
-        key_active_times = {}
-        
-        while running:
-            current_time = time.time() - start_time
-            
-            # 处理事件
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-            
-            # 更新音符状态和检测激活键
-            active_keys.clear()
-            for note in all_notes:
-                if note.update(current_time):
-                    active_keys.add(note.note)
-                    key_active_times[note.note] = current_time + 0.3  # 高亮0.3秒
-            
-            # 更新键盘高亮状态
-            keys_to_remove = []
-            for note, end_time in key_active_times.items():
-                if current_time > end_time:
-                    keys_to_remove.append(note)
-            for note in keys_to_remove:
-                del key_active_times[note]
-            
-            # 合并当前激活键和键盘高亮键
-            display_active_keys = set(active_keys)
-            display_active_keys.update(key_active_times.keys())
-            
-            # 渲染
-            screen.fill(WHITE)
-            
-            # 绘制五等分的宫商角徵羽
-            draw_musical_notes(screen, WIDTH, HEIGHT)
-            
-            # 绘制下落音符 (只绘制可见的)
-            for note in all_notes:
-                if note.is_visible():
-                    note.draw(screen)
-            
-            # 绘制键盘
-            draw_keyboard(screen, WIDTH, HEIGHT, display_active_keys)
-            
-            # 显示当前时间
-            font = pygame.font.SysFont('SimHei', 20)
-            time_text = f"时间: {current_time:.2f}s"
-            text = font.render(time_text, True, BLACK)
-            screen.blit(text, (10, 10))
-            
-            # 转换为RGB格式并旋转90度
-            frame = pygame.surfarray.array3d(screen)
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-            # 旋转90度并调整大小
-            frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-            # 水平镜像
-            frame = cv2.flip(frame, 1)
-            frame = cv2.resize(frame, (500, 300))  # 匹配控制面板中的窗口大小
-            yield frame
-            
-            clock.tick(FPS)
-        
-        pygame.quit()
+        while True:
+            current_time = position()
+            if visualizer.finished(current_time):
+                break
+            # 只重画变化的区域，产生的就是内部缓冲区（宽500 x 高300，与控制面板中的显示区域一致）
+            if rgb32:
+                yield visualizer.render_frame(current_time)
+            else:
+                yield visualizer.frame_at(current_time)
     
     return main_loop()
 
 if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        # 单核渲染基准：python test7.py --benchmark
+        for name, result in benchmark().items():
+            print(f"{name}: {result}")
+        sys.exit(0)
+
     # 独立运行时的演示模式
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("音乐可视化播放器")
+    clock = pygame.time.Clock()
     
-    for frame in get_frame_generator():
+    for buffer in get_frame_generator(rgb32=True):
         # 显示帧
-        pygame.surfarray.blit_array(screen, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        screen.blit(pygame.image.frombuffer(buffer, (WIDTH, HEIGHT), "BGRA"), (0, 0))
         pygame.display.flip()
+        clock.tick(FPS)  # 只限制显示循环的帧率，画面时刻仍按实际经过的时间计算
         
         # 处理退出事件
         for event in pygame.event.get():
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 模块都在 inmove_my 目录下直接导入（与脚本运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
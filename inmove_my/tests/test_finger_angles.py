@@ -0,0 +1,56 @@
+"""比例跟随模式 AngleStreamer 的关键帧/差量帧测试
+
+    cd inmove_my && python -m pytest tests
+"""
+from finger_angles import AngleStreamer
+from hand_protocol import FRAME_DELTA, FRAME_TARGETS, FrameDecoder, StatusEncoder
+
+OPEN = [102, 120, 450, 500, 110, 500]
+
+
+def decode(data):
+    frames = FrameDecoder().feed(data)
+    assert len(frames) == 1
+    return frames[0]
+
+
+def make_streamer():
+    return AngleStreamer(StatusEncoder(binary=True), alpha=1.0)
+
+
+def test_first_frame_is_keyframe_then_delta():
+    streamer = make_streamer()
+    assert decode(streamer.update(OPEN, 0.0)).targets == OPEN
+    moved = list(OPEN)
+    moved[1] += 40
+    frame = decode(streamer.update(moved, 0.1))
+    assert frame.type == FRAME_DELTA
+    assert frame.delta == {1: moved[1]}
+
+
+def test_changes_inside_deadband_are_suppressed():
+    streamer = make_streamer()
+    streamer.update(OPEN, 0.0)
+    nudged = [v + 1 for v in OPEN]
+    assert streamer.update(nudged, 0.1) is None
+    assert streamer.suppressed == 1
+
+
+def test_invalidate_forces_keyframe():
+    streamer = make_streamer()
+    streamer.update(OPEN, 0.0)
+    moved = list(OPEN)
+    moved[2] -= 50
+    streamer.update(moved, 0.1)  # 假设这条差量帧被写线程合并掉
+    streamer.invalidate()
+    frame = decode(streamer.update(moved, 0.2))
+    assert frame.type == FRAME_TARGETS
+    assert frame.targets == moved
+
+
+def test_periodic_keyframe():
+    streamer = make_streamer()
+    streamer.update(OPEN, 0.0)
+    moved = list(OPEN)
+    moved[4] += 60
+    assert decode(streamer.update(moved, streamer.keyframe_interval + 0.01)).type == FRAME_TARGETS
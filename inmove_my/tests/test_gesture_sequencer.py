@@ -0,0 +1,39 @@
+"""GestureSequencer 播放线程的测试
+
+    cd inmove_my && python -m pytest tests
+"""
+import threading
+import time
+
+from gesture_sequencer import GestureSequencer, GestureStep, GestureTimeline
+
+
+def test_stalled_thread_stays_stopped_after_next_play():
+    log = []
+    stalled = threading.Event()
+
+    def send(pattern):
+        log.append((threading.current_thread(), pattern))
+        if pattern == "111111":
+            stalled.wait(2)  # 模拟写串口卡住，stop() 的 join 超时
+
+    sequencer = GestureSequencer(send)
+    sequencer.play(GestureTimeline([GestureStep("111111", 0.05), GestureStep("000000", 0.05)]))
+    time.sleep(0.05)
+    sequencer.stop(timeout=0.05)
+    sequencer.play(GestureTimeline([GestureStep("010101", 0.05)]))
+    stalled.set()
+    time.sleep(0.3)
+    sequencer.stop()
+
+    assert [pattern for _, pattern in log].count("000000") == 0
+    assert len({thread for thread, _ in log}) == 2
+
+
+def test_transition_ends_with_pattern():
+    sent = []
+    sequencer = GestureSequencer(sent.append, send_targets=lambda targets: sent.append(list(targets)),
+                                 rate=10, pwm_ranges=[(0, 100)] * 6)
+    sequencer.play(GestureTimeline([GestureStep("000000", 0.02), GestureStep("111111", 0.02, 0.2)], mode="once"))
+    sequencer._thread.join(2)
+    assert sent == ["000000", [50] * 6, [100] * 6, "111111"]
@@ -0,0 +1,105 @@
+"""hand_protocol 编解码的测试
+
+    cd inmove_my && python -m pytest tests
+"""
+import itertools
+
+import pytest
+
+from hand_protocol import (FRAME_DELTA, FRAME_MASK, FRAME_TARGETS, MAX_PAYLOAD, SYNC, FrameDecoder,
+                           StatusEncoder, crc8, encode_frame, mask_to_status, status_to_mask)
+
+ALL_STATUSES = ["".join(bits) for bits in itertools.product("01", repeat=6)]
+TARGETS = [102, 380, 450, 500, 270, 250]
+
+
+def decode_bytewise(data):
+    """逐字节输入解码器，覆盖帧被拆到多次读取中的情况"""
+    decoder = FrameDecoder()
+    frames = []
+    for byte in data:
+        frames += decoder.feed(bytes((byte,)))
+    return decoder, frames
+
+
+@pytest.mark.parametrize("status", ALL_STATUSES)
+def test_mask_round_trip(status):
+    assert mask_to_status(status_to_mask(status)) == status
+    frames = FrameDecoder().feed(StatusEncoder(binary=True).encode(status))
+    assert len(frames) == 1
+    assert frames[0].type == FRAME_MASK
+    assert mask_to_status(frames[0].mask) == status
+
+
+def test_ascii_encoding_unchanged():
+    assert StatusEncoder().encode("011111") == b"011111\n"
+
+
+def test_targets_round_trip():
+    frames = FrameDecoder().feed(StatusEncoder(binary=True).encode_targets(TARGETS))
+    assert [(f.type, f.targets) for f in frames] == [(FRAME_TARGETS, TARGETS)]
+
+
+@pytest.mark.parametrize("changes", [{0: 102}, {1: 380, 4: 270}, dict(enumerate(TARGETS))])
+def test_delta_round_trip(changes):
+    frames = FrameDecoder().feed(StatusEncoder(binary=True).encode_delta(changes))
+    assert len(frames) == 1
+    assert frames[0].type == FRAME_DELTA
+    assert frames[0].delta == changes
+
+
+def test_bytewise_feed_matches_whole_feed():
+    encoder = StatusEncoder(binary=True)
+    data = b"".join(encoder.encode(s) for s in ALL_STATUSES) + encoder.encode_targets(TARGETS)
+    _, frames = decode_bytewise(data)
+    assert [mask_to_status(f.mask) for f in frames[:-1]] == ALL_STATUSES
+    assert frames[-1].targets == TARGETS
+
+
+@pytest.mark.parametrize("junk", [
+    b"\x00\xff\x13",                  # 普通干扰字节
+    b"\xa5\xa5",                      # 伪同步字
+    bytes((SYNC, 0x7F, 0, 1)),        # 未知帧类型
+    bytes((SYNC, FRAME_MASK, 0, MAX_PAYLOAD + 1)),  # 长度字节超出上限
+    b"011111\n",                      # ASCII 文本
+])
+def test_resync_after_junk(junk):
+    encoder = StatusEncoder(binary=True)
+    decoder, frames = decode_bytewise(junk + encoder.encode("001111") + junk + encoder.encode("000011"))
+    assert [mask_to_status(f.mask) for f in frames] == ["001111", "000011"]
+    assert decoder.skipped_bytes > 0
+
+
+def test_crc_error_rejected_and_next_frame_recovered():
+    encoder = StatusEncoder(binary=True)
+    bad = bytearray(encoder.encode("111111"))
+    bad[-1] ^= 0xFF
+    decoder, frames = decode_bytewise(bytes(bad) + encoder.encode("010000"))
+    assert [mask_to_status(f.mask) for f in frames] == ["010000"]
+    assert decoder.crc_errors == 1
+
+
+def test_corrupted_payload_rejected():
+    frame = bytearray(StatusEncoder(binary=True).encode_targets(TARGETS))
+    frame[5] ^= 0x01
+    decoder = FrameDecoder()
+    assert decoder.feed(bytes(frame)) == []
+    assert decoder.crc_errors == 1
+
+
+def test_crc8_check_value():
+    # CRC-8/SMBUS 的标准校验值
+    assert crc8(b"123456789") == 0xF4
+
+
+def test_sequence_wraps_after_255():
+    encoder = StatusEncoder(binary=True)
+    encoder.seq = 254
+    data = b"".join(encoder.encode("000000") for _ in range(4))
+    assert [f.seq for f in FrameDecoder().feed(data)] == [254, 255, 0, 1]
+    assert encoder.seq == 2
+
+
+def test_payload_too_long_raises():
+    with pytest.raises(ValueError):
+        encode_frame(FRAME_TARGETS, 0, bytes(MAX_PAYLOAD + 1))
@@ -0,0 +1,45 @@
+"""score_loader 中 MIDI 解析的测试
+
+    cd inmove_my && python -m pytest tests
+"""
+import struct
+
+import pytest
+
+from score_loader import ScoreError, load_score, parse_midi
+
+
+def midi_header(track_count=1, division=480):
+    return b"MThd" + struct.pack(">IHHH", 6, 0, track_count, division)
+
+
+def midi_track(events):
+    return b"MTrk" + struct.pack(">I", len(events)) + events
+
+
+# 主音 60 上的 宫(60) 一拍，接着 商(62) 一拍
+TRACK = bytes([0x00, 0x90, 60, 100, 0x83, 0x60, 0x80, 60, 0,
+               0x00, 0x90, 62, 100, 0x83, 0x60, 0x80, 62, 0,
+               0x00, 0xFF, 0x2F, 0x00])
+
+
+def test_parse_midi_reads_notes():
+    rows, _ = parse_midi(midi_header() + midi_track(TRACK))
+    assert [(round(start, 3), round(duration, 3)) for start, duration, _ in rows] == [(0.0, 0.5), (0.5, 0.5)]
+
+
+@pytest.mark.parametrize("data", [
+    midi_header() + b"MTrk\x00",                   # 音轨头被截断
+    midi_header() + midi_track(TRACK)[:-5],        # 音轨数据被截断
+    midi_header(division=0) + midi_track(TRACK),   # 每拍 tick 数为 0
+])
+def test_parse_midi_rejects_malformed_files(data):
+    with pytest.raises(ScoreError):
+        parse_midi(data)
+
+
+def test_load_score_reports_truncated_file_as_score_error(tmp_path):
+    path = tmp_path / "broken.mid"
+    path.write_bytes(midi_header() + b"MTrk\x00")
+    with pytest.raises(ScoreError):
+        load_score(str(path), use_cache=False)
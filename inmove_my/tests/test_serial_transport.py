@@ -0,0 +1,92 @@
+"""SerialTransport 收发混合流解析和断线重连的测试
+
+    cd inmove_my && python -m pytest tests
+"""
+from hand_protocol import FRAME_MASK, FRAME_TARGETS, SYNC, StatusEncoder, mask_to_status
+from serial_transport import SerialTransport
+
+TARGETS = [102, 380, 450, 500, 270, 250]
+
+
+class FakeSerial():
+    """只实现重连用到的属性：open() 记录打开时的波特率"""
+
+    def __init__(self, baudrate=9600):
+        self.port = "fake"
+        self.baudrate = baudrate
+        self.is_open = True
+        self.opened_at = []
+
+    def open(self):
+        self.is_open = True
+        self.opened_at.append(self.baudrate)
+
+    def close(self):
+        self.is_open = False
+
+
+def make_transport():
+    lines, frames = [], []
+    transport = SerialTransport(parse_frames=True, reconnect=False,
+                                on_line=lambda line, t: lines.append(line),
+                                on_frame=lambda frame, t: frames.append(frame))
+    return transport, lines, frames
+
+
+def test_transport_splits_text_lines_and_frames():
+    encoder = StatusEncoder(binary=True)
+    data = (b"READY\n" + encoder.encode("001111") + b"Received: 001111\n"
+            + encoder.encode_targets(TARGETS) + b"ACK BIN 115200\n")
+    transport, lines, frames = make_transport()
+    transport._feed(data, 0.0)
+    assert lines == ["READY", "Received: 001111", "ACK BIN 115200"]
+    assert [f.type for f in frames] == [FRAME_MASK, FRAME_TARGETS]
+    assert frames[1].targets == TARGETS
+
+
+def test_transport_bytewise_feed():
+    encoder = StatusEncoder(binary=True)
+    data = b"hello\n" + encoder.encode("000111") + b"world\n"
+    transport, lines, frames = make_transport()
+    for byte in data:
+        transport._feed(bytes((byte,)), 0.0)
+    assert lines == ["hello", "world"]
+    assert [mask_to_status(f.mask) for f in frames] == ["000111"]
+
+
+def test_transport_sync_byte_inside_line_is_text():
+    transport, lines, frames = make_transport()
+    transport._feed(b"value \xa5 ok\n", 0.0)
+    assert frames == []
+    assert len(lines) == 1 and lines[0].startswith("value")
+
+
+def test_transport_invalid_header_falls_back_to_text():
+    transport, lines, frames = make_transport()
+    transport._feed(bytes((SYNC, 0x7F, 0, 1)) + b"tail\n" + StatusEncoder(binary=True).encode("000001"), 0.0)
+    assert frames and mask_to_status(frames[-1].mask) == "000001"
+    assert len(lines) == 1 and lines[0].endswith("tail")
+
+
+def test_transport_drops_frame_with_bad_crc():
+    encoder = StatusEncoder(binary=True)
+    bad = bytearray(encoder.encode("111111"))
+    bad[-1] ^= 0xFF
+    transport, lines, frames = make_transport()
+    transport._feed(bytes(bad) + encoder.encode("000000"), 0.0)
+    assert [mask_to_status(f.mask) for f in frames] == ["000000"]
+    assert transport.crc_errors == 1
+    assert lines == []
+
+
+def test_reconnect_restores_initial_baudrate_and_handshakes_again():
+    ser = FakeSerial(9600)
+    handshakes = []
+    transport = SerialTransport(ser, reconnect_interval=0.0, on_open=lambda s: handshakes.append(s.baudrate))
+    ser.baudrate = 115200  # 协商后切换到二进制波特率
+    ser.close()
+    transport.running = True
+    assert transport._try_reconnect()
+    assert ser.opened_at == [9600]
+    assert handshakes == [9600]
+    assert transport.reconnects == 1
@@ -47,13 +47,38 @@
 #define STEP_SIZE 10
 #define GESTURE_LENGTH 6
 
+// 串口协议（与 inmove_my/hand_protocol.py 保持一致）
+// 二进制帧: 0xA5 | type | seq | len | payload[len] | crc8(type..payload)
+#define SERIAL_BAUD    9600
+#define SYNC_BYTE      0xA5
+#define FRAME_MASK     0x01
+#define FRAME_TARGETS  0x02
+#define FRAME_DELTA    0x03
+#define MAX_PAYLOAD    16
+#define FRAME_HEADER   4
+#define LINE_BUFFER    32
+
+// 比例跟随模式：每个周期每路最多移动 STREAM_STEP，周期 STREAM_INTERVAL 毫秒
+#define STREAM_STEP     12
+#define STREAM_INTERVAL 5
+
 Adafruit_PWMServoDriver pwm = Adafruit_PWMServoDriver();
 
 bool state0[GESTURE_LENGTH] = {false, false, false, false, false, false};
 bool state1[GESTURE_LENGTH] = {false, false, false, false, false, false};
 bool change = false;
-char sData;
-String state;
+
+// 比例跟随模式下的目标值和各路当前输出的PWM
+bool streaming = false;
+int targetPwm[GESTURE_LENGTH];
+int currentPwm[GESTURE_LENGTH];
+int sweepStart[GESTURE_LENGTH];
+
+// 接收缓冲区（不使用String，避免逐字节拼接和堆分配）
+char lineBuf[LINE_BUFFER];
+int lineLen = 0;
+uint8_t frameBuf[FRAME_HEADER + MAX_PAYLOAD + 1];
+int frameLen = 0;
 
 // 手指对应的舵机通道
 const int wrist = 0;
@@ -98,25 +123,39 @@ void getPwmRange(int fingerId, int &straighten, int &flex) {
   }
 }
 
+// 输出PWM并记录当前值
+void setServo(int fingerId, int value) {
+  currentPwm[fingerId] = value;
+  pwm.setPWM(fingerPins[fingerId], 0, value);
+}
+
 // 初始化舵机到伸直位置
 void initializeServos() {
   Serial.println("Initializing servos...");
   for (int i = 0; i < GESTURE_LENGTH; i++) {
     int straighten, flex;
     getPwmRange(i, straighten, flex);
-    pwm.setPWM(fingerPins[i], 0, straighten);
+    setServo(i, straighten);
+    targetPwm[i] = straighten;
   }
   delay(1000);
 }
 
+// 把上位机给的PWM限制在该路伸直/弯曲范围内，防止越界顶死舵机
+int clampPwm(int fingerId, int value) {
+  int straighten, flex;
+  getPwmRange(fingerId, straighten, flex);
+  return constrain(value, min(straighten, flex), max(straighten, flex));
+}
+
 // 验证手势数据是否有效
-bool validateGestureData(String data) {
-  if (data.length() != GESTURE_LENGTH) {
+bool validateGestureData(const char *data, int len) {
+  if (len != GESTURE_LENGTH) {
     Serial.println("Error: Invalid data length");
     return false;
   }
   for (int i = 0; i < GESTURE_LENGTH; i++) {
-    char c = data.charAt(i);
+    char c = data[i];
     if (c != '0' && c != '1') {
       Serial.println("Error: Invalid character in gesture data");
       return false;
@@ -125,6 +164,18 @@ bool validateGestureData(String data) {
   return true;
 }
 
+// CRC-8，多项式0x07
+uint8_t crc8(const uint8_t *data, int len) {
+  uint8_t crc = 0;
+  for (int i = 0; i < len; i++) {
+    crc ^= data[i];
+    for (int b = 0; b < 8; b++) {
+      crc = (crc & 0x80) ? (uint8_t)((crc << 1) ^ 0x07) : (uint8_t)(crc << 1);
+    }
+  }
+  return crc;
+}
+
 // 检查手指状态是否变化
 bool hasStateChanged() {
   for (int i = 0; i < GESTURE_LENGTH; i++) {
@@ -135,48 +186,158 @@ bool hasStateChanged() {
   return false;
 }
 
-// 数据接收任务函数
+// 更新目标手势并通知主循环
+void applyGesture(const bool *target) {
+  for (int i = 0; i < GESTURE_LENGTH; i++) {
+    state0[i] = target[i];
+    // 从跟随模式回到开关模式：所有通道都从当前位置扫到目标位置
+    if (streaming) state1[i] = !target[i];
+  }
+  streaming = false;
+  change = true;
+}
+
+// 比例跟随：更新部分或全部通道的目标PWM
+void applyTargets(uint8_t mask, const uint8_t *values) {
+  if (!streaming) {
+    // 刚进入跟随模式，没有给出的通道保持当前位置
+    for (int i = 0; i < GESTURE_LENGTH; i++) targetPwm[i] = currentPwm[i];
+  }
+  int k = 0;
+  for (int i = 0; i < GESTURE_LENGTH; i++) {
+    if ((mask >> i) & 1) {
+      targetPwm[i] = clampPwm(i, values[k] | (values[k + 1] << 8));
+      k += 2;
+    }
+  }
+  streaming = true;
+}
+
+void printGesture(const bool *target) {
+  for (int i = 0; i < GESTURE_LENGTH; i++) Serial.print(target[i] ? "1" : "0");
+}
+
+// 处理一行ASCII数据：手势字符串或 "BIN <baud>" 协商请求
+void handleLine() {
+  lineBuf[lineLen] = '\0';
+  if (strncmp(lineBuf, "BIN ", 4) == 0) {
+    long baud = atol(lineBuf + 4);
+    if (baud > 0) {
+      Serial.print("ACK BIN ");
+      Serial.println(baud);
+      Serial.flush();
+      Serial.updateBaudRate(baud);
+    }
+    return;
+  }
+  if (validateGestureData(lineBuf, lineLen)) {
+    bool target[GESTURE_LENGTH];
+    for (int i = 0; i < GESTURE_LENGTH; i++) {
+      target[i] = (lineBuf[i] == '1');
+    }
+    applyGesture(target);
+    Serial.print("Received: ");
+    Serial.println(lineBuf);
+  }
+}
+
+// 处理一帧完整的二进制数据
+void handleFrame(uint8_t type, uint8_t seq, const uint8_t *payload, uint8_t len) {
+  if (type == FRAME_MASK && len == 1) {
+    bool target[GESTURE_LENGTH];
+    for (int i = 0; i < GESTURE_LENGTH; i++) {
+      target[i] = (payload[0] >> i) & 1;
+    }
+    applyGesture(target);
+    Serial.print("Received: ");
+    printGesture(target);
+    Serial.print(" #");
+    Serial.println(seq);
+  } else if (type == FRAME_TARGETS && len == GESTURE_LENGTH * 2) {
+    applyTargets(0x3F, payload);
+    Serial.print("Received: T #");
+    Serial.println(seq);
+  } else if (type == FRAME_DELTA && len >= 1) {
+    int count = 0;
+    for (int i = 0; i < GESTURE_LENGTH; i++) count += (payload[0] >> i) & 1;
+    if (len != 1 + count * 2 || (payload[0] >> GESTURE_LENGTH)) {
+      Serial.println("Error: Invalid delta frame");
+      return;
+    }
+    applyTargets(payload[0], payload + 1);
+    Serial.print("Received: D #");
+    Serial.println(seq);
+  }
+}
+
+// 二进制帧状态机，每次输入一个字节
+void feedFrameByte(uint8_t b) {
+  frameBuf[frameLen++] = b;
+  if (frameLen == 2 && b != FRAME_MASK && b != FRAME_TARGETS && b != FRAME_DELTA) {
+    frameLen = 0;  // 未知帧类型，丢弃重新同步
+    return;
+  }
+  if (frameLen == FRAME_HEADER && frameBuf[3] > MAX_PAYLOAD) {
+    frameLen = 0;  // 长度非法，丢弃重新同步
+    return;
+  }
+  if (frameLen >= FRAME_HEADER && frameLen == FRAME_HEADER + frameBuf[3] + 1) {
+    uint8_t len = frameBuf[3];
+    if (crc8(frameBuf + 1, FRAME_HEADER - 1 + len) == frameBuf[FRAME_HEADER + len]) {
+      handleFrame(frameBuf[1], frameBuf[2], frameBuf + FRAME_HEADER, len);
+    } else {
+      Serial.println("Error: CRC mismatch");
+    }
+    frameLen = 0;
+  }
+}
+
+// 数据接收任务函数：有数据就立即处理，不再逐字节延时
 void receiveDataCode(void * parameter) {
   for (;;) {
     while (Serial.available()) {
-      sData = Serial.read();
-      delay(2);
-      if (sData == '\n') {
-        if (validateGestureData(state)) {
-          for (int i = 0; i < GESTURE_LENGTH; i++) {
-            state0[i] = (state.charAt(i) == '1');
-          }
-          change = true;
-          Serial.print("Received: ");
-          Serial.println(state);
+      uint8_t b = Serial.read();
+      if (frameLen > 0 || (b == SYNC_BYTE && lineLen == 0)) {
+        feedFrameByte(b);
+      } else if (b == '\n') {
+        handleLine();
+        lineLen = 0;
+      } else if (b != '\r') {
+        if (lineLen < LINE_BUFFER - 1) {
+          lineBuf[lineLen++] = (char)b;
+        } else {
+          lineLen = 0;  // 行过长，丢弃
         }
-        state = "";
-      } else if (sData >= '0' && sData <= '1') {
-        state += sData;
-      }
-      if (state.length() > GESTURE_LENGTH) {
-        state = "";
       }
     }
-    delay(2);
+    vTaskDelay(1);
   }
 }
 
-// 移动手指函数
+// 移动手指函数：从扫动开始时的位置线性移动到伸直/弯曲位置
 void moveFinger(int fingerId, bool targetFlex, int iteration) {
   int straighten, flex;
   getPwmRange(fingerId, straighten, flex);
-  int startPwm = targetFlex ? straighten : flex;
+  int startPwm = sweepStart[fingerId];
   int endPwm = targetFlex ? flex : straighten;
   float progress = (float)iteration / MAX_ITERATIONS;
-  int currentPwm = startPwm + (endPwm - startPwm) * progress;
-  pwm.setPWM(fingerId, 0, currentPwm);
+  setServo(fingerId, startPwm + (endPwm - startPwm) * progress);
+}
+
+// 比例跟随：每个周期各路向目标值移动不超过 STREAM_STEP
+void followTargets() {
+  for (int i = 0; i < GESTURE_LENGTH; i++) {
+    int diff = targetPwm[i] - currentPwm[i];
+    if (diff != 0) {
+      setServo(i, currentPwm[i] + constrain(diff, -STREAM_STEP, STREAM_STEP));
+    }
+  }
 }
 
 TaskHandle_t receiveData; // 任务句柄
 
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(SERIAL_BAUD);
   Serial.println("ESP32 Hand Control Started");
 
   Wire.begin();
@@ -198,8 +359,14 @@ void setup() {
 }
 
 void loop() {
+  if (streaming) {
+    followTargets();
+    delay(STREAM_INTERVAL);
+    return;
+  }
   if (change && hasStateChanged()) {
     Serial.println("Processing gesture change...");
+    for (int j = 0; j < GESTURE_LENGTH; j++) sweepStart[j] = currentPwm[j];
     for (int i = 0; i <= MAX_ITERATIONS; i += STEP_SIZE) {
       for (int j = 0; j < GESTURE_LENGTH; j++) {
         if (state0[j] != state1[j]) {